@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django import forms
-from .models import Agency, JobPost
+from .models import Agency, JobPost, FormSchemaSnapshot
 import json
 
 class PrettyJSONWidget(forms.Textarea):
@@ -55,8 +55,25 @@ class AgencyAdmin(admin.ModelAdmin):
 @admin.register(JobPost)
 class JobPostAdmin(admin.ModelAdmin):
     form = JobPostAdminForm
-    list_display = ('title', 'agency', 'is_active', 'created_at')
+    list_display = ('title', 'agency', 'is_active', 'application_count', 'pending_count', 'shortlisted_count',
+                    'current_schema', 'created_at')
     list_filter = ('is_active', 'agency', 'created_at')
     search_fields = ('title', 'description', 'agency__name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('current_schema', *JobPost.COUNTER_FIELDS, 'created_at', 'updated_at')
+    list_select_related = ('agency', 'current_schema__job_post__agency')
     ordering = ('-created_at',)
+
+@admin.register(FormSchemaSnapshot)
+class FormSchemaSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('job_post', 'version', 'checksum', 'created_at')
+    list_filter = ('job_post__agency',)
+    search_fields = ('job_post__title', 'checksum')
+    readonly_fields = ('job_post', 'version', 'schema', 'content', 'checksum', 'created_at')
+    list_select_related = ('job_post__agency',)
+    ordering = ('job_post', '-version')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
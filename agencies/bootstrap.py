@@ -0,0 +1,47 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from common.conditional import make_etag
+from .cache import get_cached_bootstrap, set_cached_bootstrap
+from .models import Agency
+from .serializers import AgencySerializer
+
+# Job post fields an applicant's landing page needs. Applicant counters are left out so that
+# submissions don't invalidate the cached payload
+JOB_POST_FIELDS = ['id', 'title', 'description', 'created_at', 'updated_at']
+
+
+def build_bootstrap(agency):
+    """
+    JSON for an agency's landing page: the agency, its active job posts and
+    each post's merged form schema, embedded from the stored snapshot.
+    """
+    job_posts = []
+    for job_post in agency.job_posts.filter(is_active=True).select_related('current_schema'):
+        job_post.agency = agency
+        snapshot = job_post.current_schema or job_post.publish_form_schema()
+        job_posts.append({
+            **{name: getattr(job_post, name) for name in JOB_POST_FIELDS},
+            'schema_version': snapshot.version,
+            'form_schema': snapshot.schema,
+        })
+    payload = {'agency': AgencySerializer(agency).data, 'job_posts': job_posts}
+    return json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def get_bootstrap(code):
+    """
+    Returns: {'content': JSON, 'etag': ETag} for the agency with ``code``, from
+    the cache when possible, or None if there is no such agency.
+    Agency and JobPost saves clear the cached entry (agencies.cache).
+    """
+    entry = get_cached_bootstrap(code)
+    if entry is None:
+        agency = Agency.objects.filter(code=code).first()
+        if agency is None:
+            return None
+        content = build_bootstrap(agency)
+        entry = {'content': content, 'etag': make_etag(content)}
+        set_cached_bootstrap(code, entry)
+    return entry
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def bootstrap_cache_key(code):
+    return f'agency-bootstrap:{code}'
+
+
+def clear_bootstrap_cache(code):
+    """
+    Drop an agency's cached bootstrap payload, now and again once the current
+    transaction commits, so a request that read the old rows in between
+    can't leave them cached.
+    """
+    key = bootstrap_cache_key(code)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def get_cached_bootstrap(code):
+    return cache.get(bootstrap_cache_key(code))
+
+
+def set_cached_bootstrap(code, entry):
+    cache.set(bootstrap_cache_key(code), entry, settings.AGENCY_BOOTSTRAP_CACHE_TIMEOUT)
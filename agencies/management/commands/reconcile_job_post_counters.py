@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from agencies.models import JobPost
+from applications.models import Application
+
+
+class Command(BaseCommand):
+    help = ('Compare the applicant counters on each job post with a count of its applications, '
+            'and with --fix correct the ones that drifted.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Overwrite drifted counters with the actual counts')
+
+    def handle(self, *args, **options):
+        statuses = [status for status, _ in Application.STATUS_CHOICES]
+        drifted = 0
+        for job_post_id in JobPost.objects.order_by('pk').values_list('pk', flat=True).iterator():
+            with transaction.atomic():
+                # Locking the row holds off adjust_application_counts() until the comparison is done
+                job_post = JobPost.objects.select_for_update().only('pk', *JobPost.COUNTER_FIELDS).get(pk=job_post_id)
+                counts = dict(
+                    Application.objects.filter(job_post_id=job_post_id).order_by()
+                    .values_list('status').annotate(count=Count('id'))
+                )
+                expected = {f'{status}_count': counts.get(status, 0) for status in statuses}
+                expected['application_count'] = sum(counts.values())
+                wrong = {field: value for field, value in expected.items() if getattr(job_post, field) != value}
+                if not wrong:
+                    continue
+                drifted += 1
+                changes = ', '.join(f'{field} {getattr(job_post, field)} -> {value}' for field, value in wrong.items())
+                self.stdout.write(f'Job post #{job_post_id}: {changes}')
+                if options['fix']:
+                    JobPost.objects.filter(pk=job_post_id).update(**wrong)
+
+        action = 'Fixed' if options['fix'] else 'Found'
+        self.stdout.write(f'{action} {drifted} job post(s) with drifted counters')
+        if drifted and not options['fix']:
+            self.stdout.write('Run again with --fix to correct them')
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0004_alter_agency_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormSchemaSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField()),
+                ('schema', models.JSONField()),
+                ('content', models.TextField()),
+                ('checksum', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('job_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schema_snapshots', to='agencies.jobpost')),
+            ],
+            options={
+                'ordering': ['-version'],
+                'unique_together': {('job_post', 'version')},
+            },
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='current_schema',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='agencies.formschemasnapshot'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+import hashlib
+import json
+
+from django.db import migrations
+
+from agencies.schemas import merge_form_schemas
+
+
+def create_snapshots(apps, schema_editor):
+    """
+    Publish version 1 of the merged schema for every existing job post.
+    """
+    JobPost = apps.get_model('agencies', 'JobPost')
+    FormSchemaSnapshot = apps.get_model('agencies', 'FormSchemaSnapshot')
+
+    for job_post in JobPost.objects.filter(current_schema__isnull=True).select_related('agency'):
+        merged_schema = merge_form_schemas(job_post.agency.default_form_schema, job_post.form_schema)
+        content = json.dumps(merged_schema, ensure_ascii=False, separators=(',', ':'))
+        snapshot = FormSchemaSnapshot.objects.create(
+            job_post=job_post,
+            version=1,
+            schema=merged_schema,
+            content=content,
+            checksum=hashlib.sha256(content.encode()).hexdigest(),
+        )
+        JobPost.objects.filter(pk=job_post.pk).update(current_schema=snapshot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0005_formschemasnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_snapshots, migrations.RunPython.noop),
+    ]
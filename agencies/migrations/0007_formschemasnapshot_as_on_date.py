@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:47
+
+from django.db import migrations, models
+
+from agencies.schemas import resolve_as_on_date
+
+
+def backfill_as_on_date(apps, schema_editor):
+    FormSchemaSnapshot = apps.get_model('agencies', 'FormSchemaSnapshot')
+    for snapshot in FormSchemaSnapshot.objects.only('schema'):
+        as_on_date = resolve_as_on_date(snapshot.schema)
+        if as_on_date:
+            FormSchemaSnapshot.objects.filter(pk=snapshot.pk).update(as_on_date=as_on_date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0006_backfill_form_schema_snapshots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='formschemasnapshot',
+            name='as_on_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_as_on_date, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0007_formschemasnapshot_as_on_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='jobpost',
+            index=models.Index(fields=['-created_at', '-id'], name='agencies_jo_created_8a2720_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0008_jobpost_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobpost',
+            name='application_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='hired_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='pending_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='rejected_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='reviewing_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='shortlisted_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    """
+    Count the applications each job post already has.
+    """
+    Application = apps.get_model('applications', 'Application')
+    JobPost = apps.get_model('agencies', 'JobPost')
+
+    counters = {}
+    rows = Application.objects.order_by().values_list('job_post_id', 'status').annotate(count=Count('id'))
+    for job_post_id, status, count in rows:
+        job_post_counters = counters.setdefault(job_post_id, {'application_count': 0})
+        job_post_counters[f'{status}_count'] = count
+        job_post_counters['application_count'] += count
+    for job_post_id, values in counters.items():
+        JobPost.objects.filter(pk=job_post_id).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0009_jobpost_application_counters'),
+        ('applications', '0013_form_data_numeric'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
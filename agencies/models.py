@@ -1,5 +1,12 @@
-from django.db import models
+import hashlib
+import json
+
+from django.db import models, transaction
+from django.db.models import F
 from django.utils.text import slugify
+from common.tasks import enqueue
+from .cache import clear_bootstrap_cache
+from .schemas import has_indexed_fields, merge_form_schemas, resolve_as_on_date
 
 # Create your models here.
 
@@ -49,6 +56,15 @@ class Agency(models.Model):
                 ]
             }
         super().save(*args, **kwargs)
+        # Job posts inherit the default schema, so republish their snapshots
+        for job_post in self.job_posts.select_related('current_schema'):
+            job_post.agency = self
+            job_post.publish_form_schema()
+        clear_bootstrap_cache(self.code)
+
+    def delete(self, *args, **kwargs):
+        clear_bootstrap_cache(self.code)
+        return super().delete(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -62,13 +78,128 @@ class JobPost(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField()
     form_schema = models.JSONField()  # Stores the dynamic form configuration
+    current_schema = models.ForeignKey('FormSchemaSnapshot', on_delete=models.SET_NULL, null=True, blank=True,
+                                       editable=False, related_name='+')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Applicant counters, changed only through adjust_application_counts(). Plain integers so that
+    # drift after bulk changes can't make later writes fail; reconcile_job_post_counters repairs it
+    application_count = models.IntegerField(default=0, editable=False)
+    pending_count = models.IntegerField(default=0, editable=False)
+    reviewing_count = models.IntegerField(default=0, editable=False)
+    shortlisted_count = models.IntegerField(default=0, editable=False)
+    rejected_count = models.IntegerField(default=0, editable=False)
+    hired_count = models.IntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ['application_count', 'pending_count', 'reviewing_count', 'shortlisted_count',
+                      'rejected_count', 'hired_count']
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Writing back this instance's counters would undo concurrent adjustments
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+        self.publish_form_schema()
+        clear_bootstrap_cache(self.agency.code)
+
+    def delete(self, *args, **kwargs):
+        clear_bootstrap_cache(self.agency.code)
+        return super().delete(*args, **kwargs)
+
+    @classmethod
+    def adjust_application_counts(cls, job_post_id, **status_deltas):
+        """
+        Atomically add to the per-status counters, e.g. pending=-1, shortlisted=1,
+        and to application_count by their sum.
+        """
+        updates = {f'{status}_count': F(f'{status}_count') + delta for status, delta in status_deltas.items() if delta}
+        total = sum(status_deltas.values())
+        if total:
+            updates['application_count'] = F('application_count') + total
+        if updates:
+            cls.objects.filter(pk=job_post_id).update(**updates)
+
+    def get_status_counts(self):
+        """
+        Returns: {status: applicant count} from the counter columns
+        """
+        return {name[:-len('_count')]: getattr(self, name) for name in self.COUNTER_FIELDS[1:]}
+
+    def publish_form_schema(self):
+        """
+        Merge the agency default schema with this job post's schema and store it
+        as a new snapshot version, unless the merged result is unchanged.
+        Returns: the current FormSchemaSnapshot
+        """
+        merged_schema = merge_form_schemas(self.agency.default_form_schema, self.form_schema)
+        content = json.dumps(merged_schema, ensure_ascii=False, separators=(',', ':'))
+        checksum = hashlib.sha256(content.encode()).hexdigest()
+
+        if self.current_schema and self.current_schema.checksum == checksum:
+            return self.current_schema
+
+        with transaction.atomic():
+            # The row lock orders concurrent publishes for this post; this instance's snapshot may be stale
+            current_id = JobPost.objects.select_for_update().filter(pk=self.pk).values_list(
+                'current_schema', flat=True).first()
+            current = FormSchemaSnapshot.objects.filter(pk=current_id, checksum=checksum).first() if current_id else None
+            if current is not None:
+                self.current_schema = current
+                return current
+
+            latest = self.schema_snapshots.order_by('-version').values_list('version', flat=True).first()
+            snapshot = FormSchemaSnapshot.objects.create(
+                job_post=self,
+                version=(latest or 0) + 1,
+                schema=merged_schema,
+                content=content,
+                checksum=checksum,
+                as_on_date=resolve_as_on_date(merged_schema),
+            )
+            JobPost.objects.filter(pk=self.pk).update(current_schema=snapshot)
+        self.current_schema = snapshot
+        if has_indexed_fields(merged_schema):
+            # Index builds are slow and can't run inside this transaction
+            enqueue('applications.sync_form_indexes', snapshot_id=snapshot.pk)
+        return snapshot
+
     def __str__(self):
         return f"{self.agency.name} - {self.title}"
 
     class Meta:
         ordering = ['-created_at']
         unique_together = ['agency', 'title']
+        indexes = [
+            # Cursor pagination order
+            models.Index(fields=['-created_at', '-id']),
+        ]
+
+class FormSchemaSnapshot(models.Model):
+    """
+    Immutable, merged form schema for a job post. ``content`` holds the
+    serialized JSON so it can be served without re-encoding.
+    """
+    job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='schema_snapshots')
+    version = models.PositiveIntegerField()
+    schema = models.JSONField()
+    content = models.TextField()
+    checksum = models.CharField(max_length=64)
+    as_on_date = models.DateField(null=True, blank=True)  # Parsed from the schema for experience cutoffs
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Form schema snapshots are immutable')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.job_post} - v{self.version}"
+
+    class Meta:
+        ordering = ['-version']
+        unique_together = ['job_post', 'version']
@@ -0,0 +1,70 @@
+from datetime import date
+
+
+def merge_form_schemas(default_schema, job_schema):
+    """
+    Overlay a job post's form schema on its agency's default schema.
+    Job fields replace default fields with the same name, and the job's
+    as_on_date (if any) overrides the agency's.
+    """
+    default_schema = default_schema or {}
+    job_schema = job_schema or {}
+
+    merged_schema = {
+        "fields": [],
+        "as_on_date": default_schema.get("as_on_date")
+    }
+
+    # Add default fields
+    if "fields" in default_schema:
+        merged_schema["fields"].extend(default_schema["fields"])
+
+    # Add or override with job-specific fields
+    if "fields" in job_schema:
+        # Create a map of existing fields by name
+        field_map = {field["name"]: field for field in merged_schema["fields"]}
+
+        # Add or update fields from job schema
+        for field in job_schema["fields"]:
+            field_map[field["name"]] = field
+
+        # Convert back to list
+        merged_schema["fields"] = list(field_map.values())
+
+    # Override as_on_date if it exists in job_schema
+    if "as_on_date" in job_schema:
+        merged_schema["as_on_date"] = job_schema.get("as_on_date")
+
+    return merged_schema
+
+
+def resolve_as_on_date(schema):
+    """
+    Return the schema's as_on_date as a date, or None if missing or malformed.
+    """
+    try:
+        return date.fromisoformat(schema.get('as_on_date'))
+    except (TypeError, ValueError):
+        return None
+
+
+def subfields_of(field):
+    """
+    The subfields of a group/array field as a list of field dicts. Schemas
+    give them under "fields" or "subfields", as a list or as {name: field}.
+    """
+    subfields = field.get('fields') or field.get('subfields') or []
+    if isinstance(subfields, dict):
+        return [{'name': name, **subfield} for name, subfield in subfields.items()]
+    return subfields
+
+
+def has_indexed_fields(schema):
+    """
+    Whether any field, or any subfield of a group/array, is marked "indexed".
+    """
+    for field in (schema or {}).get('fields', []):
+        subfields = subfields_of(field)
+        if field.get('indexed') or any(sub.get('indexed') for sub in subfields):
+            return True
+    return False
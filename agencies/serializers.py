@@ -10,13 +10,24 @@ class AgencySerializer(serializers.ModelSerializer):
 
 class JobPostSerializer(serializers.ModelSerializer):
     agency_name = serializers.CharField(source='agency.name', read_only=True)
+    status_counts = serializers.DictField(source='get_status_counts', child=serializers.IntegerField(), read_only=True)
     
     class Meta:
         model = JobPost
         fields = ['id', 'agency', 'agency_name', 'title', 'description', 'form_schema', 
-                 'is_active', 'created_at', 'updated_at']
-        read_only_fields = ['created_at', 'updated_at']
+                 'is_active', 'application_count', 'status_counts', 'created_at', 'updated_at']
+        read_only_fields = ['application_count', 'created_at', 'updated_at']
     
     def validate_form_schema(self, value):
         validate_form_schema(value)
-        return value 
\ No newline at end of file
+        return value
+
+class PublicJobPostSerializer(JobPostSerializer):
+    """
+    Job posts as applicants see them, without applicant counters: lists built
+    from it stay cacheable while submissions come in.
+    """
+    class Meta(JobPostSerializer.Meta):
+        fields = ['id', 'agency', 'agency_name', 'title', 'description', 'form_schema',
+                  'is_active', 'created_at', 'updated_at']
+ 
\ No newline at end of file
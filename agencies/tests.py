@@ -1,3 +1,250 @@
+import json
+from datetime import date
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from applications.models import Application
+from .cache import bootstrap_cache_key
+from .models import Agency, FormSchemaSnapshot, JobPost
+
+
+class JobPostCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = Agency.objects.create(name='Counter Agency', code='CTA')
+        cls.job_post = JobPost.objects.create(agency=agency, title='Clerk', description='', form_schema={'fields': []})
+
+    def apply(self):
+        return Application.objects.create(
+            job_post=self.job_post, full_name='Asha Rao', email='asha@example.com', phone='9000000000', form_data={},
+            photo='applications/photos/photo.jpg', signature='applications/signatures/sig.png',
+        )
+
+    def test_counters_follow_creates_status_changes_and_deletes(self):
+        first, second, third = self.apply(), self.apply(), self.apply()
+        first.status = 'shortlisted'
+        first.save()
+        stale = Application.objects.get(pk=second.pk)
+        second.status = 'hired'
+        second.save()
+        stale.status = 'rejected'  # Moves the application from hired, not from the stale pending
+        stale.save()
+        third.delete()
+
+        self.job_post.refresh_from_db()
+        self.assertEqual(self.job_post.application_count, 2)
+        self.assertEqual(self.job_post.get_status_counts(),
+                         {'pending': 0, 'reviewing': 0, 'shortlisted': 1, 'rejected': 1, 'hired': 0})
+
+    def test_saving_a_job_post_keeps_concurrent_counts(self):
+        job_post = JobPost.objects.get(pk=self.job_post.pk)
+        self.apply()
+        job_post.title = 'Senior Clerk'
+        job_post.save()
+        job_post.refresh_from_db()
+        self.assertEqual((job_post.title, job_post.application_count), ('Senior Clerk', 1))
+
+    def test_counters_in_api(self):
+        self.apply()
+        data = APIClient().get(f'/api/job-posts/{self.job_post.pk}/').json()
+        self.assertEqual(data['application_count'], 1)
+        self.assertEqual(data['status_counts']['pending'], 1)
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        self.apply()
+        JobPost.objects.filter(pk=self.job_post.pk).update(application_count=5, pending_count=0)
+
+        output = StringIO()
+        call_command('reconcile_job_post_counters', stdout=output)
+        self.assertIn('application_count 5 -> 1', output.getvalue())
+        self.assertEqual(JobPost.objects.get(pk=self.job_post.pk).application_count, 5)
+
+        call_command('reconcile_job_post_counters', '--fix', stdout=StringIO())
+        self.job_post.refresh_from_db()
+        self.assertEqual((self.job_post.application_count, self.job_post.pending_count), (1, 1))
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Cache Agency', code='CCH')
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': []})
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def revalidate(self, url, response, queries):
+        with self.assertNumQueries(queries):
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+        return again
+
+    def test_agency_detail_revalidates_until_updated(self):
+        url = f'/api/agencies/{self.agency.code}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage=300', response['Cache-Control'])
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.revalidate(url, response, queries=1)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        self.agency.description = 'Now hiring'
+        self.agency.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_job_post_list_etag_ignores_submissions(self):
+        url = f'/api/agencies/{self.agency.code}/job_posts/'
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()), 1)
+        self.assertNotIn('application_count', response.json()[0])
+        self.assertNotIn('status_counts', response.json()[0])
+        self.revalidate(url, response, queries=1)
+
+        JobPost.adjust_application_counts(self.job_post.pk, pending=1)
+        self.revalidate(url, response, queries=1)
+
+        self.job_post.title = 'Senior Clerk'
+        self.job_post.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()[0]['title'], 'Senior Clerk')
+
+    def test_form_schema_etag_is_snapshot_checksum(self):
+        url = f'/api/job-posts/{self.job_post.pk}/form_schema/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        again = self.revalidate(url, response, queries=1)
+        self.assertEqual(again['X-Form-Schema-Version'], response['X-Form-Schema-Version'])
+
+        self.job_post.form_schema = {'fields': [{'name': 'gender', 'type': 'text', 'label': 'Gender'}]}
+        self.job_post.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_form_schema_of_unknown_job_post_is_not_found(self):
+        for pk in ('abc', '999999'):
+            self.assertEqual(self.client.get(f'/api/job-posts/{pk}/form_schema/').status_code, 404)
+
+    def test_signed_in_responses_are_private(self):
+        self.client.force_authenticate(User.objects.create_user('staff'))
+        response = self.client.get(f'/api/agencies/{self.agency.code}/')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('public', response['Cache-Control'])
+
+
+class AgencyBootstrapTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Boot Agency', code='BOOT')
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='',
+                                              form_schema={'fields': [{'name': 'gender', 'type': 'text'}]})
+        JobPost.objects.create(agency=cls.agency, title='Closed', description='', form_schema={'fields': []},
+                               is_active=False)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = f'/api/agencies/{self.agency.code}/bootstrap/'
+
+    def test_returns_agency_active_posts_and_merged_schemas(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['agency']['code'], 'BOOT')
+        self.assertEqual([post['title'] for post in data['job_posts']], ['Clerk'])
+        names = [field['name'] for field in data['job_posts'][0]['form_schema']['fields']]
+        self.assertIn('gender', names)
+        self.assertIn('full_name', names)  # From the agency default schema
+
+    def test_cached_until_a_save(self):
+        self.client.get(self.url)
+        # One cache read
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+        self.job_post.title = 'Senior Clerk'
+        self.job_post.save()
+        self.assertEqual(self.client.get(self.url).json()['job_posts'][0]['title'], 'Senior Clerk')
+
+        self.agency.name = 'Renamed Agency'
+        self.agency.save()
+        self.assertEqual(self.client.get(self.url).json()['agency']['name'], 'Renamed Agency')
+
+    def test_save_clears_the_entry_for_every_process(self):
+        self.client.get(self.url)
+        # Another process's connection to the cache
+        other = caches.create_connection('default')
+        self.assertIsNotNone(other.get(bootstrap_cache_key(self.agency.code)))
+        self.job_post.save()
+        self.assertIsNone(other.get(bootstrap_cache_key(self.agency.code)))
+
+    def test_unknown_agency(self):
+        self.assertEqual(self.client.get('/api/agencies/NOPE/bootstrap/').status_code, 404)
+
+
+class FormSchemaPublishTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Schema Agency', code='SCH', default_form_schema={
+            'as_on_date': '2025-01-01',
+            'fields': [{'name': 'full_name', 'type': 'text', 'label': 'Full Name'},
+                       {'name': 'gender', 'type': 'text', 'label': 'Gender'}],
+        })
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={
+            'as_on_date': '2025-06-30',
+            'fields': [{'name': 'gender', 'type': 'select', 'label': 'Gender', 'options': ['F', 'M']},
+                       {'name': 'typing_speed', 'type': 'number', 'label': 'Typing speed'}],
+        })
+
+    def test_job_fields_override_agency_defaults(self):
+        snapshot = self.job_post.current_schema
+        self.assertEqual(snapshot.version, 1)
+        self.assertEqual([(field['name'], field['type']) for field in snapshot.schema['fields']],
+                         [('full_name', 'text'), ('gender', 'select'), ('typing_speed', 'number')])
+        self.assertEqual(snapshot.as_on_date, date(2025, 6, 30))
+        self.assertEqual(json.loads(snapshot.content), snapshot.schema)
+
+    def test_unchanged_schema_reuses_the_snapshot(self):
+        snapshot = self.job_post.current_schema
+        self.job_post.title = 'Senior Clerk'
+        self.job_post.save()
+        self.agency.save()
+        self.assertEqual(JobPost.objects.get(pk=self.job_post.pk).current_schema_id, snapshot.pk)
+        self.assertEqual(FormSchemaSnapshot.objects.filter(job_post=self.job_post).count(), 1)
+
+    def test_changes_publish_new_versions(self):
+        first = self.job_post.current_schema
+        self.job_post.form_schema = {'fields': []}
+        self.job_post.save()
+        self.agency.default_form_schema = {'fields': [{'name': 'email', 'type': 'email', 'label': 'Email'}]}
+        self.agency.save()
+
+        current = JobPost.objects.get(pk=self.job_post.pk).current_schema
+        self.assertEqual(current.version, 3)
+        self.assertEqual([field['name'] for field in current.schema['fields']], ['email'])
+        # Applications keep pointing at the version they were submitted against
+        self.assertTrue(FormSchemaSnapshot.objects.filter(pk=first.pk).exists())
+
+    def test_stale_instances_take_the_next_version(self):
+        stale = JobPost.objects.get(pk=self.job_post.pk)
+        self.job_post.form_schema = {'fields': []}
+        self.job_post.save()
+        with CaptureQueriesContext(connection) as queries:
+            stale.form_schema = {'fields': [{'name': 'age', 'type': 'number', 'label': 'Age'}]}
+            stale.save()
+        self.assertTrue(any('FOR UPDATE' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual(list(FormSchemaSnapshot.objects.filter(job_post=self.job_post).values_list('version', flat=True)),
+                         [3, 2, 1])
 
-# Create your tests here.
+        # Content another instance already published is reused, not stored again
+        stale = JobPost.objects.get(pk=self.job_post.pk)
+        stale.current_schema = FormSchemaSnapshot.objects.get(job_post=self.job_post, version=2)
+        stale.publish_form_schema()
+        self.assertEqual(stale.current_schema.version, 3)
+        self.assertEqual(FormSchemaSnapshot.objects.filter(job_post=self.job_post).count(), 3)
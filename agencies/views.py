@@ -3,8 +3,13 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404, HttpResponse
+from .bootstrap import get_bootstrap
 from .models import Agency, JobPost
-from .serializers import AgencySerializer, JobPostSerializer
+from .serializers import AgencySerializer, JobPostSerializer, PublicJobPostSerializer
+from common.conditional import make_etag, not_modified, set_validators
+from common.pagination import CreatedAtCursorPagination
 
 # Create your views here.
 
@@ -14,56 +19,76 @@ class AgencyViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     lookup_field = 'code'
 
+    def retrieve(self, request, *args, **kwargs):
+        # Validators come from updated_at alone, so a 304 costs one narrow query
+        updated_at = Agency.objects.filter(code=kwargs['code']).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag = make_etag(kwargs['code'], updated_at, request.accepted_renderer.format)
+        response = not_modified(request, etag, updated_at)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return set_validators(request, response, etag, updated_at)
+
     @action(detail=True, methods=['get'])
     def job_posts(self, request, code=None):
-        agency = self.get_object()
-        job_posts = JobPost.objects.filter(agency=agency, is_active=True)
-        serializer = JobPostSerializer(job_posts, many=True)
-        return Response(serializer.data)
+        job_posts = JobPost.objects.filter(agency__code=code, is_active=True).select_related('agency')
+        # Public and CDN-cacheable, so applicant counters are left out and submissions don't change
+        # the ETag. There is no Last-Modified: posts leaving the list would not move it forward
+        versions = list(job_posts.values_list('id', 'updated_at', 'agency__updated_at'))
+        etag = make_etag(code, versions, request.accepted_renderer.format)
+        response = not_modified(request, etag) if versions else None
+        if response is None:
+            agency = self.get_object()
+            serializer = PublicJobPostSerializer(job_posts.filter(agency=agency), many=True)
+            response = Response(serializer.data)
+        return set_validators(request, response, etag)
+
+    @action(detail=True, methods=['get'])
+    def bootstrap(self, request, code=None):
+        # Agency, active job posts and their form schemas in one response, usually straight from the cache
+        entry = get_bootstrap(code)
+        if entry is None:
+            return Response({'error': 'Agency not found'}, status=status.HTTP_404_NOT_FOUND)
+        response = not_modified(request, entry['etag'])
+        if response is None:
+            response = HttpResponse(entry['content'], content_type='application/json')
+        return set_validators(request, response, entry['etag'])
 
 class JobPostViewSet(viewsets.ModelViewSet):
     queryset = JobPost.objects.all()
     serializer_class = JobPostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
     
     def get_queryset(self):
-        queryset = JobPost.objects.all()
+        queryset = JobPost.objects.select_related('agency')
         agency_code = self.request.query_params.get('agency', None)
         if agency_code:
             queryset = queryset.filter(agency__code=agency_code)
+        if self.action == 'form_schema':
+            queryset = queryset.select_related('current_schema').defer('current_schema__schema')
         return queryset
 
     @action(detail=True, methods=['get'])
     def form_schema(self, request, pk=None):
+        # Snapshots are immutable, so their checksum validates the content without loading it
+        try:
+            pk = JobPost._meta.pk.to_python(pk)
+        except DjangoValidationError:
+            raise Http404
+        current = self.get_queryset().filter(pk=pk).values_list(
+            'current_schema__checksum', 'current_schema__version', 'current_schema__created_at',
+        ).first()
+        if current and current[0]:
+            checksum, version, created_at = current
+            response = not_modified(request, make_etag(checksum), created_at)
+            if response is not None:
+                response['X-Form-Schema-Version'] = version
+                return response
         job_post = self.get_object()
-        # Get default schema from agency
-        default_schema = job_post.agency.default_form_schema
-        job_schema = job_post.form_schema
-
-        # Merge schemas
-        merged_schema = {
-            "fields": [],
-            "as_on_date": default_schema.get("as_on_date") 
-        }
-
-        # Add default fields
-        if "fields" in default_schema:
-            merged_schema["fields"].extend(default_schema["fields"])
-
-        # Add or override with job-specific fields
-        if "fields" in job_schema:
-            # Create a map of existing fields by name
-            field_map = {field["name"]: field for field in merged_schema["fields"]}
-            
-            # Add or update fields from job schema
-            for field in job_schema["fields"]:
-                field_map[field["name"]] = field
-            
-            # Convert back to list
-            merged_schema["fields"] = list(field_map.values())
-
-        # Override as_on_date if it exists in job_schema
-        if "as_on_date" in job_schema:
-            merged_schema["as_on_date"] = job_schema.get("as_on_date")
-
-        return Response(merged_schema)
+        snapshot = job_post.current_schema or job_post.publish_form_schema()
+        # Serve the pre-merged snapshot as stored, without decoding it
+        response = HttpResponse(snapshot.content, content_type='application/json')
+        response['X-Form-Schema-Version'] = snapshot.version
+        return set_validators(request, response, make_etag(snapshot.checksum), snapshot.created_at)
@@ -1,10 +1,41 @@
-from django.contrib import admin
-from .models import Application, ApplicationDocument
+from django.contrib import admin, messages
+from common.tasks import enqueue
+from .models import (Application, ApplicationDocument, ApplicationImport, ApplicationStatusChange,
+                     AgencyApplicationSequence)
+from .export import export_response
+from .search import search_applications
+from .transitions import statuses_moving_to, transition_applications
+
+
+def make_transition_action(status, label):
+    def move(modeladmin, request, queryset):
+        moved = transition_applications(queryset, status, changed_by=request.user)
+        skipped = queryset.count() - moved
+        modeladmin.message_user(request, f'Moved {moved} application(s) to {label}.', messages.SUCCESS)
+        if skipped:
+            modeladmin.message_user(
+                request, f'Skipped {skipped} application(s) that cannot move to {label} from their current status.',
+                messages.WARNING
+            )
+    move.__name__ = f'move_to_{status}'
+    return admin.action(description=f'Move selected applications to {label}')(move)
+
+
+class ApplicationStatusChangeInline(admin.TabularInline):
+    model = ApplicationStatusChange
+    extra = 0
+    fields = ('changed_at', 'old_status', 'new_status', 'changed_by', 'note')
+    readonly_fields = fields
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 class ApplicationDocumentInline(admin.TabularInline):
     model = ApplicationDocument
     extra = 0
-    readonly_fields = ('uploaded_at',)
+    fields = ('document_type', 'file', 'status', 'uploaded_at')
+    readonly_fields = ('status', 'uploaded_at')
 
 @admin.register(Application)
 class ApplicationAdmin(admin.ModelAdmin):
@@ -12,13 +43,67 @@ class ApplicationAdmin(admin.ModelAdmin):
     list_filter = ('status', 'job_post__agency', 'created_at')
     search_fields = ('full_name', 'email', 'job_post__title', 'custom_application_id')
     readonly_fields = ('custom_application_id', 'ip_address', 'created_at', 'updated_at', 'get_total_experience')
-    inlines = [ApplicationDocumentInline]
+    list_select_related = ('job_post__agency',)
+    inlines = [ApplicationDocumentInline, ApplicationStatusChangeInline]
     ordering = ('-created_at',)
+    actions = ['export_csv', 'export_xlsx', *(
+        make_transition_action(status, label) for status, label in Application.STATUS_CHOICES
+        if statuses_moving_to(status)
+    )]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('search_vector')
+
+    def save_model(self, request, obj, form, change):
+        obj.status_changed_by = request.user
+        super().save_model(request, obj, form, change)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed search (applications.search) instead of icontains over search_fields.
+        # The changelist re-orders by its own ordering, so scoring matches would be wasted work
+        if not search_term.strip():
+            return queryset, False
+        return search_applications(queryset, search_term, rank=False), False
+
+    @admin.action(description='Export selected applications as CSV')
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv')
+
+    @admin.action(description='Export selected applications as Excel')
+    def export_xlsx(self, request, queryset):
+        return export_response(queryset, 'xlsx')
 
 @admin.register(ApplicationDocument)
 class ApplicationDocumentAdmin(admin.ModelAdmin):
-    list_display = ('application', 'document_type', 'uploaded_at')
-    list_filter = ('document_type', 'uploaded_at')
+    list_display = ('application', 'document_type', 'status', 'uploaded_at')
+    list_filter = ('document_type', 'status', 'uploaded_at')
     search_fields = ('application__first_name', 'application__last_name', 'document_type')
-    readonly_fields = ('uploaded_at',)
+    readonly_fields = ('status', 'staged_file', 'error', 'processed_at', 'uploaded_at')
     ordering = ('-uploaded_at',)
+
+@admin.register(AgencyApplicationSequence)
+class AgencyApplicationSequenceAdmin(admin.ModelAdmin):
+    list_display = ('agency', 'last_value')
+    search_fields = ('agency__name', 'agency__code')
+
+@admin.register(ApplicationImport)
+class ApplicationImportAdmin(admin.ModelAdmin):
+    list_display = ('job_post', 'file', 'status', 'imported_rows', 'rejected_rows', 'created_by', 'created_at')
+    list_filter = ('status', 'job_post__agency')
+    list_select_related = ('job_post__agency', 'created_by')
+    readonly_fields = ('status', 'total_rows', 'imported_rows', 'rejected_rows', 'last_row', 'report', 'error',
+                       'created_by', 'created_at', 'finished_at')
+    ordering = ('-created_at',)
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is not None:
+            return ('job_post', 'file', 'allow_missing_files', *self.readonly_fields)
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # Everything is read-only once uploaded
+            return
+        obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        enqueue('applications.import_applications', import_id=obj.pk)
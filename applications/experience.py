@@ -0,0 +1,53 @@
+from datetime import date
+
+
+def _parse(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def total_experience_days(work_experience, as_on_date=None):
+    """
+    Count the days covered by work experience entries, inclusive of both
+    dates. Overlapping or adjacent periods are merged so concurrent jobs are
+    only counted once, and periods are capped at as_on_date. A period with
+    no to_date is still running and ends at as_on_date; without an
+    as_on_date it is skipped, as the stored total would drift.
+    """
+    if not isinstance(work_experience, list):
+        return 0
+
+    intervals = []
+    for exp in work_experience:
+        if not isinstance(exp, dict):
+            continue
+        from_date = _parse(exp.get('from_date'))
+        to_date = _parse(exp.get('to_date')) if exp.get('to_date') else as_on_date
+        if not from_date or not to_date:
+            continue
+        # Use as_on_date if to_date is after as_on_date
+        if as_on_date and to_date > as_on_date:
+            to_date = as_on_date
+        if to_date >= from_date:
+            intervals.append((from_date, to_date))
+
+    total_days = 0
+    current_start = current_end = None
+    for start, end in sorted(intervals):
+        if current_end is not None and start.toordinal() <= current_end.toordinal() + 1:
+            current_end = max(current_end, end)
+            continue
+        if current_end is not None:
+            total_days += (current_end - current_start).days + 1
+        current_start, current_end = start, end
+    if current_end is not None:
+        total_days += (current_end - current_start).days + 1
+    return total_days
+
+
+def format_experience(total_days):
+    years = total_days // 365
+    days = total_days % 365
+    return f"{years} years {days} days"
@@ -0,0 +1,185 @@
+import csv
+import io
+import json
+import tempfile
+
+from django.db import connection
+from django.db.models import Max
+from django.db.models.expressions import RawSQL
+from django.http import FileResponse, StreamingHttpResponse
+
+from agencies.models import FormSchemaSnapshot
+from agencies.schemas import subfields_of
+
+CHUNK_SIZE = 2000
+
+BASE_COLUMNS = [
+    ('Application ID', 'custom_application_id'),
+    ('Job Post', 'job_post__title'),
+    ('Full Name', 'full_name'),
+    ('Email', 'email'),
+    ('Phone', 'phone'),
+    ('Status', 'status'),
+    ('Total Experience (days)', 'total_experience_days'),
+    ('Submitted At', 'created_at'),
+    ('Photo', 'photo'),
+    ('Signature', 'signature'),
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    value = str(value)
+    # Keep spreadsheet apps from evaluating applicant input as formulas
+    if value[:1] in ('=', '+', '-', '@'):
+        return f"'{value}"
+    return value
+
+
+def _schema_fields(queryset):
+    """
+    Ordered union of the merged schema fields of every job post in the queryset.
+    """
+    snapshot_ids = queryset.order_by().values('job_post__current_schema').distinct()
+    fields = {}
+    for schema in FormSchemaSnapshot.objects.filter(pk__in=snapshot_ids).order_by('pk').values_list('schema', flat=True):
+        for field in schema.get('fields', []):
+            fields.setdefault(field['name'], field)
+    return list(fields.values())
+
+
+def _array_lengths(queryset, array_fields):
+    """
+    Longest list stored under each array field, computed in the database.
+    """
+    if not array_fields:
+        return {}
+    form_data = f'{connection.ops.quote_name(queryset.model._meta.db_table)}.form_data'
+    aggregates = {
+        name: Max(RawSQL(
+            f"CASE WHEN jsonb_typeof({form_data} -> %s) = 'array' THEN jsonb_array_length({form_data} -> %s) ELSE 0 END",
+            (name, name),
+        ))
+        for name in array_fields
+    }
+    lengths = queryset.order_by().aggregate(**aggregates)
+    return {name: length or 0 for name, length in lengths.items()}
+
+
+def _subfield_names(field):
+    return [subfield['name'] for subfield in subfields_of(field)]
+
+
+def build_columns(queryset):
+    """
+    Return (header, getter) pairs. Group and array fields in form_data are
+    flattened into one column per subfield (and per array item).
+    """
+    columns = [(header, lambda row, key=key: row[key]) for header, key in BASE_COLUMNS]
+    fields = _schema_fields(queryset)
+    lengths = _array_lengths(queryset, [field['name'] for field in fields if field.get('type') == 'array'])
+
+    base_keys = {key for _, key in BASE_COLUMNS}
+    for field in fields:
+        name = field['name']
+        if name in base_keys:
+            # Already exported from the model column
+            continue
+        if field.get('type') == 'group':
+            for sub in _subfield_names(field):
+                columns.append((f'{name}.{sub}', lambda row, name=name, sub=sub: (
+                    _as_dict(row['form_data'].get(name)).get(sub)
+                )))
+        elif field.get('type') == 'array':
+            for index in range(lengths.get(name, 0)):
+                for sub in _subfield_names(field):
+                    columns.append((f'{name}.{index + 1}.{sub}', lambda row, name=name, index=index, sub=sub: (
+                        _array_item(row['form_data'].get(name), index).get(sub)
+                    )))
+        else:
+            columns.append((name, lambda row, name=name: row['form_data'].get(name)))
+    return columns
+
+
+def _as_dict(value):
+    return value if isinstance(value, dict) else {}
+
+
+def _array_item(items, index):
+    if isinstance(items, list) and index < len(items):
+        return _as_dict(items[index])
+    return {}
+
+
+def iter_rows(queryset):
+    """
+    Stream application rows as dicts using a server-side cursor.
+    """
+    keys = [key for _, key in BASE_COLUMNS] + ['form_data']
+    rows = queryset.prefetch_related(None).order_by('created_at', 'id').values(*keys)
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        if not isinstance(row['form_data'], dict):
+            row['form_data'] = {}
+        yield row
+
+
+def stream_csv(queryset):
+    columns = build_columns(queryset)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in columns])
+    for count, row in enumerate(iter_rows(queryset), start=1):
+        writer.writerow([_cell(getter(row)) for _, getter in columns])
+        if count % 500 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(queryset):
+    for row in iter_rows(queryset):
+        yield json.dumps(row, ensure_ascii=False, default=str) + '\n'
+
+
+def write_xlsx(queryset):
+    """
+    Write an XLSX workbook in openpyxl's write-only mode, which spools rows to
+    disk instead of keeping them in memory. Returns an open temporary file.
+    """
+    from openpyxl import Workbook
+
+    columns = build_columns(queryset)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Applications')
+    sheet.append([header for header, _ in columns])
+    for row in iter_rows(queryset):
+        sheet.append([_cell(getter(row)) for _, getter in columns])
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+def export_response(queryset, export_format, filename='applications'):
+    """
+    Build a streaming download of the queryset in csv, ndjson or xlsx format.
+    """
+    filename = f'{filename}.{export_format}'
+    if export_format == 'xlsx':
+        return FileResponse(write_xlsx(queryset), as_attachment=True, filename=filename,
+                            content_type=CONTENT_TYPES['xlsx'])
+    stream = stream_ndjson(queryset) if export_format == 'ndjson' else stream_csv(queryset)
+    response = StreamingHttpResponse(stream, content_type=CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
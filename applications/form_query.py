@@ -0,0 +1,191 @@
+import hashlib
+import json
+import re
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import BooleanField, DecimalField, Func, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.fields.json import KeyTextTransform
+
+from agencies.schemas import subfields_of
+from .models import Application
+
+# Filters on form_data are query parameters of the form form.<path>[__<op>]=<value>:
+#   ?form.gender=Female
+#   ?form.permanent_address.state=Kerala
+#   ?form.education_qualifications[].board=CBSE,ICSE         (with __in)
+#   ?form.education_qualifications[].percentage__gte=60
+# "[]" matches any item of an array. Each filter is matched on its own, so two
+# filters on the same array may be satisfied by different items.
+PARAM_PREFIX = 'form.'
+LOOKUPS = {'eq': 'exact', 'in': 'in', 'gt': 'gt', 'gte': 'gte', 'lt': 'lt', 'lte': 'lte'}
+JSONPATH_OPERATORS = {'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+_KEY_RE = re.compile(r'^[A-Za-z0-9_]+$')
+_NUMBER_RE = re.compile(r'^-?\d+(\.\d+)?$')
+
+
+class FormFilterError(ValueError):
+    pass
+
+
+class FormDataNumeric(Func):
+    """
+    form_data_numeric(text): the value as numeric, or NULL when it is not a
+    number. Immutable, so it can back an expression index (migration 0013).
+    """
+    function = 'form_data_numeric'
+    output_field = DecimalField()
+
+
+def parse_path(path):
+    """
+    Split 'a[].b' into [('a', True), ('b', False)]; True marks a key holding
+    an array whose items are matched.
+    """
+    steps = []
+    for part in path.split('.'):
+        is_array = part.endswith('[]')
+        key = part[:-2] if is_array else part
+        if not _KEY_RE.match(key):
+            raise FormFilterError(f'Invalid field path "{path}".')
+        steps.append((key, is_array))
+    if steps[-1][1]:
+        raise FormFilterError(f'Field path "{path}" must end with a field name.')
+    return steps
+
+
+def _nest(steps, value):
+    # The JSON document that form_data -> top @> needs to match ``value`` at the path
+    (_, top_is_array), rest = steps[0], steps[1:]
+    for key, is_array in reversed(rest):
+        value = {key: [value] if is_array else value}
+    return [value] if top_is_array else value
+
+
+def _json_candidates(value):
+    # Query strings carry text, but numbers may have been submitted either way
+    if _NUMBER_RE.match(value):
+        number = Decimal(value)
+        return [value, int(number) if number == number.to_integral_value() else float(number)]
+    return [value]
+
+
+def _column():
+    return f'{connection.ops.quote_name(Application._meta.db_table)}.form_data'
+
+
+def apply_form_filter(queryset, path, operator, value, alias):
+    """
+    Narrow ``queryset`` by one form_data filter, compiled to SQL that the
+    indexes from form_data_indexes() can serve.
+    """
+    steps = parse_path(path)
+    if operator not in LOOKUPS:
+        raise FormFilterError(f'Unknown operator "{operator}". Use one of: {", ".join(LOOKUPS)}.')
+    values = value.split(',') if operator == 'in' else [value]
+    numeric = all(_NUMBER_RE.match(item) for item in values)
+    top, top_is_array = steps[0]
+
+    if len(steps) == 1 and not top_is_array:
+        # (form_data ->> 'key') or form_data_numeric(form_data ->> 'key'), both btree-indexed
+        if operator in JSONPATH_OPERATORS and numeric:
+            expression = FormDataNumeric(KeyTextTransform(top, 'form_data'))
+            values = [Decimal(item) for item in values]
+        else:
+            expression = KeyTextTransform(top, 'form_data')
+        lookup = f'{alias}__{LOOKUPS[operator]}'
+        return queryset.alias(**{alias: expression}).filter(**{lookup: values if operator == 'in' else values[0]})
+
+    if operator in ('eq', 'in'):
+        # Containment on form_data -> 'top', served by its GIN (jsonb_path_ops) index
+        condition = Q()
+        for item in values:
+            for candidate in _json_candidates(item):
+                condition |= Q(**{f'form_data__{top}__contains': _nest(steps, candidate)})
+        return queryset.filter(condition)
+
+    # Ranges below the top level run as jsonpath inside PostgreSQL; no index type covers them
+    jsonpath = '$' + ''.join(f'."{key}"' + ('[*]' if is_array else '') for key, is_array in steps[:-1])
+    last = steps[-1][0]
+    if numeric:
+        jsonpath += f' ? (@."{last}".double() {JSONPATH_OPERATORS[operator]} $value)'
+        variables = {'value': float(value)}
+    else:
+        jsonpath += f' ? (@."{last}" {JSONPATH_OPERATORS[operator]} $value)'
+        variables = {'value': value}
+    return queryset.filter(RawSQL(
+        f'jsonb_path_exists({_column()}, %s::jsonpath, %s::jsonb, true)',
+        (jsonpath, json.dumps(variables)),
+        output_field=BooleanField(),
+    ))
+
+
+def apply_form_filters(queryset, query_params):
+    """
+    Apply every form.<path>[__<op>] query parameter to ``queryset``.
+    Raises FormFilterError for malformed filters.
+    """
+    for index, (param, value) in enumerate(sorted(query_params.items())):
+        if not param.startswith(PARAM_PREFIX):
+            continue
+        path, _, operator = param[len(PARAM_PREFIX):].partition('__')
+        queryset = apply_form_filter(queryset, path, operator or 'eq', value, alias=f'form_filter_{index}')
+    return queryset
+
+
+def _index_name(kind, key):
+    digest = hashlib.sha256(key.encode()).hexdigest()[:8]
+    return f'app_form_{kind}_{key[:30]}_{digest}'
+
+
+def form_data_indexes(schema):
+    """
+    (name, CREATE INDEX statement) for each field of a form schema marked
+    ``"indexed": true``, matching the SQL apply_form_filter generates:
+    - group/array fields (or ones with indexed subfields): GIN jsonb_path_ops
+      on form_data -> 'field', for equality filters on nested values
+    - other fields: btree on form_data ->> 'field', plus form_data_numeric()
+      of it for number fields, for equality and range filters
+    """
+    table = connection.ops.quote_name(Application._meta.db_table)
+    indexes = []
+    for field in schema.get('fields', []):
+        key = field.get('name', '')
+        if not _KEY_RE.match(key):
+            continue
+        subfields = subfields_of(field)
+        if field.get('type') in ('group', 'array'):
+            if field.get('indexed') or any(sub.get('indexed') for sub in subfields):
+                indexes.append((_index_name('gin', key), f"USING gin ((form_data -> '{key}') jsonb_path_ops)"))
+        elif field.get('indexed'):
+            indexes.append((_index_name('text', key), f"((form_data ->> '{key}'))"))
+            if field.get('type') == 'number':
+                indexes.append((_index_name('num', key), f"(form_data_numeric(form_data ->> '{key}'))"))
+    return [(name, f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}')
+            for name, definition in indexes]
+
+
+def sync_form_data_indexes(schema):
+    """
+    Build the indexes form_data_indexes() lists for ``schema``. Must run
+    outside a transaction; a build that failed part way leaves an invalid
+    index behind, which is dropped and rebuilt.
+    Returns: names of the indexes built
+    """
+    built = []
+    with connection.cursor() as cursor:
+        for name, statement in form_data_indexes(schema):
+            cursor.execute(
+                'SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = %s',
+                [name],
+            )
+            row = cursor.fetchone()
+            if row and row[0]:
+                continue
+            if row:
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            cursor.execute(statement)
+            built.append(name)
+    return built
@@ -0,0 +1,48 @@
+import io
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# (width, height, mode) per rendition. 'fit' crops to exactly that size,
+# 'pad' letterboxes onto white, 'bound' only shrinks to fit inside it.
+RENDITIONS = {
+    'photo': {
+        'thumbnail': (150, 200, 'fit'),
+        'review': (600, 800, 'bound'),
+    },
+    'signature': {
+        'thumbnail': (240, 80, 'pad'),
+        'review': (900, 300, 'bound'),
+    },
+}
+
+JPEG_QUALITY = 85
+
+
+def render_image(source, width, height, mode):
+    """
+    Re-encode an uploaded image as a JPEG of the given size. EXIF orientation
+    is applied to the pixels and no metadata (EXIF, GPS, ICC, comments) is
+    carried over. Returns a ContentFile.
+    """
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Flatten transparency (common in signature PNGs) onto white
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+
+        if mode == 'fit':
+            image = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        elif mode == 'pad':
+            image = ImageOps.pad(image, (width, height), Image.Resampling.LANCZOS, color='white')
+        else:
+            image.thumbnail((width, height), Image.Resampling.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return ContentFile(output.getvalue())
@@ -0,0 +1,295 @@
+import csv
+import io
+import json
+import re
+from collections import Counter, namedtuple
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import F
+
+from agencies.models import JobPost
+from agencies.schemas import subfields_of
+from common.models import StoredBlob
+from common.storage import BLOB_PREFIX
+from common.tasks import enqueue_many
+from dashboard import rollups
+from .export import BASE_COLUMNS
+from .models import AgencyApplicationSequence, Application
+from .validation import REQUIRED_MESSAGE, get_form_validator
+
+IMPORT_BATCH_SIZE = 1000
+
+# Application columns an import may set, by field name or by export header
+MODEL_FIELDS = ['full_name', 'email', 'phone', 'status', 'notes', 'photo', 'signature']
+MODEL_HEADERS = {header: key for header, key in BASE_COLUMNS if key in MODEL_FIELDS}
+# Export columns that are derived or assigned on import
+IGNORED_HEADERS = {header for header, key in BASE_COLUMNS if key not in MODEL_FIELDS}
+REQUIRED_MODEL_FIELDS = ['full_name', 'email', 'phone']
+
+TRUE_VALUES = {'true', 'yes', 'y', '1'}
+FALSE_VALUES = {'false', 'no', 'n', '0'}
+_ARRAY_COLUMN_RE = re.compile(r'^([^.]+)\.(\d+)\.([^.]+)$')
+
+ImportResult = namedtuple('ImportResult', ['total', 'imported', 'rejected'])
+
+
+def _field_types(schema):
+    """
+    {'name': type, 'group.sub': type} for every field and subfield.
+    """
+    types = {}
+    for field in schema.get('fields', []):
+        types[field['name']] = field.get('type', 'text')
+        for sub in subfields_of(field):
+            types[f"{field['name']}.{sub['name']}"] = sub.get('type', 'text')
+    return types
+
+
+def _cell_value(value, field_type):
+    # Undo the formula guard export adds, and turn checkbox text into booleans
+    if value[:1] == "'" and value[1:2] in ('=', '+', '-', '@'):
+        value = value[1:]
+    if field_type == 'checkbox':
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+    return value
+
+
+def read_csv(file, schema):
+    """
+    Yield (row number, record, raw row) from CSV in the layout export writes:
+    model columns, then form fields as 'field', 'group.sub' and 'array.N.sub'.
+    """
+    types = _field_types(schema)
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    for number, raw in enumerate(reader, start=1):
+        record, form_data, arrays = {}, {}, {}
+        for header, value in raw.items():
+            if header is None or header in IGNORED_HEADERS or not value:
+                continue
+            header = header.strip()
+            if header in MODEL_HEADERS or header in MODEL_FIELDS:
+                record[MODEL_HEADERS.get(header, header)] = value
+                continue
+            match = _ARRAY_COLUMN_RE.match(header)
+            if match and types.get(match[1]) == 'array':
+                name, index, sub = match[1], int(match[2]), match[3]
+                item = arrays.setdefault(name, {}).setdefault(index, {})
+                item[sub] = _cell_value(value, types.get(f'{name}.{sub}'))
+            elif '.' in header and types.get(header.split('.', 1)[0]) == 'group':
+                name, sub = header.split('.', 1)
+                form_data.setdefault(name, {})[sub] = _cell_value(value, types.get(header))
+            else:
+                form_data[header] = _cell_value(value, types.get(header))
+        for name, items in arrays.items():
+            form_data[name] = [items[index] for index in sorted(items)]
+        record['form_data'] = form_data
+        yield number, record, raw
+
+
+def read_ndjson(file, schema):
+    """
+    Yield (line number, record, raw line) from NDJSON as export writes it:
+    one object per line with model fields and a form_data object. Objects
+    without form_data are taken as form_data with model fields mixed in.
+    """
+    for number, line in enumerate(io.TextIOWrapper(file, encoding='utf-8'), start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError:
+            yield number, None, line
+            continue
+        if not isinstance(data, dict):
+            yield number, None, line
+            continue
+        if isinstance(data.get('form_data'), dict):
+            record = {key: data[key] for key in MODEL_FIELDS if data.get(key) not in (None, '')}
+            record['form_data'] = data['form_data']
+        else:
+            record = {key: data.pop(key) for key in MODEL_FIELDS if data.get(key) not in (None, '')}
+            record['form_data'] = data
+        yield number, record, line
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+class ApplicationImporter:
+    """
+    Validate records against a job post's compiled form schema and insert the
+    valid ones with bulk_create, one transaction per batch. Each batch takes a
+    block of custom application IDs with a single allocation and updates the
+    dashboard rollups, JobPost counters and blob reference counts with one
+    statement per distinct value. Rejected rows are written to ``report`` as
+    CSV (row, errors, data).
+    """
+
+    def __init__(self, job_post, report=None, batch_size=IMPORT_BATCH_SIZE, allow_missing_files=False,
+                 on_batch=None):
+        self.job_post = JobPost.objects.select_related('agency', 'current_schema').get(pk=job_post.pk)
+        self.snapshot = self.job_post.current_schema
+        self.schema = self.snapshot.schema if self.snapshot else {'fields': []}
+        self.validator = get_form_validator(self.snapshot) if self.snapshot else None
+        self.file_fields = [name for name, (field_type, _, _) in (self.validator.fields.items() if self.validator else [])
+                            if field_type == 'file']
+        self.batch_size = batch_size
+        self.allow_missing_files = allow_missing_files
+        # Called inside each batch's transaction with the ImportResult so far and the last row number
+        # in the batch, so progress commits with the rows
+        self.on_batch = on_batch
+        self.report = csv.writer(report) if report is not None else None
+        if self.report:
+            self.report.writerow(['row', 'errors', 'data'])
+
+    def import_file(self, file, file_format, resume_after=0):
+        return self.run(READERS[file_format](file, self.schema), resume_after)
+
+    def run(self, rows, resume_after=0):
+        """
+        Import (row number, record, raw) tuples. Rows up to ``resume_after``
+        were handled by an earlier run: they are checked again, files included,
+        so the report and counts are complete, but not inserted.
+        Returns: ImportResult
+        """
+        self.result = ImportResult(0, 0, 0)
+        batch = []
+        for number, record, raw in rows:
+            self.result = self.result._replace(total=self.result.total + 1)
+            try:
+                application = self.build(record)
+            except ValidationError as exc:
+                self.reject(number, exc, raw)
+                continue
+            if batch and batch[-1][0] <= resume_after < number:
+                # Rows the earlier run committed are checked in batches of their own
+                self.flush(batch, committed=True)
+                batch = []
+            batch.append((number, application))
+            if len(batch) >= self.batch_size:
+                self.flush(batch, committed=number <= resume_after)
+                batch = []
+        if batch:
+            self.flush(batch, committed=batch[-1][0] <= resume_after)
+        return self.result
+
+    def build(self, record):
+        """
+        Validate one record and return an unsaved Application.
+        Raises ValidationError mapping field paths to messages.
+        """
+        if record is None:
+            raise ValidationError('Not a JSON object.')
+        form_data = record.get('form_data')
+        if not isinstance(form_data, dict):
+            raise ValidationError({'form_data': 'Must be an object.'})
+        # Model columns double as the schema's fields of the same name
+        for name in ('full_name', 'email', 'phone'):
+            if name in self.validator_fields and record.get(name) and not form_data.get(name):
+                form_data[name] = record[name]
+            record.setdefault(name, form_data.get(name) if isinstance(form_data.get(name), str) else '')
+
+        errors = {}
+        for name in REQUIRED_MODEL_FIELDS:
+            if not record[name]:
+                errors[name] = REQUIRED_MESSAGE
+        for name in MODEL_FIELDS:
+            max_length = Application._meta.get_field(name).max_length
+            if max_length and len(str(record.get(name) or '')) > max_length:
+                errors[name] = f'Ensure this value has at most {max_length} characters.'
+        if record['email']:
+            try:
+                validate_email(record['email'])
+            except ValidationError:
+                errors['email'] = 'Enter a valid email address.'
+        status = record.get('status') or 'pending'
+        if status not in dict(Application.STATUS_CHOICES):
+            errors['status'] = f'"{status}" is not a valid choice.'
+        if self.validator:
+            try:
+                self.validator.validate(form_data)
+            except ValidationError as exc:
+                errors.update(self._form_errors(exc))
+        if errors:
+            raise ValidationError(errors)
+
+        application = Application(
+            job_post=self.job_post, schema_snapshot=self.snapshot, form_data=form_data, status=status,
+            full_name=record['full_name'], email=record['email'], phone=record['phone'],
+            notes=record.get('notes') or '', photo=record.get('photo') or '', signature=record.get('signature') or '',
+        )
+        application.total_experience_days = application.compute_total_experience_days()
+        return application
+
+    @property
+    def validator_fields(self):
+        return self.validator.fields if self.validator else {}
+
+    def _form_errors(self, exc):
+        errors = exc.message_dict if hasattr(exc, 'error_dict') else {'form_data': exc.messages}
+        if self.allow_missing_files:
+            # Paper applications have no uploads to attach
+            errors = {path: messages for path, messages in errors.items()
+                      if not (path in self.file_fields and messages == [REQUIRED_MESSAGE])}
+        return {f'form_data.{path}': messages for path, messages in errors.items()}
+
+    def reject(self, number, exc, raw):
+        self.result = self.result._replace(rejected=self.result.rejected + 1)
+        if self.report is None:
+            return
+        errors = exc.message_dict if hasattr(exc, 'error_dict') else {'row': exc.messages}
+        data = raw if isinstance(raw, str) else json.dumps(raw, ensure_ascii=False)
+        self.report.writerow([number, json.dumps(errors, ensure_ascii=False), data.rstrip('\n')])
+
+    def flush(self, batch, committed=False):
+        """
+        Insert one batch. Photos and signatures must already be stored blobs;
+        rows referencing anything else are rejected here. A committed batch was
+        inserted by an earlier run and is only counted.
+        """
+        names = Counter(name for _, application in batch for name in (application.photo.name, application.signature.name)
+                        if name)
+        known = set(StoredBlob.objects.filter(name__in=names).values_list('name', flat=True))
+        kept = []
+        for number, application in batch:
+            missing = [field for field in ('photo', 'signature')
+                       if getattr(application, field).name and getattr(application, field).name not in known]
+            if missing:
+                self.reject(number, ValidationError({field: 'File not found in storage.' for field in missing}),
+                            {field: getattr(application, field).name for field in missing})
+            else:
+                kept.append(application)
+        if committed:
+            self.result = self.result._replace(imported=self.result.imported + len(kept))
+            return
+        if not kept:
+            return
+
+        # Allocated outside the transaction so the sequence row isn't locked while the batch inserts
+        for application, custom_id in zip(kept, AgencyApplicationSequence.allocate_ids(self.job_post.agency, len(kept))):
+            application.custom_application_id = custom_id
+        with transaction.atomic():
+            Application.objects.bulk_create(kept)
+            rollups.record_submissions(self.job_post.pk, kept)
+            JobPost.adjust_application_counts(self.job_post.pk, **Counter(a.status for a in kept))
+            references = Counter(name for a in kept for name in (a.photo.name, a.signature.name)
+                                 if name.startswith(BLOB_PREFIX))
+            for count, group in _group_by_count(references).items():
+                StoredBlob.objects.filter(name__in=group).update(ref_count=F('ref_count') + count)
+            enqueue_many('applications.render_images', [{'application_id': a.pk} for a in kept if a.photo or a.signature])
+            self.result = self.result._replace(imported=self.result.imported + len(kept))
+            if self.on_batch:
+                self.on_batch(self.result, batch[-1][0])
+
+
+def _group_by_count(counter):
+    # {count: [names]} so names referenced equally often share one UPDATE
+    groups = {}
+    for name, count in counter.items():
+        groups.setdefault(count, []).append(name)
+    return groups
@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from agencies.models import Agency, JobPost
+from applications.models import Application
+
+
+class Command(BaseCommand):
+    help = 'Submit applications in parallel against one agency and report ID allocation throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=16)
+        parser.add_argument('--per-worker', type=int, default=50)
+        parser.add_argument('--agency-code', default='BENCHID',
+                            help='Code of the throwaway agency created (and deleted) for the run.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        per_worker = options['per_worker']
+
+        agency = Agency.objects.create(name='ID allocator benchmark', code=options['agency_code'])
+        job_post = JobPost.objects.create(agency=agency, title='Benchmark', description='', form_schema={'fields': []})
+
+        def submit(worker):
+            ids, errors = [], 0
+            try:
+                for i in range(per_worker):
+                    try:
+                        application = Application.objects.create(
+                            job_post=job_post,
+                            full_name=f'Bench {worker}-{i}',
+                            email=f'bench{worker}.{i}@example.com',
+                            phone='0000000000',
+                            form_data={},
+                            photo='bench/photo.jpg',
+                            signature='bench/signature.png',
+                        )
+                        ids.append(application.custom_application_id)
+                    except Exception:
+                        errors += 1
+            finally:
+                connection.close()
+            return ids, errors
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(submit, range(workers)))
+            elapsed = time.perf_counter() - started
+        finally:
+            agency.delete()
+
+        ids = [custom_id for worker_ids, _ in results for custom_id in worker_ids]
+        errors = sum(worker_errors for _, worker_errors in results)
+        total = workers * per_worker
+
+        self.stdout.write(f'Submissions:     {total} ({workers} workers x {per_worker})')
+        self.stdout.write(f'Elapsed:         {elapsed:.2f}s ({len(ids) / elapsed:.0f} submissions/s)')
+        self.stdout.write(f'Failed inserts:  {errors}')
+        self.stdout.write(f'Duplicate IDs:   {len(ids) - len(set(ids))}')
+        if errors or len(ids) != len(set(ids)):
+            self.stdout.write(self.style.ERROR('ID allocation is not race-free'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All IDs unique'))
@@ -0,0 +1,85 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from agencies.models import Agency, JobPost
+from applications.models import Application
+from applications.search import search_applications
+
+FIRST_NAMES = ['Asha', 'Rahul', 'Priya', 'Arjun', 'Meera', 'Vikram', 'Anjali', 'Suresh', 'Divya', 'Karthik',
+               'Lakshmi', 'Manoj', 'Neha', 'Pooja', 'Ravi', 'Sneha', 'Tarun', 'Uma', 'Varun', 'Zoya']
+LAST_NAMES = ['Rao', 'Nair', 'Menon', 'Iyer', 'Sharma', 'Verma', 'Reddy', 'Pillai', 'Gupta', 'Das',
+              'Kumar', 'Joshi', 'Patel', 'Singh', 'Thomas', 'Varghese', 'Mathew', 'Kurian', 'Bose', 'Sen']
+
+SEARCHES = [
+    ('Name word', 'Meera'),
+    ('Misspelt name', 'Vikrum Pilai'),
+    ('Email fragment', 'menon.424'),
+    ('Phone fragment', '04242'),
+    ('Application ID', 'BSRCH-0004242'),
+]
+
+
+class Command(BaseCommand):
+    help = ('Seed a large applications table and compare admin-style icontains search with the indexed '
+            'search used by ?q=. Seeded rows are removed afterwards unless --keep is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--keep', action='store_true', help='Leave the seeded rows in place')
+
+    def handle(self, *args, **options):
+        agency = Agency.objects.create(name='Search Benchmark Agency', code='BSRCH', default_form_schema={'fields': []})
+        job_post = JobPost.objects.create(agency=agency, title='Search Benchmark', description='', form_schema={'fields': []})
+        try:
+            self.seed(job_post, options['rows'])
+            queryset = Application.objects.filter(job_post__agency=agency).defer('search_vector', 'form_data')
+            self.stdout.write(f"{'Search':<16}{'icontains':>12}{'indexed':>12}{'matches':>10}")
+            for label, term in SEARCHES:
+                legacy = queryset.filter(
+                    Q(full_name__icontains=term) | Q(email__icontains=term)
+                    | Q(job_post__title__icontains=term) | Q(custom_application_id__icontains=term)
+                ).order_by('-created_at')[:20]
+                indexed = search_applications(queryset, term)[:20]
+                legacy_ms = self.time(legacy, options['repeat'])
+                indexed_ms = self.time(indexed, options['repeat'])
+                self.stdout.write(f'{label:<16}{legacy_ms:>10.1f}ms{indexed_ms:>10.1f}ms{len(list(indexed)):>10}')
+        finally:
+            if not options['keep']:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DELETE FROM {Application._meta.db_table} WHERE job_post_id = %s', [job_post.pk])
+                agency.delete()
+
+    def seed(self, job_post, rows):
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO {Application._meta.db_table} (
+                    job_post_id, full_name, email, phone, custom_application_id, form_data,
+                    photo, signature, photo_thumbnail, photo_review, signature_thumbnail, signature_review,
+                    status, notes, total_experience_days, created_at, updated_at
+                )
+                SELECT %(job_post)s, first || ' ' || last,
+                       lower(last) || '.' || i || '@example.com',
+                       '9' || lpad(i::text, 9, '0'),
+                       'BSRCH-' || lpad(i::text, 7, '0'),
+                       '{{}}', '', '', '', '', '', '', 'pending', '', 0,
+                       now() - i * interval '1 second', now()
+                FROM generate_series(1, %(rows)s) AS i,
+                     LATERAL (SELECT (%(first)s::text[])[1 + i %% 20] AS first,
+                                     (%(last)s::text[])[1 + (i / 20) %% 20] AS last) AS names
+            """, {'job_post': job_post.pk, 'rows': rows, 'first': FIRST_NAMES, 'last': LAST_NAMES})
+            cursor.execute(f'ANALYZE {Application._meta.db_table}')
+        self.stdout.write(f'Seeded {rows} applications in {time.perf_counter() - started:.1f}s')
+
+    def time(self, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
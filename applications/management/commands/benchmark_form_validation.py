@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from applications.validation import FormDataValidator, validator_cache
+
+SCHEMA = {
+    'as_on_date': '2025-01-01',
+    'fields': [
+        {'name': 'full_name', 'label': 'Full Name', 'type': 'text', 'required': True},
+        {'name': 'email', 'label': 'Email', 'type': 'email', 'required': True},
+        {'name': 'phone', 'label': 'Phone Number', 'type': 'text', 'required': True},
+        {'name': 'date_of_birth', 'label': 'Date of Birth', 'type': 'date', 'required': True},
+        {'name': 'gender', 'label': 'Gender', 'type': 'select', 'options': ['Male', 'Female', 'Other']},
+        {'name': 'permanent_address', 'label': 'Permanent Address', 'type': 'group', 'fields': [
+            {'name': 'address_line_1', 'label': 'Address Line 1', 'type': 'text', 'required': True},
+            {'name': 'city', 'label': 'City', 'type': 'text', 'required': True},
+            {'name': 'state', 'label': 'State', 'type': 'text', 'required': True},
+            {'name': 'pincode', 'label': 'Pincode', 'type': 'number', 'required': True},
+        ]},
+        {'name': 'education_qualifications', 'label': 'Education Qualifications', 'type': 'array', 'fields': [
+            {'name': 'class', 'label': 'Class/Course', 'type': 'text', 'required': True},
+            {'name': 'percentage', 'label': 'Percentage', 'type': 'text'},
+            {'name': 'year_of_passing', 'label': 'Year of Passing', 'type': 'text'},
+            {'name': 'board', 'label': 'Board/University', 'type': 'text'},
+            {'name': 'certificate', 'label': 'Certificate', 'type': 'file', 'accept': ['.pdf', 'image/*']},
+        ]},
+        {'name': 'work_experience', 'label': 'Work Experience', 'type': 'array', 'fields': [
+            {'name': 'designation', 'label': 'Designation', 'type': 'text'},
+            {'name': 'institution', 'label': 'Institution/Company', 'type': 'text'},
+            {'name': 'from_date', 'label': 'From Date', 'type': 'date'},
+            {'name': 'to_date', 'label': 'To Date', 'type': 'date'},
+            {'name': 'tasks_duties', 'label': 'Tasks and Duties', 'type': 'textarea'},
+            {'name': 'certificate', 'label': 'Experience Certificate', 'type': 'file', 'accept': ['.pdf']},
+        ]},
+        {'name': 'declaration', 'label': 'Declaration', 'type': 'checkbox', 'required': True},
+    ],
+}
+
+FORM_DATA = {
+    'full_name': 'Asha Rao',
+    'email': 'asha@example.com',
+    'phone': '9876543210',
+    'date_of_birth': '1995-04-12',
+    'gender': 'Female',
+    'permanent_address': {'address_line_1': '12 MG Road', 'city': 'Kochi', 'state': 'Kerala', 'pincode': '682001'},
+    'education_qualifications': [
+        {'class': level, 'percentage': '78', 'year_of_passing': '2012', 'board': 'CBSE', 'certificate': ''}
+        for level in ('10', '12', 'B.Sc', 'M.Sc')
+    ],
+    'work_experience': [
+        {'designation': 'Teacher', 'institution': 'School', 'from_date': '2019-06-01', 'to_date': '2022-05-31',
+         'tasks_duties': 'Teaching', 'certificate': ''}
+        for _ in range(3)
+    ],
+    'declaration': True,
+}
+
+
+class Command(BaseCommand):
+    help = 'Measure form_data validation cost per submission with a cold and a warm validator cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        checksum = 'benchmark'
+
+        def run(cold):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                if cold:
+                    validator_cache.clear()
+                validator_cache.get(checksum, lambda: SCHEMA).validate(FORM_DATA)
+            return (time.perf_counter() - started) / iterations * 1e6
+
+        FormDataValidator(SCHEMA).validate(FORM_DATA)
+        cold = run(cold=True)
+        warm = run(cold=False)
+        validator_cache.clear()
+
+        self.stdout.write(f'Iterations:  {iterations}')
+        self.stdout.write(f'Cold cache:  {cold:.1f} us per submission (compile + validate)')
+        self.stdout.write(f'Warm cache:  {warm:.1f} us per submission (validate only)')
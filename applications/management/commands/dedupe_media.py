@@ -0,0 +1,99 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from applications.models import Application, ApplicationDocument
+from applications.tasks import _replace_url
+from common.models import StoredBlob
+from common.storage import BLOB_PREFIX, blob_name, content_addressed_storage, hash_file
+
+# Every file field backed by content-addressed storage
+FILE_FIELDS = [
+    (Application, 'photo'),
+    (Application, 'signature'),
+    (ApplicationDocument, 'file'),
+]
+
+
+class Command(BaseCommand):
+    help = ('Move files stored before content-addressed storage into it, so identical files are kept once, '
+            'and repoint every reference at the shared copy.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be merged without changing anything')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recompute reference counts from the database and remove unreferenced blobs')
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage.inner
+        names = set()
+        for model, field in FILE_FIELDS:
+            names.update(
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__startswith': BLOB_PREFIX})
+                .values_list(field, flat=True).distinct()
+            )
+
+        targets = {}
+        for name in sorted(names):
+            if not storage.exists(name):
+                self.stderr.write(f'Missing, skipped: {name}')
+                continue
+            with storage.open(name) as f:
+                targets[name] = hash_file(f)
+
+        groups = Counter(blob_name(digest, name) for name, digest in targets.items())
+        duplicates = sum(count - 1 for count in groups.values())
+        self.stdout.write(f'{len(targets)} file(s) to move into {len(groups)} blob(s); {duplicates} duplicate(s)')
+        if options['dry_run']:
+            return
+
+        for name, digest in targets.items():
+            self.move(storage, name, digest)
+        self.stdout.write(f'Moved {len(targets)} file(s)')
+
+        if options['recount']:
+            self.recount(storage)
+
+    def move(self, storage, name, digest):
+        target = blob_name(digest, name)
+        with transaction.atomic():
+            blob, _ = StoredBlob.objects.select_for_update().get_or_create(
+                name=target, defaults={'sha256': digest, 'size': storage.size(name)}
+            )
+            if not storage.exists(target):
+                with storage.open(name) as f:
+                    storage.save(target, f)
+
+            old_url, new_url = storage.url(name), storage.url(target)
+            application_ids = list(
+                ApplicationDocument.objects.filter(file=name).values_list('application_id', flat=True).distinct()
+            )
+            references = 0
+            for model, field in FILE_FIELDS:
+                references += model.objects.filter(**{field: name}).update(**{field: target})
+            StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + references)
+
+            # Certificate URLs are also recorded in form_data
+            for application in Application.objects.filter(pk__in=application_ids).only('id', 'form_data'):
+                application.form_data = _replace_url(application.form_data, old_url, new_url)
+                Application.objects.filter(pk=application.pk).update(form_data=application.form_data)
+
+            transaction.on_commit(lambda: storage.delete(name))
+
+    def recount(self, storage):
+        counts = Counter()
+        for model, field in FILE_FIELDS:
+            for name in model.objects.filter(**{f'{field}__startswith': BLOB_PREFIX}).values_list(field, flat=True):
+                counts[name] += 1
+
+        removed = 0
+        for blob in StoredBlob.objects.iterator():
+            if counts[blob.name] == 0:
+                blob.delete()
+                storage.delete(blob.name)
+                removed += 1
+            elif counts[blob.name] != blob.ref_count:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=counts[blob.name])
+        self.stdout.write(f'Reference counts rebuilt; removed {removed} unreferenced blob(s)')
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from agencies.models import JobPost
+from applications.imports import IMPORT_BATCH_SIZE, READERS, ApplicationImporter
+
+
+class Command(BaseCommand):
+    help = ('Import applications for a job post from CSV (the export layout) or NDJSON. Rows are validated '
+            'against the job post\'s form schema and inserted in batches; rejected rows go to the report file.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_post', type=int, help='Job post id')
+        parser.add_argument('path', help='CSV or NDJSON file')
+        parser.add_argument('--format', choices=list(READERS), help='Defaults to the file extension')
+        parser.add_argument('--report', help='Where to write rejected rows (default: <path>.rejected.csv)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--allow-missing-files', action='store_true',
+                            help='Accept rows without the uploads the schema requires, e.g. paper applications')
+
+    def handle(self, *args, **options):
+        job_post = JobPost.objects.filter(pk=options['job_post']).first()
+        if job_post is None:
+            raise CommandError(f'Job post {options["job_post"]} does not exist')
+        path = options['path']
+        file_format = options['format'] or ('ndjson' if path.lower().endswith(('.ndjson', '.jsonl', '.json')) else 'csv')
+        report_path = options['report'] or f'{path}.rejected.csv'
+
+        started = time.perf_counter()
+        with open(path, 'rb') as source, open(report_path, 'w', newline='', encoding='utf-8') as report:
+            importer = ApplicationImporter(job_post, report=report, batch_size=options['batch_size'],
+                                           allow_missing_files=options['allow_missing_files'])
+            result = importer.import_file(source, file_format)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f'Imported {result.imported} of {result.total} row(s) in {elapsed:.1f}s '
+                          f'({result.total / elapsed if elapsed else 0:.0f} rows/s)')
+        if result.rejected:
+            self.stdout.write(f'Rejected {result.rejected} row(s); see {report_path}')
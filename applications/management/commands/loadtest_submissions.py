@@ -0,0 +1,140 @@
+import asyncio
+import io
+import os
+import statistics
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from agencies.models import Agency, JobPost
+
+
+def noise_png(side):
+    # Random pixels, so content-addressed storage writes every photo
+    output = io.BytesIO()
+    Image.frombytes('L', (side, side), os.urandom(side * side)).save(output, 'PNG')
+    return output.getvalue()
+
+
+def multipart_body(job_post_id, photo, signature):
+    boundary = uuid.uuid4().hex
+    email = f'load.{uuid.uuid4().hex[:12]}@example.com'
+    fields = {
+        'job_post': str(job_post_id),
+        'full_name': 'Load Test',
+        'email': email,
+        'phone': '9876543210',
+        'form_data': '{}',
+    }
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    for name, content in (('photo', photo), ('signature', signature)):
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.png"\r\n'
+            f'Content-Type: image/png\r\n\r\n'.encode() + content + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return f'multipart/form-data; boundary={boundary}', b''.join(parts)
+
+
+class Command(BaseCommand):
+    help = ('Hold a fixed number of concurrent, bandwidth-limited multipart submissions against running servers '
+            'and compare throughput and latency. Start the servers against this database first, e.g.\n'
+            '  gunicorn job_portal.wsgi -w 2 --threads 8 -b :8000\n'
+            '  uvicorn job_portal.asgi:application --workers 2 --port 8001\n'
+            'then run\n'
+            '  loadtest_submissions --target wsgi=http://localhost:8000/api/applications/ '
+            '--target asgi=http://localhost:8001/api/applications/submit/\n'
+            'A job post with an empty form schema is created for the run and removed afterwards unless --keep '
+            'is given.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                            help='Submission endpoint to load; repeat to compare servers')
+        parser.add_argument('--concurrency', type=int, default=100, help='Submissions kept in flight')
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to run each target')
+        parser.add_argument('--upload-kbps', type=float, default=256,
+                            help='Upload bandwidth per client in KiB/s, as on a slow mobile connection')
+        parser.add_argument('--photo-side', type=int, default=300, help='Side of the random photo in pixels')
+        parser.add_argument('--keep', action='store_true', help='Leave the job post and its applications in place')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            if not url or urlsplit(url).scheme != 'http':
+                raise CommandError(f'Give targets as NAME=http://host:port/path, not "{target}"')
+            targets.append((name, url))
+
+        agency = Agency.objects.create(name='Load Test Agency', code=f'LT{uuid.uuid4().hex[:6].upper()}',
+                                       default_form_schema={'fields': []})
+        job_post = JobPost.objects.create(agency=agency, title='Load Test', description='', form_schema={'fields': []})
+        try:
+            self.stdout.write(f"{'Target':<10}{'done':>8}{'failed':>8}{'req/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}")
+            for name, url in targets:
+                done, failed, latencies, elapsed = asyncio.run(self.run_target(url, job_post.pk, options))
+                if latencies:
+                    cuts = statistics.quantiles(latencies, n=100)
+                    p50, p95, p99 = statistics.median(latencies), cuts[94], cuts[98]
+                else:
+                    p50 = p95 = p99 = 0
+                self.stdout.write(f'{name:<10}{done:>8}{failed:>8}{done / elapsed:>9.1f}'
+                                  f'{p50:>9.0f}ms{p95:>8.0f}ms{p99:>8.0f}ms')
+        finally:
+            if not options['keep']:
+                agency.delete()
+
+    async def run_target(self, url, job_post_id, options):
+        self.done = self.failed = 0
+        self.latencies = []
+        self.errors = set()
+        deadline = time.monotonic() + options['duration']
+        started = time.monotonic()
+        await asyncio.gather(*[self.client(url, job_post_id, deadline, options) for _ in range(options['concurrency'])])
+        for error in sorted(self.errors)[:5]:
+            self.stderr.write(f'  {error}')
+        return self.done, self.failed, self.latencies, time.monotonic() - started
+
+    async def client(self, url, job_post_id, deadline, options):
+        signature = noise_png(120)
+        while time.monotonic() < deadline:
+            content_type, body = multipart_body(job_post_id, noise_png(options['photo_side']), signature)
+            started = time.monotonic()
+            try:
+                status = await self.submit(url, content_type, body, options['upload_kbps'] * 1024)
+            except (OSError, asyncio.IncompleteReadError, ValueError) as exc:
+                status = repr(exc)
+            if status == 201:
+                self.done += 1
+                self.latencies.append((time.monotonic() - started) * 1000)
+            else:
+                self.failed += 1
+                self.errors.add(str(status))
+
+    async def submit(self, url, content_type, body, bytes_per_second):
+        """
+        POST ``body`` at no more than ``bytes_per_second`` and return the status code.
+        """
+        parts = urlsplit(url)
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        try:
+            writer.write(
+                f'POST {parts.path or "/"} HTTP/1.1\r\nHost: {parts.netloc}\r\nContent-Type: {content_type}\r\n'
+                f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode()
+            )
+            # Ten writes a second at the client's bandwidth
+            chunk = max(1, int(bytes_per_second / 10))
+            for start in range(0, len(body), chunk):
+                writer.write(body[start:start + chunk])
+                await writer.drain()
+                await asyncio.sleep(0.1)
+            status_line = await reader.readline()
+            await reader.read()
+        finally:
+            writer.close()
+        return int(status_line.split()[1])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from applications.models import Application
+from common.tasks import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Queue thumbnail and review renditions for applications that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render every application')
+
+    def handle(self, *args, **options):
+        queryset = Application.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(photo_thumbnail='')
+        count = 0
+        for application_id in queryset.values_list('id', flat=True).iterator():
+            enqueue('applications.render_images', application_id=application_id)
+            count += 1
+        self.stdout.write(f'Queued {count} application(s) for rendering')
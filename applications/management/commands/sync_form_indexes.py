@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from agencies.models import JobPost
+from applications.form_query import form_data_indexes, sync_form_data_indexes
+
+
+class Command(BaseCommand):
+    help = ('Build the form_data indexes for fields marked "indexed" in the current form schema '
+            'of every job post. Indexes are built concurrently, so applications stay writable.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Print the statements without running them')
+
+    def handle(self, *args, **options):
+        fields = {}
+        schemas = JobPost.objects.filter(current_schema__isnull=False).values_list('current_schema__schema', flat=True)
+        for schema in schemas.iterator():
+            for field in schema.get('fields', []):
+                # One field name maps to one set of indexes, whichever job post declares it
+                if field.get('name') not in fields or field.get('indexed'):
+                    fields[field.get('name')] = field
+        schema = {'fields': list(fields.values())}
+
+        if options['dry_run']:
+            for _, statement in form_data_indexes(schema):
+                self.stdout.write(statement)
+            return
+        built = sync_form_data_indexes(schema)
+        self.stdout.write(f'Built {len(built)} index(es): {", ".join(built) or "none needed"}')
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0004_alter_agency_code'),
+        ('applications', '0002_application_custom_application_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgencyApplicationSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+                ('agency', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='application_sequence', to='agencies.agency')),
+            ],
+            options={
+                'verbose_name': 'Agency application sequence',
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+import re
+
+from django.db import migrations
+
+
+def backfill_sequences(apps, schema_editor):
+    """
+    Seed each agency's counter with the highest number already handed out.
+    """
+    Agency = apps.get_model('agencies', 'Agency')
+    Application = apps.get_model('applications', 'Application')
+    AgencyApplicationSequence = apps.get_model('applications', 'AgencyApplicationSequence')
+
+    last_values = {}
+    rows = (
+        Application.objects
+        .exclude(custom_application_id__isnull=True)
+        .values_list('job_post__agency_id', 'job_post__agency__code', 'custom_application_id')
+        .iterator(chunk_size=2000)
+    )
+    for agency_id, agency_code, custom_application_id in rows:
+        match = re.fullmatch(rf'{re.escape(agency_code.upper())}-(\d+)', custom_application_id)
+        if match:
+            last_values[agency_id] = max(last_values.get(agency_id, 0), int(match.group(1)))
+
+    AgencyApplicationSequence.objects.bulk_create([
+        AgencyApplicationSequence(agency_id=agency_id, last_value=last_values.get(agency_id, 0))
+        for agency_id in Agency.objects.values_list('id', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0003_agencyapplicationsequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sequences, migrations.RunPython.noop),
+    ]
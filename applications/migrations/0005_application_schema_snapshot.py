@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0005_formschemasnapshot'),
+        ('applications', '0004_backfill_application_sequences'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='schema_snapshot',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='applications', to='agencies.formschemasnapshot'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def link_snapshots(apps, schema_editor):
+    """
+    Point existing applications at their job post's initial schema snapshot.
+    """
+    Application = apps.get_model('applications', 'Application')
+    JobPost = apps.get_model('agencies', 'JobPost')
+
+    Application.objects.filter(schema_snapshot__isnull=True).update(
+        schema_snapshot=Subquery(
+            JobPost.objects.filter(pk=OuterRef('job_post_id')).values('current_schema')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0006_backfill_form_schema_snapshots'),
+        ('applications', '0005_application_schema_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_snapshots, migrations.RunPython.noop),
+    ]
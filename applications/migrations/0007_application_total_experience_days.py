@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:47
+
+from django.db import migrations, models
+
+from applications.experience import total_experience_days
+
+
+def backfill_total_experience(apps, schema_editor):
+    """
+    Compute total_experience_days for existing applications in batches.
+    """
+    Application = apps.get_model('applications', 'Application')
+    FormSchemaSnapshot = apps.get_model('agencies', 'FormSchemaSnapshot')
+
+    as_on_dates = dict(FormSchemaSnapshot.objects.values_list('id', 'as_on_date'))
+    batch = []
+    for application in Application.objects.only('form_data', 'schema_snapshot_id').iterator(chunk_size=1000):
+        application.total_experience_days = total_experience_days(
+            (application.form_data or {}).get('work_experience'),
+            as_on_dates.get(application.schema_snapshot_id),
+        )
+        batch.append(application)
+        if len(batch) >= 1000:
+            Application.objects.bulk_update(batch, ['total_experience_days'])
+            batch = []
+    if batch:
+        Application.objects.bulk_update(batch, ['total_experience_days'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0007_formschemasnapshot_as_on_date'),
+        ('applications', '0006_backfill_application_schema_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='total_experience_days',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_total_experience, migrations.RunPython.noop),
+    ]
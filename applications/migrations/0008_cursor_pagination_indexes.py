@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0008_jobpost_cursor_index'),
+        ('applications', '0007_application_total_experience_days'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['-created_at', '-id'], name='application_created_7d40e4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['job_post', '-created_at', '-id'], name='application_job_pos_490835_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='applicationdocument',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='application_uploade_1c5826_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='applicationdocument',
+            index=models.Index(fields=['application', '-uploaded_at', '-id'], name='application_applica_1f6c21_idx'),
+        ),
+    ]
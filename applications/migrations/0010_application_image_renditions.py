@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0009_applicationdocument_ingestion_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='photo_review',
+            field=models.ImageField(blank=True, editable=False, upload_to='applications/renditions/'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='photo_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='applications/renditions/'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='signature_review',
+            field=models.ImageField(blank=True, editable=False, upload_to='applications/renditions/'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='signature_thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='applications/renditions/'),
+        ),
+    ]
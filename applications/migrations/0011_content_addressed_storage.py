@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:59
+
+import common.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0010_application_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='application',
+            name='photo',
+            field=models.ImageField(storage=common.storage.ContentAddressedStorage(), upload_to='applications/photos/'),
+        ),
+        migrations.AlterField(
+            model_name='application',
+            name='signature',
+            field=models.ImageField(storage=common.storage.ContentAddressedStorage(), upload_to='applications/signatures/'),
+        ),
+        migrations.AlterField(
+            model_name='applicationdocument',
+            name='file',
+            field=models.FileField(storage=common.storage.ContentAddressedStorage(), upload_to='applications/documents/'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0012_application_search'),
+    ]
+
+    operations = [
+        # Numeric form_data values for range filters and expression indexes; NULL for non-numbers
+        migrations.RunSQL(
+            sql=r"""
+                CREATE FUNCTION form_data_numeric(value text) RETURNS numeric
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE
+                AS $$ SELECT CASE WHEN value ~ '^\s*-?\d+(\.\d+)?\s*$' THEN value::numeric END $$
+            """,
+            reverse_sql='DROP FUNCTION form_data_numeric(text)',
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('agencies', '0010_backfill_application_counters'),
+        ('applications', '0014_applicationstatuschange'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApplicationImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(help_text='CSV in the export layout, or NDJSON', upload_to='imports/')),
+                ('allow_missing_files', models.BooleanField(default=False, help_text='Accept rows without the required uploads, e.g. paper applications')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+                ('imported_rows', models.PositiveIntegerField(default=0)),
+                ('rejected_rows', models.PositiveIntegerField(default=0)),
+                ('last_row', models.PositiveIntegerField(default=0)),
+                ('report', models.FileField(blank=True, upload_to='imports/reports/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('job_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imports', to='agencies.jobpost')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,6 +1,70 @@
-from django.db import models
-from agencies.models import JobPost
-from datetime import datetime, timedelta
+import uuid
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, connection, transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+from agencies.models import Agency, JobPost, FormSchemaSnapshot
+from .experience import format_experience, total_experience_days
+from common.storage import blob_name, content_addressed_storage, hash_file, staging_storage
+from dashboard import rollups
+
+
+class AgencyApplicationSequence(models.Model):
+    """
+    Per-agency counter backing ``Application.custom_application_id``.
+    """
+    agency = models.OneToOneField(Agency, on_delete=models.CASCADE, related_name='application_sequence')
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.agency.code} - {self.last_value}"
+
+    @classmethod
+    def allocate(cls, agency_id, count=1):
+        """
+        Reserve ``count`` consecutive numbers for an agency with a single upsert.
+        The row lock is only held until the surrounding transaction commits, so
+        call this outside long-running atomic blocks.
+        Returns: range of the reserved numbers
+        """
+        if count < 1:
+            raise ValueError('count must be at least 1')
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (agency_id, last_value) VALUES (%s, %s) "
+                f"ON CONFLICT (agency_id) DO UPDATE SET last_value = {table}.last_value + EXCLUDED.last_value "
+                f"RETURNING last_value",
+                [agency_id, count],
+            )
+            last_value = cursor.fetchone()[0]
+        return range(last_value - count + 1, last_value + 1)
+
+    @classmethod
+    def allocate_ids(cls, agency, count=1):
+        """
+        Reserve ``count`` custom application IDs for an agency, e.g. ['ABC-001'].
+        """
+        agency_code = agency.code.upper()
+        return [format_application_id(agency_code, number) for number in cls.allocate(agency.pk, count)]
+
+    class Meta:
+        verbose_name = 'Agency application sequence'
+
+
+def format_application_id(agency_code, number):
+    return f"{agency_code}-{number:03d}"
+
+
+# form_data lists whose items may carry a certificate upload
+CERTIFICATE_DOCUMENT_TYPES = [
+    ('education_qualifications', 'education_certificate'),
+    ('work_experience', 'work_experience_certificate'),
+]
+
 
 class Application(models.Model):
     STATUS_CHOICES = [
@@ -10,6 +74,14 @@ class Application(models.Model):
         ('rejected', 'Rejected'),
         ('hired', 'Hired'),
     ]
+    # Statuses each status may move to, checked by bulk transitions (applications.transitions)
+    STATUS_TRANSITIONS = {
+        'pending': ['reviewing', 'shortlisted', 'rejected'],
+        'reviewing': ['pending', 'shortlisted', 'rejected'],
+        'shortlisted': ['reviewing', 'rejected', 'hired'],
+        'rejected': ['reviewing'],
+        'hired': [],
+    }
 
     job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='applications')
     full_name = models.CharField(max_length=255)
@@ -21,10 +93,19 @@ class Application(models.Model):
     
     # Dynamic form data
     form_data = models.JSONField()  # Stores all form submissions including custom fields
+    schema_snapshot = models.ForeignKey(FormSchemaSnapshot, on_delete=models.RESTRICT, null=True, blank=True,
+                                        related_name='applications')  # Schema version the form was submitted against
     
     # File uploads
-    photo = models.ImageField(upload_to='applications/photos/')
-    signature = models.ImageField(upload_to='applications/signatures/')
+    # Identical uploads share one stored file (common.storage.ContentAddressedStorage)
+    photo = models.ImageField(upload_to='applications/photos/', storage=content_addressed_storage)
+    signature = models.ImageField(upload_to='applications/signatures/', storage=content_addressed_storage)
+
+    # Re-encoded copies rendered in the background (applications.images)
+    photo_thumbnail = models.ImageField(upload_to='applications/renditions/', blank=True, editable=False)
+    photo_review = models.ImageField(upload_to='applications/renditions/', blank=True, editable=False)
+    signature_thumbnail = models.ImageField(upload_to='applications/renditions/', blank=True, editable=False)
+    signature_review = models.ImageField(upload_to='applications/renditions/', blank=True, editable=False)
     
     # Status tracking
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -35,84 +116,206 @@ class Application(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
 
+    # Derived from form_data on save so it can be sorted and filtered in the database
+    total_experience_days = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+
+    # Full-text search document, kept up to date by PostgreSQL (see applications.search)
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('custom_application_id', weight='A', config='simple')
+            + SearchVector('full_name', weight='A', config='simple')
+            + SearchVector('email', weight='B', config='simple')
+            + SearchVector('phone', weight='C', config='simple')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
     def save(self, *args, **kwargs):
         if not self.custom_application_id:
-            agency_code = self.job_post.agency.code.upper()
-            # Count existing applications for this agency
-            count = Application.objects.filter(job_post__agency__code=agency_code).count() + 1
-            self.custom_application_id = f"{agency_code}-{count:03d}"
-        super().save(*args, **kwargs)
+            self.custom_application_id = AgencyApplicationSequence.allocate_ids(self.job_post.agency)[0]
+        if not self.schema_snapshot_id:
+            self.schema_snapshot = self.job_post.current_schema
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'form_data' in update_fields:
+            self.total_experience_days = self.compute_total_experience_days()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'total_experience_days'}
+
+        # Dashboard rollups and JobPost counters change in the same transaction as the row
+        with transaction.atomic():
+            if self._state.adding:
+                super().save(*args, **kwargs)
+                rollups.record_submission(self.job_post_id, self.status, self.created_at)
+                JobPost.adjust_application_counts(self.job_post_id, **{self.status: 1})
+            elif update_fields is None or 'status' in update_fields:
+                # Read under lock: this instance's status may be stale if another request changed it
+                old_status = Application.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'status', flat=True).first()
+                super().save(*args, **kwargs)
+                if old_status is not None and old_status != self.status:
+                    rollups.record_status_change(self.job_post_id, old_status, self.status)
+                    JobPost.adjust_application_counts(self.job_post_id, **{old_status: -1, self.status: 1})
+                    # status_changed_by may be set on the instance by the view or admin making the change
+                    ApplicationStatusChange.objects.create(
+                        application_id=self.pk, old_status=old_status, new_status=self.status,
+                        changed_by=getattr(self, 'status_changed_by', None),
+                    )
+            else:
+                super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        # Bulk QuerySet.delete() skips this; rebuild_dashboard and reconcile_job_post_counters repair the counts after one
+        with transaction.atomic():
+            stored = Application.objects.select_for_update().filter(pk=self.pk).values('status', 'created_at').first()
+            result = super().delete(*args, **kwargs)
+            if stored:
+                rollups.record_submission(self.job_post_id, stored['status'], stored['created_at'], delta=-1)
+                JobPost.adjust_application_counts(self.job_post_id, **{stored['status']: -1})
+        return result
+
+    def compute_total_experience_days(self):
+        """
+        Merge the work experience periods in form_data, capped at the
+        as_on_date of the schema snapshot the application was submitted against.
+        """
+        as_on_date = self.schema_snapshot.as_on_date if self.schema_snapshot else None
+        return total_experience_days((self.form_data or {}).get('work_experience'), as_on_date)
 
     def __str__(self):
         return f"{self.custom_application_id} - {self.full_name} - {self.job_post.title}"
 
     def get_total_experience(self):
         """
-        Calculate total work experience from form_data, considering as_on_date from job post schema.
+        Total work experience from the stored total_experience_days column.
         Returns: 'X years Y days' format
         """
-        total_days = 0
-        
-        # Get as_on_date from job post schema
-        as_on_date = None
-        if hasattr(self.job_post, 'form_schema') and self.job_post.form_schema:
-            as_on_date = self.job_post.form_schema.get('as_on_date')
-        
-        if as_on_date:
-            try:
-                as_on_date = datetime.strptime(as_on_date, "%Y-%m-%d").date()
-            except (ValueError, TypeError):
-                as_on_date = None
-        
-        # Get work experience from form_data
-        work_experience = self.form_data.get('work_experience', [])
-        
-        if not work_experience:
-            return "0 years 0 days"
-        
-        for exp in work_experience:
-            from_date = exp.get('from_date')
-            to_date = exp.get('to_date')
-            
-            if from_date and to_date:
-                try:
-                    from_date = datetime.strptime(from_date, "%Y-%m-%d").date()
-                    to_date = datetime.strptime(to_date, "%Y-%m-%d").date()
-                    
-                    # Use as_on_date if to_date is after as_on_date
-                    if as_on_date and to_date > as_on_date:
-                        to_date = as_on_date
-                    
-                    # Calculate days (inclusive of both dates)
-                    days = (to_date - from_date).days + 1
-                    if days > 0:
-                        total_days += days
-                        
-                except (ValueError, TypeError):
-                    continue
-        
-        years = total_days // 365
-        days = total_days % 365
-        
-        return f"{years} years {days} days"
+        return format_experience(self.total_experience_days)
     
     get_total_experience.short_description = "Total Work Experience"
+    get_total_experience.admin_order_field = 'total_experience_days'
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['job_post', 'status']),
             models.Index(fields=['email']),
+            GinIndex(fields=['search_vector'], name='application_search_idx'),
+            # Trigram indexes: fuzzy name matching, and icontains (UPPER(col) LIKE ...) on email and phone
+            GinIndex(OpClass('full_name', name='gin_trgm_ops'), name='application_name_trgm_idx'),
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='application_email_trgm_idx'),
+            GinIndex(OpClass(Upper('phone'), name='gin_trgm_ops'), name='application_phone_trgm_idx'),
+            # Cursor pagination order, globally and per job post
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['job_post', '-created_at', '-id']),
         ]
 
 class ApplicationDocument(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='documents')
     document_type = models.CharField(max_length=50)  # e.g., 'education_certificate', 'experience_certificate'
-    file = models.FileField(upload_to='applications/documents/')
+    file = models.FileField(upload_to='applications/documents/', storage=content_addressed_storage)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    # Background ingestion: the upload waits in staging until the worker stores it under file.name
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ready')
+    staged_file = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def stage(cls, application, document_type, file_obj):
+        """
+        Build a pending document for an uploaded file: copy it to local staging
+        and name it by its content, the blob name the worker will store it
+        under. Its URL is final but only resolves once status is 'ready'.
+        """
+        token = uuid.uuid4().hex
+        document = cls(application=application, document_type=document_type, status='pending')
+        document.file.name = blob_name(hash_file(file_obj), file_obj.name)
+        document.staged_file = staging_storage.save(f"{token}-{file_obj.name}", file_obj)
+        return document
+
     def __str__(self):
         return f"{self.application} - {self.document_type}"
 
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            # Cursor pagination order, globally and per application
+            models.Index(fields=['-uploaded_at', '-id']),
+            models.Index(fields=['application', '-uploaded_at', '-id']),
+        ]
+
+
+class ApplicationStatusChange(models.Model):
+    """
+    Append-only history of application status changes, written by
+    Application.save() and by bulk transitions.
+    """
+    application = models.ForeignKey(Application, on_delete=models.CASCADE, related_name='status_changes')
+    old_status = models.CharField(max_length=20, choices=Application.STATUS_CHOICES)
+    new_status = models.CharField(max_length=20, choices=Application.STATUS_CHOICES)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+')
+    note = models.TextField(blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Status history is append-only')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.application_id}: {self.old_status} -> {self.new_status}"
+
+    class Meta:
+        ordering = ['-changed_at', '-id']
+        indexes = [
+            models.Index(fields=['application', '-changed_at']),
+        ]
+
+
+class ApplicationImport(models.Model):
+    """
+    A CSV or NDJSON file of applications uploaded through the admin and
+    imported by the applications.import_applications task.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='imports')
+    file = models.FileField(upload_to='imports/', help_text='CSV in the export layout, or NDJSON')
+    allow_missing_files = models.BooleanField(default=False, help_text='Accept rows without the required uploads, '
+                                                                     'e.g. paper applications')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    total_rows = models.PositiveIntegerField(default=0)
+    imported_rows = models.PositiveIntegerField(default=0)
+    rejected_rows = models.PositiveIntegerField(default=0)
+    last_row = models.PositiveIntegerField(default=0)  # Last row committed, so a retried task resumes after it
+    report = models.FileField(upload_to='imports/reports/', blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                   related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def file_format(self):
+        return 'ndjson' if self.file.name.lower().endswith(('.ndjson', '.jsonl', '.json')) else 'csv'
+
+    def __str__(self):
+        return f"{self.job_post} - {self.file.name}"
+
+    class Meta:
+        ordering = ['-created_at']
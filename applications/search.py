@@ -0,0 +1,49 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import F, Q
+
+from agencies.models import JobPost
+
+
+def _rank(queryset, matches, rank):
+    # Scoring reads every candidate's search_vector, so only the newest matches are ranked
+    candidates = matches.order_by('-created_at', '-id').values('pk')[:settings.SEARCH_RANK_CANDIDATES]
+    return queryset.filter(pk__in=candidates).annotate(rank=rank).order_by('-rank', '-created_at', '-id')
+
+
+def search_applications(queryset, term, rank=True):
+    """
+    Filter applications matching ``term`` and order them by relevance.
+    With rank=False the matches are only filtered, for callers that apply
+    their own ordering.
+
+    Each condition is backed by an index on Application:
+    - words in the ID, name, email or phone, via the search_vector GIN index
+    - fragments of an email or phone number, via trigram-indexed icontains
+    - job post titles, by matching the small job post table first
+    Only when none of those match are names compared by trigram similarity,
+    so misspelt names are still found without scoring every row on each search.
+    Broad terms rank only the newest SEARCH_RANK_CANDIDATES matches.
+    """
+    term = term.strip()
+    if not term:
+        return queryset
+
+    query = SearchQuery(term, search_type='websearch', config='simple')
+    condition = Q(search_vector=query) | Q(email__icontains=term)
+    digits = re.sub(r'\D', '', term)
+    if len(digits) >= 3:
+        condition |= Q(phone__icontains=digits)
+    # Resolved up front: a subquery inside the OR would stop PostgreSQL combining the index scans
+    job_post_ids = list(JobPost.objects.filter(title__icontains=term).values_list('id', flat=True))
+    if job_post_ids:
+        condition |= Q(job_post_id__in=job_post_ids)
+
+    matches = queryset.filter(condition)
+    if matches.exists():
+        return _rank(queryset, matches, SearchRank(F('search_vector'), query)) if rank else matches
+
+    fuzzy = queryset.filter(Q(full_name__trigram_similar=term) | Q(full_name__trigram_word_similar=term))
+    return _rank(queryset, fuzzy, TrigramSimilarity('full_name', term)) if rank else fuzzy
@@ -1,41 +1,185 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
 from rest_framework import serializers
-from .models import Application, ApplicationDocument
+from .models import Application, ApplicationDocument, CERTIFICATE_DOCUMENT_TYPES
+from .validation import get_form_validator
+from agencies.models import JobPost
 from agencies.serializers import JobPostSerializer
+from common.serializers import SparseFieldsetMixin
+from common.storage import get_direct_upload_storage, get_object_metadata
+from common.validators import validate_file_size, validate_image_dimensions
+
+IMAGE_CONTENT_TYPES = ['image/jpeg', 'image/png']
+DOCUMENT_CONTENT_TYPES = ['application/pdf', 'image/jpeg', 'image/png']
+
+# Uploads larger than this are still accepted and scaled down by the rendition task
+MAX_IMAGE_SIDE = 8000
+
+# Stands in for an uploaded file when validating objects already in storage
+StoredObject = namedtuple('StoredObject', ['name', 'size', 'content_type'])
 
 class ApplicationDocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = ApplicationDocument
-        fields = ['id', 'application', 'document_type', 'file', 'uploaded_at']
-        read_only_fields = ['uploaded_at']
+        fields = ['id', 'application', 'document_type', 'file', 'status', 'processed_at', 'uploaded_at']
+        read_only_fields = ['status', 'processed_at', 'uploaded_at']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.status != 'ready':
+            # Not in storage until ingested; the same URL in form_data resolves once status is 'ready'
+            data['file'] = None
+        return data
 
-class ApplicationSerializer(serializers.ModelSerializer):
+class ApplicationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     job_post_details = JobPostSerializer(source='job_post', read_only=True)
     documents = ApplicationDocumentSerializer(many=True, read_only=True)
     agency_code = serializers.SerializerMethodField()
     
     class Meta:
         model = Application
-        fields = ['id', 'custom_application_id', 'agency_code', 'job_post', 'job_post_details', 'full_name', 'email', 'phone', 'form_data', 'photo', 'signature', 'status', 'notes', 'documents', 'created_at', 'updated_at', 'ip_address']
-        read_only_fields = ['custom_application_id', 'status', 'created_at', 'updated_at', 'ip_address']
+        fields = ['id', 'custom_application_id', 'agency_code', 'job_post', 'job_post_details', 'full_name', 'email', 'phone', 'form_data', 'schema_snapshot', 'photo', 'signature', 'photo_thumbnail', 'photo_review', 'signature_thumbnail', 'signature_review', 'status', 'notes', 'total_experience_days', 'documents', 'created_at', 'updated_at', 'ip_address']
+        read_only_fields = ['custom_application_id', 'schema_snapshot', 'status', 'total_experience_days', 'created_at', 'updated_at', 'ip_address']
+        expandable_fields = ['job_post_details', 'documents', 'form_data']
+        extra_kwargs = {
+            # Load the snapshot checksum and agency with the job post; the schema itself is only read on a validator cache miss
+            'job_post': {'queryset': JobPost.objects.select_related('agency', 'current_schema').defer('current_schema__schema')},
+        }
     
     def get_agency_code(self, obj):
         return obj.job_post.agency.code
 
-    def validate_form_data(self, value):
-        # Validate that form_data matches the job_post's form_schema
-        job_post = self.context.get('job_post')
-        if job_post:
-            schema_fields = {field['name'] for field in job_post.form_schema['fields']}
-            form_data_fields = set(value.keys())
-            
-            # Check for missing required fields
-            missing_fields = schema_fields - form_data_fields
-            if missing_fields:
-                raise serializers.ValidationError(f'Missing required fields: {", ".join(missing_fields)}')
-            
-            # Check for extra fields
-            extra_fields = form_data_fields - schema_fields
-            if extra_fields:
-                raise serializers.ValidationError(f'Extra fields not allowed: {", ".join(extra_fields)}')
-        
-        return value 
\ No newline at end of file
+    def validate_photo(self, value):
+        validate_image_dimensions(value.image, max_width=MAX_IMAGE_SIDE, max_height=MAX_IMAGE_SIDE)
+        return value
+
+    def validate_signature(self, value):
+        validate_image_dimensions(value.image, min_height=40, max_width=MAX_IMAGE_SIDE, max_height=MAX_IMAGE_SIDE)
+        return value
+
+    def validate(self, attrs):
+        # Validate form_data against the compiled validator for the job post's schema snapshot
+        job_post = attrs.get('job_post') or getattr(self.instance, 'job_post', None)
+        if 'form_data' in attrs and job_post and job_post.current_schema:
+            try:
+                get_form_validator(job_post.current_schema).validate(attrs['form_data'], self.get_uploaded_files())
+            except DjangoValidationError as exc:
+                detail = exc.message_dict if hasattr(exc, 'error_dict') else exc.messages
+                raise serializers.ValidationError({'form_data': detail})
+        return attrs
+
+    def get_uploaded_files(self):
+        request = self.context.get('request')
+        return request.FILES if request is not None else {}
+
+
+class ApplicationCommitSerializer(ApplicationSerializer):
+    """
+    Creates an application from files already uploaded to storage. Photo and
+    signature are given as storage keys, and certificate values in form_data
+    are storage keys too. Each object is checked with a HEAD request.
+    """
+    photo_key = serializers.CharField(write_only=True)
+    signature_key = serializers.CharField(write_only=True)
+
+    class Meta(ApplicationSerializer.Meta):
+        fields = ApplicationSerializer.Meta.fields + ['photo_key', 'signature_key']
+        read_only_fields = ApplicationSerializer.Meta.read_only_fields + ['photo', 'signature']
+
+    def validate(self, attrs):
+        errors = {}
+        self.stored_objects = {}
+        for field in ('photo', 'signature'):
+            key = attrs[f'{field}_key']
+            error = self._check_stored_object(key, IMAGE_CONTENT_TYPES)
+            if error:
+                errors[f'{field}_key'] = error
+            else:
+                # Top-level schema file fields are looked up by field name
+                self.stored_objects[field] = self.stored_objects[key]
+
+        form_data = attrs.get('form_data')
+        form_data = form_data if isinstance(form_data, dict) else {}
+        for name in self._file_field_names(attrs['job_post']):
+            key = form_data.get(name)
+            if key:
+                # Checked against the schema's accept list by the form validator
+                error = self._check_stored_object(key)
+                if error:
+                    errors.setdefault('form_data', {})[name] = error
+        for list_key, _ in CERTIFICATE_DOCUMENT_TYPES:
+            items = form_data.get(list_key)
+            if not isinstance(items, list):
+                continue
+            for index, item in enumerate(items):
+                key = item.get('certificate') if isinstance(item, dict) else None
+                if not key:
+                    continue
+                error = self._check_stored_object(key, DOCUMENT_CONTENT_TYPES)
+                if error:
+                    errors.setdefault('form_data', {})[f'{list_key}[{index}].certificate'] = error
+
+        if errors:
+            raise serializers.ValidationError(errors)
+        return super().validate(attrs)
+
+    def _file_field_names(self, job_post):
+        if not job_post.current_schema:
+            return []
+        fields = get_form_validator(job_post.current_schema).fields
+        return [name for name, (field_type, _, _) in fields.items() if field_type == 'file']
+
+    def _check_stored_object(self, key, allowed_types=None):
+        """
+        Return an error message for an unusable storage key, or None. Valid
+        objects are remembered in self.stored_objects.
+        """
+        if not isinstance(key, str) or not key.startswith(settings.DIRECT_UPLOAD_PREFIX) or '..' in key.split('/'):
+            return 'Not a valid upload key.'
+        metadata = get_object_metadata(key)
+        if metadata is None:
+            return 'No uploaded file found for this key.'
+        stored = StoredObject(key, metadata['size'], metadata['content_type'])
+        try:
+            validate_file_size(stored)
+        except DjangoValidationError as exc:
+            return exc.messages[0]
+        if allowed_types and stored.content_type not in allowed_types:
+            return f'File type {stored.content_type} is not allowed. Allowed types: {", ".join(allowed_types)}'
+        self.stored_objects[key] = stored
+        return None
+
+    def get_uploaded_files(self):
+        return self.stored_objects
+
+    def create(self, validated_data):
+        photo_key = validated_data.pop('photo_key')
+        signature_key = validated_data.pop('signature_key')
+        application = Application(**validated_data)
+        # Point the file fields at the uploaded objects instead of saving new copies
+        application.photo.name = photo_key
+        application.signature.name = signature_key
+
+        form_data = application.form_data
+        for name in self._file_field_names(application.job_post):
+            if form_data.get(name) in self.stored_objects:
+                form_data[name] = get_direct_upload_storage().url(form_data[name])
+
+        documents = []
+        for list_key, document_type in CERTIFICATE_DOCUMENT_TYPES:
+            for item in form_data.get(list_key) or []:
+                key = item.get('certificate') if isinstance(item, dict) else None
+                if key in self.stored_objects:
+                    documents.append(ApplicationDocument(document_type=document_type, file=key))
+                    # Store the file URL in the JSON, as multipart submissions do
+                    item['certificate'] = get_direct_upload_storage().url(key)
+
+        with transaction.atomic():
+            application.save()
+            for document in documents:
+                document.application = application
+            ApplicationDocument.objects.bulk_create(documents)
+        return application
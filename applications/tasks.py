@@ -0,0 +1,183 @@
+import io
+import logging
+import tempfile
+import zlib
+from datetime import timedelta
+
+from django.core.files import File
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+from common.storage import staging_storage
+from agencies.models import FormSchemaSnapshot
+from common.tasks import enqueue, task
+from .form_query import sync_form_data_indexes
+from .images import RENDITIONS, render_image
+from .imports import ApplicationImporter
+from .models import Application, ApplicationDocument, ApplicationImport
+
+logger = logging.getLogger(__name__)
+
+
+def _replace_url(value, old_url, new_url):
+    if isinstance(value, dict):
+        return {key: _replace_url(item, old_url, new_url) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_replace_url(item, old_url, new_url) for item in value]
+    return new_url if value == old_url else value
+
+
+def mark_ingest_failed(exc, document_id):
+    ApplicationDocument.objects.filter(pk=document_id).exclude(status='ready').update(status='failed', error=str(exc))
+
+
+@task('applications.ingest_document', on_failure=mark_ingest_failed)
+def ingest_document(document_id):
+    """
+    Move a staged upload into storage under the document's reserved name.
+    """
+    document = ApplicationDocument.objects.filter(pk=document_id).first()
+    if document is None or document.status == 'ready':
+        return
+
+    # Never step back from ready if a requeued copy of this task finished in between
+    ApplicationDocument.objects.filter(pk=document.pk).exclude(status='ready').update(status='processing')
+    try:
+        with transaction.atomic():
+            # The blob reference, the form_data URL and the document's new name are recorded together,
+            # and the row lock keeps a concurrent copy of this task from storing the file twice
+            document = ApplicationDocument.objects.select_for_update().get(pk=document.pk)
+            if document.status == 'ready':
+                return
+            with staging_storage.open(document.staged_file) as staged:
+                stored_name = document.file.storage.save(document.file.name, staged)
+
+            if stored_name != document.file.name:
+                # Documents staged before names were content-addressed; patch the URL recorded in form_data.
+                # The application row lock keeps its other certificates' ingests from overwriting this one
+                old_url = document.file.url
+                document.file.name = stored_name
+                application = Application.objects.select_for_update().get(pk=document.application_id)
+                application.form_data = _replace_url(application.form_data, old_url, document.file.url)
+                application.save(update_fields=['form_data'])
+
+            ApplicationDocument.objects.filter(pk=document.pk).update(
+                file=stored_name, status='ready', staged_file='', error='', processed_at=timezone.now()
+            )
+    except Exception as exc:
+        # Still processing while the queue retries; mark_ingest_failed runs after the last attempt
+        ApplicationDocument.objects.filter(pk=document.pk).update(error=str(exc))
+        raise
+    staging_storage.delete(document.staged_file)
+
+
+@task('applications.render_images')
+def render_images(application_id):
+    """
+    Render the thumbnail and review copies of an application's photo and signature.
+    """
+    fields = [f'{source}_{rendition}' for source, renditions in RENDITIONS.items() for rendition in renditions]
+    application = Application.objects.only('id', *RENDITIONS, *fields).filter(pk=application_id).first()
+    if application is None:
+        return
+
+    updates = {}
+    for source_field, renditions in RENDITIONS.items():
+        source = getattr(application, source_field)
+        if not source:
+            continue
+        with source.open('rb') as f:
+            data = f.read()
+        for rendition, (width, height, mode) in renditions.items():
+            try:
+                content = render_image(io.BytesIO(data), width, height, mode)
+            except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+                # Retrying will not fix a file Pillow cannot read
+                logger.warning(f"Cannot render {source_field} of application {application_id}: {exc}")
+                break
+            target = getattr(application, f'{source_field}_{rendition}')
+            name = target.field.generate_filename(application, f'{application.pk}-{source_field}-{rendition}.jpg')
+            updates[target.field.name] = (target.name, target.storage.save(name, content))
+
+    Application.objects.filter(pk=application.pk).update(**{field: new for field, (_, new) in updates.items()})
+    for field, (old, new) in updates.items():
+        # update() skips the signals django-cleanup relies on, so remove replaced copies here
+        if old and old != new:
+            getattr(application, field).storage.delete(old)
+
+
+@task('applications.sync_form_indexes')
+def sync_form_indexes(snapshot_id):
+    """
+    Build form_data indexes for the fields a published form schema marks as indexed.
+    """
+    snapshot = FormSchemaSnapshot.objects.filter(pk=snapshot_id).only('schema').first()
+    if snapshot is None:
+        return
+    built = sync_form_data_indexes(snapshot.schema)
+    if built:
+        logger.info(f"Built form_data indexes {', '.join(built)} for schema snapshot #{snapshot_id}")
+
+
+def mark_import_failed(exc, import_id):
+    ApplicationImport.objects.filter(pk=import_id).exclude(status='done').update(status='failed', error=str(exc))
+
+
+IMPORT_LOCK_CLASS = zlib.crc32(b'applications.import_applications') & 0x7fffffff
+
+
+@task('applications.import_applications', on_failure=mark_import_failed)
+def import_applications(import_id):
+    """
+    Run an admin-uploaded ApplicationImport. Progress is committed with each
+    batch, so a retry resumes after the last imported row.
+
+    A long import can outlive its task lease and be handed to a second worker,
+    so the run holds a session advisory lock on the import. A worker that finds
+    it held leaves the rows alone and checks back after a lease; the lock goes
+    with the first worker's connection if it dies.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_lock(%s, %s)', [IMPORT_LOCK_CLASS, import_id])
+        locked = cursor.fetchone()[0]
+    if not locked:
+        logger.info(f'Import #{import_id} is already running in another worker')
+        enqueue('applications.import_applications', delay=timedelta(seconds=settings.TASK_LEASE_SECONDS),
+                import_id=import_id)
+        return
+    try:
+        _run_import(import_id)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [IMPORT_LOCK_CLASS, import_id])
+
+
+def _run_import(import_id):
+    job = ApplicationImport.objects.select_related('job_post').filter(pk=import_id).first()
+    if job is None or job.status == 'done':
+        return
+
+    ApplicationImport.objects.filter(pk=job.pk).update(status='running', error='')
+
+    def record_progress(result, last_row):
+        ApplicationImport.objects.filter(pk=job.pk).update(
+            total_rows=result.total, imported_rows=result.imported, rejected_rows=result.rejected, last_row=last_row
+        )
+
+    try:
+        with tempfile.TemporaryFile('w+', newline='') as report, job.file.open('rb') as source:
+            importer = ApplicationImporter(job.job_post, report=report, allow_missing_files=job.allow_missing_files,
+                                           on_batch=record_progress)
+            result = importer.import_file(source, job.file_format, resume_after=job.last_row)
+            report.seek(0)
+            job.report.save(f'import-{job.pk}-rejected.csv', File(report), save=False)
+    except Exception as exc:
+        # Still running while the queue retries; mark_import_failed runs after the last attempt
+        ApplicationImport.objects.filter(pk=job.pk).update(error=str(exc))
+        raise
+    ApplicationImport.objects.filter(pk=job.pk).update(
+        status='done', report=job.report.name, total_rows=result.total, imported_rows=result.imported,
+        rejected_rows=result.rejected, finished_at=timezone.now(),
+    )
@@ -1,3 +1,1322 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+from importlib import import_module
+from datetime import date
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import boto3
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from agencies.models import Agency, JobPost
+from agencies.schemas import has_indexed_fields
+from common.models import IdempotencyKey, RateLimitBucket, StoredBlob, Task
+from common.storage import content_addressed_storage, staging_storage
+from common.tasks import claim_tasks, enqueue, run_task
+from common.uploadhandlers import StreamingUploadHandler
+from dashboard.models import StatusCount
+from .experience import total_experience_days
+from .export import _cell
+from .form_query import form_data_indexes
+from .images import render_image
+from .imports import ApplicationImporter
+from .models import AgencyApplicationSequence, Application, ApplicationDocument, ApplicationImport, ApplicationStatusChange
+from .serializers import MAX_IMAGE_SIDE, ApplicationDocumentSerializer, ApplicationSerializer
+from .tasks import IMPORT_LOCK_CLASS, import_applications, ingest_document, render_images
+from .validation import REQUIRED_MESSAGE, FormDataValidator, _ValidatorCache
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only needed to run the storage tests
+    mock_aws = None
+
+
+class TemporaryStorageMixin:
+    """
+    Point MEDIA_ROOT and UPLOAD_STAGING_ROOT at directories removed after each test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for setting in ('MEDIA_ROOT', 'UPLOAD_STAGING_ROOT'):
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            override = override_settings(**{setting: directory.name})
+            override.enable()
+            self.addCleanup(override.disable)
+
+
+class ApplicationQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Query Count Agency', code='QCA')
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': []})
+        cls.user = User.objects.create_user('reviewer', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_applications(self, count):
+        for i in range(count):
+            application = Application.objects.create(
+                job_post=self.job_post,
+                full_name=f'Applicant {i}',
+                email=f'applicant{i}@example.com',
+                phone='9876543210',
+                form_data={'work_experience': []},
+                photo='applications/photos/photo.jpg',
+                signature='applications/signatures/signature.png',
+            )
+            ApplicationDocument.objects.create(application=application, document_type='education_certificate',
+                                               file='applications/documents/certificate.pdf')
+
+    def test_list_query_count_does_not_depend_on_page_size(self):
+        # The page itself and the documents prefetch; cursor pagination runs no COUNT
+        for total in (1, 10):
+            Application.objects.all().delete()
+            self.create_applications(total)
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/applications/')
+            self.assertEqual(len(response.json()['results']), total)
+
+    def test_retrieve_query_count(self):
+        self.create_applications(1)
+        application = Application.objects.get()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/applications/{application.pk}/')
+        self.assertEqual(response.json()['agency_code'], 'QCA')
+        self.assertEqual(len(response.json()['documents']), 1)
+
+    def test_sparse_fieldset_skips_related_data(self):
+        self.create_applications(5)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/applications/', {'fields': 'id,custom_application_id,full_name,status'})
+        row = response.json()['results'][0]
+        self.assertEqual(set(row), {'id', 'custom_application_id', 'full_name', 'status'})
+
+    def test_expand_adds_expandable_fields(self):
+        self.create_applications(2)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/applications/', {'fields': 'id', 'expand': 'documents,notes'})
+        row = response.json()['results'][0]
+        self.assertEqual(set(row), {'id', 'documents'})
+
+    def test_cursor_pagination_with_approximate_count(self):
+        self.create_applications(3)
+        response = self.client.get('/api/applications/', {'page_size': 2, 'count': 'approx', 'fields': 'id'})
+        body = response.json()
+        self.assertIsInstance(body['count'], int)
+        self.assertEqual(len(body['results']), 2)
+
+        next_page = self.client.get(body['next']).json()
+        self.assertIsNone(next_page['next'])
+        seen = [row['id'] for row in body['results'] + next_page['results']]
+        expected = list(Application.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+
+class ApplicationSequenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Sequence Agency', code='SEQ')
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': []})
+
+    def create_application(self, **kwargs):
+        return Application.objects.create(
+            job_post=self.job_post, full_name='Applicant', email='applicant@example.com', phone='9000000000',
+            form_data={}, photo='applications/photos/photo.jpg', signature='applications/signatures/sig.png', **kwargs)
+
+    def test_allocates_consecutive_ids_per_agency(self):
+        other = Agency.objects.create(name='Other Agency', code='OTH')
+        self.assertEqual([self.create_application().custom_application_id for _ in range(2)], ['SEQ-001', 'SEQ-002'])
+        self.assertEqual(AgencyApplicationSequence.allocate_ids(other), ['OTH-001'])
+        self.assertEqual(self.create_application().custom_application_id, 'SEQ-003')
+        # An ID given explicitly is kept and takes no number
+        self.assertEqual(self.create_application(custom_application_id='SEQ-900').custom_application_id, 'SEQ-900')
+        self.assertEqual(AgencyApplicationSequence.objects.get(agency=self.agency).last_value, 3)
+
+    def test_allocates_blocks(self):
+        self.assertEqual(AgencyApplicationSequence.allocate(self.agency.pk, 3), range(1, 4))
+        self.assertEqual(AgencyApplicationSequence.allocate_ids(self.agency, 2), ['SEQ-004', 'SEQ-005'])
+        self.assertEqual(AgencyApplicationSequence.allocate(self.agency.pk), range(6, 7))
+        with self.assertRaises(ValueError):
+            AgencyApplicationSequence.allocate(self.agency.pk, 0)
+
+    def test_backfill_starts_after_the_highest_existing_id(self):
+        backfill_sequences = import_module('applications.migrations.0004_backfill_application_sequences').backfill_sequences
+        empty = Agency.objects.create(name='Empty Agency', code='EMP')
+        for custom_application_id in ('SEQ-007', 'SEQ-1200', 'SEQ-012', 'OLD-5000', 'SEQ-abc'):
+            self.create_application(custom_application_id=custom_application_id)
+        AgencyApplicationSequence.objects.all().delete()
+
+        backfill_sequences(django_apps, None)
+        self.assertEqual(dict(AgencyApplicationSequence.objects.values_list('agency__code', 'last_value')),
+                         {'SEQ': 1200, 'EMP': 0})
+        self.assertEqual(self.create_application().custom_application_id, 'SEQ-1201')
+        self.assertEqual(AgencyApplicationSequence.allocate_ids(empty), ['EMP-001'])
+
+
+class ApplicationSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = Agency.objects.create(name='Search Agency', code='SRA')
+        job_post = JobPost.objects.create(agency=agency, title='Lab Assistant', description='', form_schema={'fields': []})
+        for full_name, email, phone in [
+            ('Asha Rao', 'asha.rao@example.com', '9876543210'),
+            ('Rahul Nair', 'rahul.n@example.com', '9123456789'),
+            ('Asha Menon', 'menon.asha@example.org', '9000011111'),
+        ]:
+            Application.objects.create(job_post=job_post, full_name=full_name, email=email, phone=phone, form_data={},
+                                       photo='applications/photos/photo.jpg', signature='applications/signatures/sig.png')
+        cls.user = User.objects.create_user('searcher', is_staff=True)
+
+    def search(self, term):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/applications/', {'q': term, 'fields': 'full_name'})
+        self.assertEqual(response.status_code, 200)
+        return [row['full_name'] for row in response.json()['results']]
+
+    def test_matches_name_words_email_and_phone_fragments(self):
+        self.assertEqual(sorted(self.search('asha')), ['Asha Menon', 'Asha Rao'])
+        self.assertEqual(self.search('rahul.n@'), ['Rahul Nair'])
+        self.assertEqual(self.search('345678'), ['Rahul Nair'])
+
+    def test_falls_back_to_fuzzy_name_matching(self):
+        self.assertEqual(self.search('Aasha Raao')[0], 'Asha Rao')
+
+    @override_settings(SEARCH_RANK_CANDIDATES=1)
+    def test_ranks_only_the_newest_matches(self):
+        self.assertEqual(self.search('asha'), ['Asha Menon'])
+        # The cap applies to matches, so older rows are still found by narrower terms
+        self.assertEqual(self.search('rao'), ['Asha Rao'])
+
+    @override_settings(SEARCH_RANK_CANDIDATES=1)
+    def test_export_and_transition_cover_every_match(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/applications/export/', {'q': 'asha', 'export_format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(sorted(row['full_name'] for row in rows), ['Asha Menon', 'Asha Rao'])
+
+        response = client.post('/api/applications/transition/?q=asha', {'status': 'reviewing'}, format='json')
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(sorted(Application.objects.filter(status='reviewing').values_list('full_name', flat=True)),
+                         ['Asha Menon', 'Asha Rao'])
+
+    def test_admin_search_is_not_ranked(self):
+        self.client.force_login(User.objects.create_superuser('admin'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/applications/application/', {'q': 'asha'})
+        self.assertContains(response, 'Asha Menon')
+        self.assertContains(response, 'Asha Rao')
+        self.assertNotContains(response, 'Rahul Nair')
+        self.assertFalse(any('ts_rank' in query['sql'] for query in queries.captured_queries))
+
+
+class ApplicationFormFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = Agency.objects.create(name='Filter Agency', code='FLA')
+        job_post = JobPost.objects.create(agency=agency, title='Clerk', description='', form_schema={'fields': []})
+        for full_name, gender, education in [
+            ('Asha Rao', 'Female', [{'board': 'CBSE', 'percentage': 72.5, 'year_of_passing': '2015'}]),
+            ('Rahul Nair', 'Male', [{'board': 'State', 'percentage': '58', 'year_of_passing': '2012'},
+                                    {'board': 'ICSE', 'percentage': 61, 'year_of_passing': '2010'}]),
+            ('Meera Iyer', 'Female', [{'board': 'State', 'percentage': 55, 'year_of_passing': '2018'}]),
+        ]:
+            Application.objects.create(
+                job_post=job_post, full_name=full_name, email=f'{full_name.split()[0].lower()}@example.com',
+                phone='9000000000', form_data={'gender': gender, 'age': len(full_name), 'education_qualifications': education},
+                photo='applications/photos/photo.jpg', signature='applications/signatures/sig.png',
+            )
+        cls.user = User.objects.create_user('filterer', is_staff=True)
+
+    def filter(self, **params):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get('/api/applications/', {'fields': 'full_name', **params})
+
+    def names(self, **params):
+        response = self.filter(**params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(row['full_name'] for row in response.json()['results'])
+
+    def test_filters_top_level_values(self):
+        self.assertEqual(self.names(**{'form.gender': 'Female'}), ['Asha Rao', 'Meera Iyer'])
+        self.assertEqual(self.names(**{'form.age__gte': '10'}), ['Meera Iyer', 'Rahul Nair'])
+
+    def test_filters_array_items_by_containment(self):
+        self.assertEqual(self.names(**{'form.education_qualifications[].board': 'CBSE'}), ['Asha Rao'])
+        self.assertEqual(self.names(**{'form.education_qualifications[].board__in': 'CBSE,ICSE'}),
+                         ['Asha Rao', 'Rahul Nair'])
+        self.assertEqual(self.names(**{'form.education_qualifications[].year_of_passing': '2018'}), ['Meera Iyer'])
+
+    def test_filters_array_items_by_range(self):
+        self.assertEqual(self.names(**{'form.education_qualifications[].percentage__gte': '60'}),
+                         ['Asha Rao', 'Rahul Nair'])
+        self.assertEqual(self.names(**{'form.education_qualifications[].year_of_passing__lt': '2012'}),
+                         ['Rahul Nair'])
+
+    def test_rejects_malformed_filters(self):
+        self.assertEqual(self.filter(**{"form.gender'--": 'x'}).status_code, 400)
+        self.assertEqual(self.filter(**{'form.gender__like': 'x'}).status_code, 400)
+
+
+class FormDataIndexTests(SimpleTestCase):
+    def test_indexed_subfields_in_every_schema_style(self):
+        for key, subfields in [
+            ('fields', [{'name': 'board', 'type': 'text', 'indexed': True}]),
+            ('subfields', [{'name': 'board', 'type': 'text', 'indexed': True}]),
+            ('fields', {'board': {'type': 'text', 'indexed': True}}),
+            ('subfields', {'board': {'type': 'text', 'indexed': True}}),
+        ]:
+            schema = {'fields': [{'name': 'education', 'type': 'array', key: subfields}]}
+            self.assertTrue(has_indexed_fields(schema))
+            [(name, statement)] = form_data_indexes(schema)
+            self.assertTrue(name.startswith('app_form_gin_education_'))
+            self.assertIn("(form_data -> 'education') jsonb_path_ops", statement)
+
+    def test_unindexed_schema_builds_nothing(self):
+        schema = {'fields': [
+            {'name': 'education', 'type': 'array', 'subfields': {'board': {'type': 'text'}}},
+            {'name': 'age', 'type': 'number'},
+        ]}
+        self.assertFalse(has_indexed_fields(schema))
+        self.assertEqual(form_data_indexes(schema), [])
+        schema['fields'][1]['indexed'] = True
+        self.assertEqual([name.split('_')[2] for name, _ in form_data_indexes(schema)], ['text', 'num'])
+
+
+class ExperienceTests(TestCase):
+    def test_merges_overlapping_and_contained_periods(self):
+        self.assertEqual(total_experience_days([
+            {'from_date': '2020-01-01', 'to_date': '2020-01-31'},
+            {'from_date': '2020-01-20', 'to_date': '2020-02-09'},
+            {'from_date': '2020-01-05', 'to_date': '2020-01-10'},
+            {'from_date': '2020-02-10', 'to_date': '2020-02-10'},
+        ]), 41)
+        self.assertEqual(total_experience_days([
+            {'from_date': '2020-01-01', 'to_date': '2020-01-10'},
+            {'from_date': '2020-03-01', 'to_date': '2020-03-10'},
+            {'from_date': 'soon', 'to_date': '2020-03-10'},
+            'Teacher',
+        ]), 20)
+        self.assertEqual(total_experience_days(None), 0)
+
+    def test_caps_periods_at_as_on_date(self):
+        periods = [
+            {'from_date': '2020-01-01', 'to_date': '2020-12-31'},
+            {'from_date': '2021-02-01', 'to_date': '2021-03-01'},
+            {'from_date': '2020-06-01'},
+        ]
+        self.assertEqual(total_experience_days(periods, date(2020, 1, 31)), 31)
+        # Open-ended periods run to the cut-off, and have no end without one
+        self.assertEqual(total_experience_days(periods[2:], date(2020, 6, 30)), 30)
+        self.assertEqual(total_experience_days(periods), 366 + 29)
+
+    def test_stores_the_total_and_filters_on_it(self):
+        agency = Agency.objects.create(name='Experience Agency', code='EXA')
+        job_post = JobPost.objects.create(agency=agency, title='Clerk', description='',
+                                          form_schema={'fields': [], 'as_on_date': '2020-12-31'})
+        for full_name, work_experience in [
+            ('Asha Rao', [{'from_date': '2020-01-01', 'to_date': '2020-01-10'}]),
+            ('Rahul Nair', [{'from_date': '2020-01-01', 'to_date': '2020-06-30'},
+                            {'from_date': '2020-03-01', 'to_date': '2022-01-01'}]),
+            ('Meera Iyer', [{'from_date': '2020-12-01'}]),
+        ]:
+            Application.objects.create(
+                job_post=job_post, full_name=full_name, email=f'{full_name.split()[0].lower()}@example.com',
+                phone='9000000000', form_data={'work_experience': work_experience},
+                photo='applications/photos/photo.jpg', signature='applications/signatures/sig.png',
+            )
+        self.assertEqual(dict(Application.objects.values_list('full_name', 'total_experience_days')),
+                         {'Asha Rao': 10, 'Rahul Nair': 366, 'Meera Iyer': 31})
+
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('experience', is_staff=True))
+
+        def names(**params):
+            response = client.get('/api/applications/', {'fields': 'full_name', **params})
+            self.assertEqual(response.status_code, 200)
+            return sorted(row['full_name'] for row in response.json()['results'])
+
+        self.assertEqual(names(min_experience='31'), ['Meera Iyer', 'Rahul Nair'])
+        self.assertEqual(names(max_experience='31'), ['Asha Rao', 'Meera Iyer'])
+        self.assertEqual(names(min_experience='11', max_experience='365'), ['Meera Iyer'])
+        self.assertEqual(client.get('/api/applications/', {'min_experience': 'a year'}).status_code, 400)
+
+
+class FormDataValidatorTests(SimpleTestCase):
+    def errors(self, fields, form_data, files=None):
+        try:
+            FormDataValidator({'fields': fields}).validate(form_data, files)
+        except ValidationError as exc:
+            return {path: messages[0] for path, messages in exc.message_dict.items()}
+        return {}
+
+    def test_field_types(self):
+        fields = [
+            {'name': 'name', 'type': 'text'},
+            {'name': 'email', 'type': 'email'},
+            {'name': 'age', 'type': 'number'},
+            {'name': 'dob', 'type': 'date'},
+            {'name': 'passed', 'type': 'month_year'},
+            {'name': 'agree', 'type': 'checkbox'},
+            {'name': 'gender', 'type': 'select', 'options': ['F', {'value': 'M', 'label': 'Male'}]},
+        ]
+        valid = {'name': 'Asha', 'email': 'asha@example.com', 'age': '27', 'dob': '1998-02-01',
+                 'passed': '2015-05', 'agree': True, 'gender': 'M'}
+        self.assertEqual(self.errors(fields, valid), {})
+        self.assertEqual(self.errors(fields, {'name': 7, 'email': 'asha', 'age': True, 'dob': '01/02/1998',
+                                              'passed': '2015-13', 'agree': 'yes', 'gender': 'X'}), {
+            'name': 'Must be a string.',
+            'email': 'Enter a valid email address.',
+            'age': 'Must be a number.',
+            'dob': 'Enter a valid date in YYYY-MM-DD format.',
+            'passed': 'Enter a valid date in YYYY-MM-DD format.',
+            'agree': 'Must be true or false.',
+            'gender': '"X" is not a valid choice.',
+        })
+        self.assertEqual(self.errors(fields, {'nickname': 'A'}), {'nickname': 'Field is not part of the form schema.'})
+
+    def test_subfields_as_list_or_dict(self):
+        for subfields in (
+            [{'name': 'board', 'type': 'text', 'required': True}, {'name': 'percentage', 'type': 'number'}],
+            {'board': {'type': 'text', 'required': True}, 'percentage': {'type': 'number'}},
+        ):
+            fields = [
+                {'name': 'address', 'type': 'group', 'subfields': subfields},
+                {'name': 'education', 'type': 'array', 'fields': subfields, 'min_items': 1, 'max_items': 2},
+            ]
+            self.assertEqual(self.errors(fields, {
+                'address': {'board': 'CBSE'},
+                'education': [{'board': 'CBSE', 'percentage': 72.5}],
+            }), {})
+            self.assertEqual(self.errors(fields, {
+                'address': {'percentage': 'high'},
+                'education': [{'board': 'CBSE'}, 'ICSE', {'board': 'State', 'grade': 'A'}],
+            }), {
+                'address.board': REQUIRED_MESSAGE,
+                'address.percentage': 'Must be a number.',
+                'education': 'No more than 2 item(s) allowed.',
+                'education[1]': 'Must be an object.',
+                'education[2].grade': 'Field is not part of the form schema.',
+            })
+            self.assertEqual(self.errors(fields, {'address': [], 'education': {}}), {})
+            self.assertEqual(self.errors(fields, {'address': 'x', 'education': 'x'}),
+                             {'address': 'Must be an object.', 'education': 'Must be a list.'})
+
+    def test_required_fields(self):
+        fields = [{'name': 'name', 'type': 'text', 'required': True}, {'name': 'phone', 'type': 'text'}]
+        for empty in (None, '', [], {}):
+            self.assertEqual(self.errors(fields, {'name': empty}), {'name': REQUIRED_MESSAGE})
+        self.assertEqual(self.errors(fields, {'name': 'Asha', 'phone': ''}), {})
+
+    def test_file_accept_list(self):
+        fields = [{'name': 'resume', 'type': 'file', 'required': True, 'accept': ['.pdf', 'image/*', 'application/msword']}]
+        for name, content_type in [('cv.PDF', 'application/octet-stream'), ('cv', 'image/png'), ('cv.bin', 'application/msword')]:
+            files = {'resume': SimpleUploadedFile(name, b'x', content_type=content_type)}
+            self.assertEqual(self.errors(fields, {}, files), {})
+        files = {'resume': SimpleUploadedFile('cv.exe', b'x', content_type='application/x-msdownload')}
+        self.assertEqual(self.errors(fields, {}, files), {'resume': 'File type of "cv.exe" is not allowed.'})
+        # Stored paths are not re-checked, and a missing upload is a missing field
+        self.assertEqual(self.errors(fields, {'resume': 'blobs/ab/cd.exe'}), {})
+        self.assertEqual(self.errors(fields, {}), {'resume': REQUIRED_MESSAGE})
+        self.assertEqual(self.errors(fields, {'resume': 3}), {'resume': 'Must reference an uploaded file.'})
+
+
+class ValidatorCacheTests(SimpleTestCase):
+    def test_compiles_each_checksum_once_and_evicts_the_oldest(self):
+        cache = _ValidatorCache(2)
+        loads = []
+
+        def loader(name):
+            def load():
+                loads.append(name)
+                return {'fields': [{'name': name, 'type': 'text'}]}
+            return load
+
+        first = cache.get('a', loader('a'))
+        self.assertIs(cache.get('a', loader('a')), first)
+        cache.get('b', loader('b'))
+        cache.get('a', loader('a'))
+        cache.get('c', loader('c'))
+        self.assertEqual(loads, ['a', 'b', 'c'])
+        # 'a' was used more recently than 'b', so 'b' was evicted
+        self.assertIs(cache.get('a', loader('a')), first)
+        cache.get('b', loader('b'))
+        self.assertEqual(loads, ['a', 'b', 'c', 'b'])
+
+        cache.clear()
+        self.assertIsNot(cache.get('a', loader('a')), first)
+
+
+class ApplicationExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = Agency.objects.create(name='Export Agency', code='EXP', default_form_schema={'fields': []})
+        job_post = JobPost.objects.create(agency=agency, title='Clerk', description='', form_schema={'fields': [
+            {'name': 'city', 'type': 'text', 'label': 'City'},
+            {'name': 'address', 'type': 'group', 'label': 'Address', 'subfields': {'pin': {'type': 'text'}}},
+            {'name': 'education_qualifications', 'type': 'array', 'label': 'Education', 'fields': [
+                {'name': 'board', 'type': 'text', 'label': 'Board'},
+            ]},
+        ]})
+        for full_name, form_data in [
+            ('Asha Rao', {'city': '=HYPERLINK("http://evil")', 'address': {'pin': '560001'},
+                          'education_qualifications': [{'board': 'CBSE'}, {'board': 'ICSE'}]}),
+            ('Rahul Nair', {'city': 'Pune', 'education_qualifications': []}),
+        ]:
+            Application.objects.create(
+                job_post=job_post, full_name=full_name, email='applicant@example.com', phone='9000000000',
+                form_data=form_data, photo='applications/photos/photo.jpg', signature='applications/signatures/sig.png',
+            )
+        cls.user = User.objects.create_user('exporter', is_staff=True)
+
+    def export(self, export_format):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client.get('/api/applications/export/', {'export_format': export_format})
+
+    def test_cell_escapes_formulas(self):
+        for value in ('=1+1', '+91 98765', '-5', '@SUM(A1)'):
+            self.assertEqual(_cell(value), f"'{value}")
+        self.assertEqual(_cell('Asha Rao'), 'Asha Rao')
+        self.assertEqual(_cell(None), '')
+        self.assertEqual(_cell(42), '42')
+        self.assertEqual(_cell({'pin': '560001'}), '{"pin": "560001"}')
+
+    def test_csv_flattens_groups_and_arrays(self):
+        response = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        header, first, second = rows
+        self.assertEqual(header[-4:], ['city', 'address.pin', 'education_qualifications.1.board',
+                                       'education_qualifications.2.board'])
+        self.assertEqual(first[2], 'Asha Rao')
+        self.assertEqual(first[-4:], ["'=HYPERLINK(\"http://evil\")", '560001', 'CBSE', 'ICSE'])
+        self.assertEqual(second[-4:], ['Pune', '', '', ''])
+
+    def test_ndjson_has_one_object_per_application(self):
+        response = self.export('ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['full_name'] for row in rows], ['Asha Rao', 'Rahul Nair'])
+        self.assertEqual(rows[0]['form_data']['address'], {'pin': '560001'})
+
+    def test_xlsx_matches_csv_columns(self):
+        from openpyxl import load_workbook
+
+        response = self.export('xlsx')
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)['Applications']
+        header, first, second = [list(row) for row in sheet.iter_rows(values_only=True)]
+        self.assertEqual(header[-4:], ['city', 'address.pin', 'education_qualifications.1.board',
+                                       'education_qualifications.2.board'])
+        self.assertEqual(first[-4:], ["'=HYPERLINK(\"http://evil\")", '560001', 'CBSE', 'ICSE'])
+
+    @override_settings(EXPORT_XLSX_MAX_ROWS=1)
+    def test_xlsx_is_capped(self):
+        response = self.export('xlsx')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('export_format=csv', response.json()['error'])
+        self.assertEqual(self.export('csv').status_code, 200)
+
+
+class ApplicationTransitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = Agency.objects.create(name='Transition Agency', code='TRA')
+        cls.job_post = JobPost.objects.create(agency=agency, title='Clerk', description='', form_schema={'fields': []})
+        cls.other_post = JobPost.objects.create(agency=agency, title='Typist', description='', form_schema={'fields': []})
+        cls.user = User.objects.create_user('transitioner', is_staff=True)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def apply(self, job_post=None, status='pending'):
+        return Application.objects.create(
+            job_post=job_post or self.job_post, full_name='Asha Rao', email='asha@example.com', phone='9000000000',
+            form_data={}, status=status,
+            photo='applications/photos/photo.jpg', signature='applications/signatures/sig.png',
+        )
+
+    def transition(self, body, params=''):
+        return self.client.post(f'/api/applications/transition/{params}', body, format='json')
+
+    def test_moves_allowed_applications_and_logs_history(self):
+        pending, reviewing, hired = self.apply(), self.apply(status='reviewing'), self.apply(status='hired')
+        response = self.transition({'status': 'shortlisted', 'ids': [pending.pk, reviewing.pk, hired.pk], 'note': 'Round 1'})
+        self.assertEqual(response.json(), {'status': 'shortlisted', 'updated': 2})
+
+        statuses = dict(Application.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {pending.pk: 'shortlisted', reviewing.pk: 'shortlisted', hired.pk: 'hired'})
+        self.assertEqual(
+            sorted(ApplicationStatusChange.objects.values_list('application_id', 'old_status', 'new_status', 'changed_by', 'note')),
+            [(pending.pk, 'pending', 'shortlisted', self.user.pk, 'Round 1'),
+             (reviewing.pk, 'reviewing', 'shortlisted', self.user.pk, 'Round 1')],
+        )
+        self.job_post.refresh_from_db()
+        self.assertEqual(self.job_post.get_status_counts(),
+                         {'pending': 0, 'reviewing': 0, 'shortlisted': 2, 'rejected': 0, 'hired': 1})
+        self.assertEqual(dict(StatusCount.objects.filter(job_post=self.job_post).values_list('status', 'count')),
+                         {'pending': 0, 'reviewing': 0, 'shortlisted': 2, 'hired': 1})
+
+    def test_moves_applications_matching_filters(self):
+        for _ in range(3):
+            self.apply()
+        other = self.apply(job_post=self.other_post)
+        response = self.transition({'status': 'rejected'}, f'?job_post={self.job_post.pk}')
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertEqual(Application.objects.get(pk=other.pk).status, 'pending')
+
+    def test_query_count_does_not_depend_on_selection_size(self):
+        small = [self.apply().pk for _ in range(2)]
+        with self.assertNumQueries(6):
+            self.transition({'status': 'reviewing', 'ids': small})
+        large = [self.apply().pk for _ in range(20)]
+        with self.assertNumQueries(6):
+            self.transition({'status': 'reviewing', 'ids': large})
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.transition({'status': 'archived', 'ids': [1]}).status_code, 400)
+        self.assertEqual(self.transition({'status': 'rejected'}).status_code, 400)
+        self.assertEqual(self.transition({'status': 'rejected', 'ids': 'all'}).status_code, 400)
+
+    def test_empty_filters_do_not_select_everything(self):
+        application = self.apply()
+        for params in ('?job_post=', '?q=', '?min_experience=&max_experience=', '?page_size=5'):
+            self.assertEqual(self.transition({'status': 'rejected'}, params).status_code, 400, params)
+        self.assertEqual(Application.objects.get(pk=application.pk).status, 'pending')
+        self.assertEqual(APIClient().post('/api/applications/transition/', {'status': 'rejected', 'ids': [1]},
+                                          format='json').status_code, 403)
+
+    def test_single_save_logs_history(self):
+        application = self.apply()
+        application.status = 'reviewing'
+        application.status_changed_by = self.user  # As ApplicationAdmin.save_model does
+        application.save()
+        change = ApplicationStatusChange.objects.get(application=application)
+        self.assertEqual((change.old_status, change.new_status, change.changed_by), ('pending', 'reviewing', self.user))
+
+
+IMPORT_SCHEMA = {'fields': [
+    {'name': 'full_name', 'label': 'Full Name', 'type': 'text', 'required': True},
+    {'name': 'email', 'label': 'Email', 'type': 'email', 'required': True},
+    {'name': 'phone', 'label': 'Phone Number', 'type': 'text', 'required': True},
+    {'name': 'resume', 'label': 'Resume', 'type': 'file', 'required': True, 'accept': ['.pdf']},
+    {'name': 'permanent_address', 'label': 'Address', 'type': 'group', 'fields': [
+        {'name': 'city', 'label': 'City', 'type': 'text', 'required': True},
+    ]},
+    {'name': 'education_qualifications', 'label': 'Education', 'type': 'array', 'fields': [
+        {'name': 'board', 'label': 'Board', 'type': 'text'},
+        {'name': 'year_of_passing', 'label': 'Year', 'type': 'text'},
+    ]},
+    {'name': 'declaration', 'label': 'Declaration', 'type': 'checkbox', 'required': True},
+]}
+
+IMPORT_CSV = """Application ID,Full Name,Email,Phone,Status,permanent_address.city,education_qualifications.1.board,education_qualifications.1.year_of_passing,education_qualifications.2.board,education_qualifications.2.year_of_passing,declaration
+OLD-1,Asha Rao,asha@example.com,9000000001,,Kochi,CBSE,2012,Kerala University,2015,yes
+OLD-2,Rahul Nair,not-an-email,9000000002,,Pune,ICSE,2011,,,yes
+OLD-3,Meera Iyer,meera@example.com,9000000003,shortlisted,Chennai,,,,,true
+"""
+
+
+class ApplicationImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = Agency.objects.create(name='Import Agency', code='IMP', default_form_schema=IMPORT_SCHEMA)
+        cls.job_post = JobPost.objects.create(agency=agency, title='Clerk', description='', form_schema={'fields': []})
+
+    def import_rows(self, content, file_format='csv', **kwargs):
+        report = io.StringIO()
+        importer = ApplicationImporter(self.job_post, report=report, allow_missing_files=True, **kwargs)
+        result = importer.import_file(io.BytesIO(content.encode()), file_format)
+        return result, list(csv.reader(io.StringIO(report.getvalue())))
+
+    def test_csv_rows_are_validated_and_inserted(self):
+        result, report = self.import_rows(IMPORT_CSV)
+        self.assertEqual(tuple(result), (3, 2, 1))
+        self.assertEqual(report[1][0], '2')
+        self.assertIn('email', json.loads(report[1][1]))
+
+        asha, meera = Application.objects.order_by('custom_application_id')
+        self.assertEqual((asha.custom_application_id, meera.custom_application_id), ('IMP-001', 'IMP-002'))
+        self.assertEqual(asha.form_data['permanent_address'], {'city': 'Kochi'})
+        self.assertEqual([item['board'] for item in asha.form_data['education_qualifications']],
+                         ['CBSE', 'Kerala University'])
+        self.assertIs(asha.form_data['declaration'], True)
+        self.assertEqual(meera.status, 'shortlisted')
+        self.assertNotIn('education_qualifications', meera.form_data)
+
+        self.job_post.refresh_from_db()
+        self.assertEqual((self.job_post.application_count, self.job_post.shortlisted_count), (2, 1))
+        self.assertEqual(StatusCount.objects.get(job_post=self.job_post, status='pending').count, 1)
+
+    def test_required_files_are_enforced_unless_allowed(self):
+        report = io.StringIO()
+        result = ApplicationImporter(self.job_post, report=report).import_file(io.BytesIO(IMPORT_CSV.encode()), 'csv')
+        self.assertEqual(result.imported, 0)
+        self.assertIn('form_data.resume', report.getvalue())
+
+    def test_ndjson_rows_and_stored_files(self):
+        blob = StoredBlob.objects.create(name='blobs/ab/abc.jpg', sha256='abc', size=10, ref_count=1)
+        lines = [
+            {'full_name': 'Asha Rao', 'email': 'asha@example.com', 'phone': '9000000001', 'photo': blob.name,
+             'form_data': {'permanent_address': {'city': 'Kochi'}, 'declaration': True}},
+            {'full_name': 'Rahul Nair', 'email': 'rahul@example.com', 'phone': '9000000002',
+             'photo': 'blobs/ff/missing.jpg', 'permanent_address': {'city': 'Pune'}, 'declaration': True},
+        ]
+        content = '\n'.join(json.dumps(line) for line in lines) + '\n{not json\n'
+        result, report = self.import_rows(content, 'ndjson')
+        self.assertEqual(tuple(result), (3, 1, 2))
+        self.assertEqual([row[0] for row in report[1:]], ['3', '2'])
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(Task.objects.filter(name='applications.render_images').count(), 1)
+
+    def test_query_count_does_not_depend_on_rows(self):
+        row = IMPORT_CSV.splitlines()[1]
+        small = '\n'.join(IMPORT_CSV.splitlines()[:1] + [row] * 5)
+        large = '\n'.join(IMPORT_CSV.splitlines()[:1] + [row] * 50)
+        self.import_rows(small)  # Compiles and caches the validator
+        with self.assertNumQueries(9):
+            self.import_rows(small)
+        with self.assertNumQueries(9):
+            self.import_rows(large)
+
+    def test_admin_import_task_resumes_after_committed_rows(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with override_settings(MEDIA_ROOT=media_root.name):
+            job = ApplicationImport(job_post=self.job_post, allow_missing_files=True, last_row=1)
+            job.file.save('offline.csv', ContentFile(IMPORT_CSV.encode()))
+            import_applications(job.pk)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.total_rows, job.imported_rows, job.rejected_rows), ('done', 3, 2, 1))
+            self.assertEqual(list(Application.objects.values_list('full_name', flat=True)), ['Meera Iyer'])
+            with job.report.open('r') as report:
+                self.assertEqual(len(report.read().splitlines()), 2)
+
+    def test_resumed_rows_rejected_for_missing_files_are_not_counted(self):
+        blob = StoredBlob.objects.create(name='blobs/ab/abc.jpg', sha256='abc', size=10, ref_count=1)
+        lines = [
+            {'full_name': name, 'email': f'{name.lower()}@example.com', 'phone': '9000000001', 'photo': photo,
+             'form_data': {'permanent_address': {'city': 'Kochi'}, 'declaration': True}}
+            for name, photo in [('Asha', 'blobs/ff/missing.jpg'), ('Rahul', blob.name), ('Meera', blob.name)]
+        ]
+        content = '\n'.join(json.dumps(line) for line in lines)
+        report = io.StringIO()
+        importer = ApplicationImporter(self.job_post, report=report, allow_missing_files=True)
+        result = importer.import_file(io.BytesIO(content.encode()), 'ndjson', resume_after=2)
+        self.assertEqual(tuple(result), (3, 2, 1))
+        self.assertEqual([row[0] for row in csv.reader(io.StringIO(report.getvalue()))][1:], ['1'])
+        self.assertEqual(list(Application.objects.values_list('full_name', flat=True)), ['Meera'])
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+
+    def test_import_stays_running_until_the_last_attempt(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with override_settings(MEDIA_ROOT=media_root.name):
+            job = ApplicationImport(job_post=self.job_post, allow_missing_files=True)
+            job.file.save('offline.csv', ContentFile(IMPORT_CSV.encode()))
+            enqueue('applications.import_applications', import_id=job.pk)
+            with mock.patch.object(ApplicationImporter, 'import_file', side_effect=OSError('disk unavailable')):
+                with self.assertLogs('common.tasks', 'ERROR'):
+                    run_task(claim_tasks(1)[0])
+                job.refresh_from_db()
+                self.assertEqual((job.status, job.error), ('running', 'disk unavailable'))
+
+                Task.objects.update(attempts=F('max_attempts') - 1, run_after=timezone.now())
+                with self.assertLogs('common.tasks', 'ERROR'):
+                    run_task(claim_tasks(1)[0])
+            job.refresh_from_db()
+            self.assertEqual(job.status, 'failed')
+
+
+    def test_import_held_by_another_worker_is_left_alone(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        other = connections.create_connection('default')
+        self.addCleanup(other.close)
+        with override_settings(MEDIA_ROOT=media_root.name):
+            job = ApplicationImport(job_post=self.job_post, allow_missing_files=True)
+            job.file.save('offline.csv', ContentFile(IMPORT_CSV.encode()))
+            with other.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_lock(%s, %s)', [IMPORT_LOCK_CLASS, job.pk])
+            import_applications(job.pk)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.imported_rows), ('queued', 0))
+            self.assertFalse(Application.objects.exists())
+            self.assertGreater(Task.objects.get(name='applications.import_applications').run_after, timezone.now())
+
+            with other.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [IMPORT_LOCK_CLASS, job.pk])
+            import_applications(job.pk)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.imported_rows), ('done', 2))
+
+
+def png_bytes(size=(200, 200)):
+    output = io.BytesIO()
+    Image.new('RGB', size, 'white').save(output, 'PNG')
+    return output.getvalue()
+
+
+class StreamingUploadTests(TemporaryStorageMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Streaming Agency', code='STA')
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': []})
+
+    def post(self, photo):
+        return APIClient().post('/api/applications/', {
+            'job_post': self.job_post.pk,
+            'full_name': 'Applicant',
+            'email': 'applicant@example.com',
+            'phone': '9876543210',
+            'form_data': '{}',
+            'photo': photo,
+            'signature': SimpleUploadedFile('signature.png', png_bytes(), 'image/png'),
+        }, format='multipart')
+
+    def test_file_type_is_sniffed_from_content(self):
+        response = self.post(SimpleUploadedFile('photo.jpg', b'MZ\x90\x00' + b'\x00' * 512, 'image/jpeg'))
+        self.assertEqual(response.status_code, 415)
+        self.assertIn('application/x-dosexec', response.json()['detail'])
+
+    def test_oversized_file_is_rejected_while_streaming(self):
+        photo = png_bytes()
+        with override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=len(photo) - 1):
+            response = self.post(SimpleUploadedFile('photo.png', photo, 'image/png'))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Application.objects.exists())
+
+
+def jpeg_bytes(size, orientation=None):
+    image = Image.new('RGB', size, 'white')
+    # Mark the left edge so rotation can be told apart from a plain resize
+    image.paste((255, 0, 0), (0, 0, size[0] // 4, size[1]))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    exif[0x010F] = 'Camera Maker'
+    output = io.BytesIO()
+    image.save(output, 'JPEG', exif=exif)
+    return output.getvalue()
+
+
+class ImageRenditionTests(TemporaryStorageMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = Agency.objects.create(name='Rendition Agency', code='REN')
+        cls.job_post = JobPost.objects.create(agency=agency, title='Clerk', description='', form_schema={'fields': []})
+
+    def render(self, data, width, height, mode):
+        return Image.open(render_image(io.BytesIO(data), width, height, mode))
+
+    def test_renditions_have_the_requested_geometry(self):
+        fitted = self.render(jpeg_bytes((1000, 500)), 150, 200, 'fit')
+        self.assertEqual((fitted.format, fitted.size), ('JPEG', (150, 200)))
+        self.assertEqual(self.render(jpeg_bytes((1000, 500)), 600, 800, 'bound').size, (600, 300))
+        self.assertEqual(self.render(jpeg_bytes((300, 100)), 600, 800, 'bound').size, (300, 100))
+
+        signature = Image.new('RGBA', (480, 80), (0, 0, 0, 0))
+        output = io.BytesIO()
+        signature.save(output, 'PNG')
+        padded = self.render(output.getvalue(), 240, 80, 'pad')
+        self.assertEqual((padded.mode, padded.size), ('RGB', (240, 80)))
+        self.assertEqual(padded.getpixel((120, 40)), (255, 255, 255))
+
+    def test_exif_orientation_is_applied_and_metadata_dropped(self):
+        # Orientation 6: stored landscape, displayed rotated 90 degrees clockwise
+        rendered = self.render(jpeg_bytes((400, 200), orientation=6), 600, 800, 'bound')
+        self.assertEqual(rendered.size, (200, 400))
+        red, green, _ = rendered.getpixel((100, 10))
+        self.assertGreater(red, 200)
+        self.assertLess(green, 50)
+        self.assertEqual(dict(rendered.getexif()), {})
+
+    def test_images_up_to_max_side_are_accepted(self):
+        serializer = ApplicationSerializer()
+        for size, valid in [((MAX_IMAGE_SIDE, 100), True), ((MAX_IMAGE_SIDE + 1, 100), False), ((100, 99), False)]:
+            photo = SimpleUploadedFile('photo.png', png_bytes(size), 'image/png')
+            photo.image = Image.open(io.BytesIO(photo.read()))
+            if valid:
+                serializer.validate_photo(photo)
+            else:
+                with self.assertRaises(ValidationError):
+                    serializer.validate_photo(photo)
+        # Oversized uploads are still only rendered at rendition size
+        self.assertEqual(self.render(jpeg_bytes((MAX_IMAGE_SIDE, 2000)), 600, 800, 'bound').size, (600, 150))
+
+    def test_render_images_stores_each_rendition(self):
+        photo = content_addressed_storage.save('applications/photos/photo.jpg', ContentFile(jpeg_bytes((1200, 1600))))
+        signature = content_addressed_storage.save('applications/signatures/signature.png', ContentFile(b'not an image'))
+        application = Application.objects.create(
+            job_post=self.job_post, full_name='Applicant', email='applicant@example.com', phone='9000000000',
+            form_data={}, photo=photo, signature=signature,
+        )
+        with self.assertLogs('applications.tasks', 'WARNING'):
+            render_images(application.pk)
+        application.refresh_from_db()
+        self.assertEqual(Image.open(application.photo_thumbnail).size, (150, 200))
+        self.assertEqual(Image.open(application.photo_review).size, (600, 800))
+        # An unreadable signature leaves its renditions empty without failing the photo
+        self.assertEqual((application.signature_thumbnail.name, application.signature_review.name), ('', ''))
+
+        # Rendering again replaces the previous copies
+        old = application.photo_thumbnail.name
+        with self.assertLogs('applications.tasks', 'WARNING'):
+            render_images(application.pk)
+        application.refresh_from_db()
+        self.assertNotEqual(application.photo_thumbnail.name, old)
+        self.assertFalse(application.photo_thumbnail.storage.exists(old))
+
+
+class IngestDocumentTests(TemporaryStorageMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        agency = Agency.objects.create(name='Ingest Agency', code='ING')
+        job_post = JobPost.objects.create(agency=agency, title='Clerk', description='', form_schema={'fields': []})
+        cls.application = Application.objects.create(
+            job_post=job_post, full_name='Applicant', email='applicant@example.com', phone='9876543210',
+            form_data={}, photo='applications/photos/photo.jpg', signature='applications/signatures/signature.png',
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.document = ApplicationDocument.stage(
+            self.application, 'education_certificate', ContentFile(b'%PDF-1.4 marks', name='marks.pdf'))
+        self.document.save()
+        Application.objects.filter(pk=self.application.pk).update(
+            form_data={'education_qualifications': [{'certificate': self.document.file.url}]})
+
+    def test_running_twice_stores_the_file_once(self):
+        ingest_document(document_id=self.document.pk)
+        ingest_document(document_id=self.document.pk)
+        document = ApplicationDocument.objects.get(pk=self.document.pk)
+        self.assertEqual(document.status, 'ready')
+        self.assertEqual(StoredBlob.objects.get(name=document.file.name).ref_count, 1)
+        self.assertEqual(Application.objects.get(pk=self.application.pk).form_data,
+                         {'education_qualifications': [{'certificate': document.file.url}]})
+
+    def test_attempt_that_dies_after_storing_takes_no_reference(self):
+        with mock.patch('applications.tasks.timezone.now', side_effect=RuntimeError('worker died')):
+            with self.assertRaises(RuntimeError):
+                ingest_document(document_id=self.document.pk)
+        self.assertFalse(StoredBlob.objects.exists())
+        ingest_document(document_id=self.document.pk)
+        document = ApplicationDocument.objects.get(pk=self.document.pk)
+        self.assertEqual(document.status, 'ready')
+        self.assertEqual(StoredBlob.objects.get(name=document.file.name).ref_count, 1)
+
+    def test_url_is_reserved_under_the_stored_name(self):
+        self.assertTrue(self.document.file.name.startswith('blobs/'))
+        self.assertIsNone(ApplicationDocumentSerializer(self.document).data['file'])
+        ingest_document(document_id=self.document.pk)
+        document = ApplicationDocument.objects.get(pk=self.document.pk)
+        self.assertEqual(document.file.name, self.document.file.name)
+        self.assertTrue(document.file.storage.exists(document.file.name))
+        self.assertEqual(ApplicationDocumentSerializer(document).data['file'], document.file.url)
+
+    def test_renamed_documents_lock_the_application_to_patch_form_data(self):
+        # Documents staged before names were content-addressed are stored under another name
+        old_name = 'applications/documents/0123/marks.pdf'
+        ApplicationDocument.objects.filter(pk=self.document.pk).update(file=old_name)
+        old_url = ApplicationDocument.objects.get(pk=self.document.pk).file.url
+        Application.objects.filter(pk=self.application.pk).update(
+            form_data={'education_qualifications': [{'certificate': old_url}, {'certificate': 'other'}]})
+        with CaptureQueriesContext(connection) as queries:
+            ingest_document(document_id=self.document.pk)
+        self.assertTrue(any('FOR UPDATE' in query['sql'] and 'FROM "applications_application" ' in query['sql']
+                            for query in queries.captured_queries))
+        document = ApplicationDocument.objects.get(pk=self.document.pk)
+        self.assertEqual(Application.objects.get(pk=self.application.pk).form_data, {
+            'education_qualifications': [{'certificate': document.file.url}, {'certificate': 'other'}],
+        })
+
+    def test_document_stays_processing_until_the_last_attempt(self):
+        enqueue('applications.ingest_document', document_id=self.document.pk)
+        with mock.patch.object(staging_storage, 'open', side_effect=OSError('disk unavailable')):
+            with self.assertLogs('common.tasks', 'ERROR'):
+                run_task(claim_tasks(1)[0])
+            document = ApplicationDocument.objects.get(pk=self.document.pk)
+            self.assertEqual((document.status, document.error), ('processing', 'disk unavailable'))
+
+            Task.objects.update(attempts=F('max_attempts') - 1, run_after=timezone.now())
+            with self.assertLogs('common.tasks', 'ERROR'):
+                run_task(claim_tasks(1)[0])
+        self.assertEqual(ApplicationDocument.objects.get(pk=self.document.pk).status, 'failed')
+
+
+class AsyncSubmissionTests(TemporaryStorageMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Async Agency', code='ASY')
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': [
+            {'name': 'education_qualifications', 'type': 'array', 'label': 'Education', 'fields': [
+                {'name': 'board', 'type': 'text', 'label': 'Board'},
+                {'name': 'certificate', 'type': 'file', 'label': 'Certificate', 'accept': ['.pdf']},
+            ]},
+        ]})
+
+    def payload(self, **overrides):
+        data = {
+            'job_post': self.job_post.pk,
+            'full_name': 'Async Applicant',
+            'email': 'async@example.com',
+            'phone': '9876543210',
+            'form_data': json.dumps({
+                'full_name': 'Async Applicant', 'email': 'async@example.com', 'phone': '9876543210',
+                'education_qualifications': [{'board': 'CBSE', 'certificate': 'marks'}],
+            }),
+            'resume': SimpleUploadedFile('resume.pdf', b'%PDF-1.4 resume', 'application/pdf'),
+            'marks': SimpleUploadedFile('marks.pdf', b'%PDF-1.4 marks', 'application/pdf'),
+            'photo': SimpleUploadedFile('photo.png', png_bytes(), 'image/png'),
+            'signature': SimpleUploadedFile('signature.png', png_bytes((200, 80)), 'image/png'),
+        }
+        data.update(overrides)
+        return data
+
+    async def test_submission_stores_files_and_queues_work(self):
+        response = await self.async_client.post('/api/applications/submit/', self.payload())
+        self.assertEqual(response.status_code, 201, response.content)
+        application = await Application.objects.aget(pk=response.json()['id'])
+        self.assertTrue(application.photo.name.startswith('blobs/'))
+        self.assertEqual((await StoredBlob.objects.aget(name=application.photo.name)).ref_count, 1)
+        self.assertEqual(application.custom_application_id, 'ASY-001')
+        document = await ApplicationDocument.objects.aget(application=application)
+        self.assertEqual(document.status, 'pending')
+        self.assertEqual(application.form_data['education_qualifications'][0]['certificate'], document.file.url)
+        names = [name async for name in Task.objects.values_list('name', flat=True)]
+        self.assertCountEqual(names, ['applications.render_images', 'applications.ingest_document'])
+
+    def stored_files(self):
+        blobs = os.path.join(settings.MEDIA_ROOT, 'blobs')
+        return (sorted(os.listdir(staging_storage.location)),
+                sorted(name for _, _, names in os.walk(blobs) for name in names))
+
+    async def test_failure_removes_staged_and_stored_files(self):
+        before = self.stored_files()
+        with mock.patch('applications.views.enqueue_many', side_effect=RuntimeError('queue unavailable')):
+            with self.assertRaises(RuntimeError):
+                await self.async_client.post('/api/applications/submit/', self.payload())
+        with mock.patch.object(ApplicationDocument, 'stage', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                await self.async_client.post('/api/applications/submit/', self.payload())
+        self.assertFalse(await Application.objects.aexists())
+        self.assertFalse(await StoredBlob.objects.aexists())
+        self.assertEqual(self.stored_files(), before)
+
+    async def test_invalid_submission(self):
+        response = await self.async_client.post('/api/applications/submit/', self.payload(email='not-an-email'))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.json())
+        response = await self.async_client.post('/api/applications/submit/', self.payload(
+            photo=SimpleUploadedFile('photo.jpg', b'MZ\x90\x00' + b'\x00' * 512, 'image/jpeg')))
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(await Application.objects.aexists())
+
+class MultipartSubmissionTests(TemporaryStorageMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Multipart Agency', code='MPT')
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': [
+            {'name': 'education_qualifications', 'type': 'array', 'label': 'Education', 'fields': [
+                {'name': 'board', 'type': 'text', 'label': 'Board'},
+                {'name': 'certificate', 'type': 'file', 'label': 'Certificate', 'accept': ['.pdf']},
+            ]},
+        ]})
+
+    def post(self, certificates, email='multipart@example.com'):
+        data = {
+            'job_post': self.job_post.pk,
+            'full_name': 'Multipart Applicant',
+            'email': email,
+            'phone': '9876543210',
+            'form_data': json.dumps({
+                'full_name': 'Multipart Applicant', 'email': email, 'phone': '9876543210',
+                'education_qualifications': [{'board': 'CBSE', 'certificate': f'cert{i}'} for i in range(certificates)],
+            }),
+            'resume': SimpleUploadedFile('resume.pdf', b'%PDF-1.4 resume', 'application/pdf'),
+            'photo': SimpleUploadedFile('photo.png', png_bytes(), 'image/png'),
+            'signature': SimpleUploadedFile('signature.png', png_bytes((200, 80)), 'image/png'),
+        }
+        for i in range(certificates):
+            data[f'cert{i}'] = SimpleUploadedFile(f'cert{i}.pdf', b'%PDF-1.4 certificate', 'application/pdf')
+        return self.client.post('/api/applications/', data)
+
+    def test_query_count_does_not_grow_with_certificates(self):
+        # Store the photo and signature blobs once so every measured request reuses them
+        self.assertEqual(self.post(1, email='first@example.com').status_code, 201)
+        # Admission control, the job post, the custom ID, then in one transaction the blob references,
+        # the insert with its rollups and counters, one insert of documents and one of their tasks
+        with self.assertNumQueries(26):
+            response = self.post(1, email='one@example.com')
+        self.assertEqual(response.status_code, 201, response.content)
+        with self.assertNumQueries(26):
+            response = self.post(3, email='three@example.com')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        data = response.json()
+        application = Application.objects.get(pk=data['id'])
+        self.assertEqual(application.custom_application_id, 'MPT-003')
+        urls = [item['certificate'] for item in application.form_data['education_qualifications']]
+        self.assertCountEqual(urls, [document.file.url for document in application.documents.all()])
+        self.assertCountEqual([document['id'] for document in data['documents']],
+                              application.documents.values_list('pk', flat=True))
+        self.assertEqual(Task.objects.filter(name='applications.ingest_document').count(), 5)
+
+    def stored_files(self):
+        blobs = os.path.join(settings.MEDIA_ROOT, 'blobs')
+        return (sorted(os.listdir(staging_storage.location)),
+                sorted(name for _, _, names in os.walk(blobs) for name in names))
+
+    def test_failure_leaves_no_partial_rows(self):
+        before = self.stored_files()
+        with mock.patch('applications.views.enqueue_many', side_effect=RuntimeError('queue unavailable')):
+            with self.assertRaises(RuntimeError):
+                self.post(2)
+        self.assertFalse(Application.objects.exists())
+        self.assertFalse(ApplicationDocument.objects.exists())
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(StoredBlob.objects.exists())
+        self.job_post.refresh_from_db()
+        self.assertEqual(self.job_post.application_count, 0)
+        # Staged certificates and the photo and signature written in the transaction are removed
+        self.assertEqual(self.stored_files(), before)
+
+    def test_failure_keeps_blobs_other_applications_reference(self):
+        self.assertEqual(self.post(0, email='first@example.com').status_code, 201)
+        before = self.stored_files()
+        references = dict(StoredBlob.objects.values_list('name', 'ref_count'))
+        with mock.patch('applications.views.enqueue_many', side_effect=RuntimeError('queue unavailable')):
+            with self.assertRaises(RuntimeError):
+                self.post(1)
+        self.assertEqual(self.stored_files(), before)
+        self.assertEqual(dict(StoredBlob.objects.values_list('name', 'ref_count')), references)
+
+@override_settings(SUBMISSION_RATE_LIMITS={'ip': (2, 1), 'job_post': (3, 1)})
+class SubmissionAdmissionTests(TemporaryStorageMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Admission Agency', code='ADM')
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': []})
+
+    def post(self, ip, url='/api/applications/'):
+        # Incomplete submissions: admission control runs before validation
+        return self.client.post(url, {'job_post': self.job_post.pk}, REMOTE_ADDR=ip)
+
+    def test_clients_are_limited_per_ip_and_per_job_post(self):
+        self.assertEqual([self.post('10.0.0.1').status_code for _ in range(3)], [400, 400, 429])
+        response = self.post('10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+        # Another client gets its own bucket, until the job post's runs out
+        self.assertEqual(self.post('10.0.0.2').status_code, 400)
+        self.assertEqual(self.post('10.0.0.3').status_code, 429)
+
+    def test_async_submissions_share_the_limits(self):
+        self.assertEqual(self.post('10.0.0.1').status_code, 400)
+        self.assertEqual(self.post('10.0.0.1', url='/api/applications/submit/').status_code, 400)
+        self.assertEqual(self.post('10.0.0.1', url='/api/applications/submit/').status_code, 429)
+
+    @override_settings(SUBMISSION_MAX_IN_FLIGHT=0, SUBMISSION_OVERLOAD_RETRY_AFTER=5)
+    def test_overload_is_rejected_before_the_upload_is_read(self):
+        with mock.patch.object(StreamingUploadHandler, 'handle_raw_input', autospec=True, return_value=None) as parse:
+            for url in ('/api/applications/', '/api/applications/submit/'):
+                response = self.client.post(url, {
+                    'job_post': self.job_post.pk,
+                    'photo': SimpleUploadedFile('photo.png', png_bytes(), 'image/png'),
+                }, REMOTE_ADDR='10.0.0.1')
+                self.assertEqual(response.status_code, 429)
+                self.assertIn(int(response['Retry-After']), range(5, 11))
+                self.assertIn('Too many submissions', response.json()['detail'])
+        parse.assert_not_called()
+        self.assertFalse(Application.objects.exists())
+        # The per-IP bucket was charged, the job post's was never reached
+        self.assertFalse(RateLimitBucket.objects.filter(key__startswith='submission:job_post:').exists())
+
+class IdempotentSubmissionTests(TemporaryStorageMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Retry Agency', code='RTY', default_form_schema={'fields': []})
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': []})
+
+    def post(self, key, url='/api/applications/', **overrides):
+        data = {
+            'job_post': self.job_post.pk, 'full_name': 'Retry Applicant', 'email': 'retry@example.com',
+            'phone': '9876543210', 'form_data': '{}',
+            'photo': SimpleUploadedFile('photo.png', png_bytes(), 'image/png'),
+            'signature': SimpleUploadedFile('signature.png', png_bytes((200, 80)), 'image/png'),
+        }
+        data.update(overrides)
+        return self.client.post(url, data, HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_gets_the_stored_response(self):
+        first = self.post('key-1')
+        self.assertEqual(first.status_code, 201, first.content)
+        # Only the key lookup: no admission control, nothing stored or inserted again
+        with self.assertNumQueries(1):
+            retry = self.post('key-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['custom_application_id'], first.json()['custom_application_id'])
+        self.assertEqual(Application.objects.count(), 1)
+        self.assertEqual(StoredBlob.objects.get(name=Application.objects.get().photo.name).ref_count, 1)
+
+    def test_async_submission_retry(self):
+        first = self.post('key-2', url='/api/applications/submit/')
+        retry = self.post('key-2', url='/api/applications/submit/')
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(Application.objects.count(), 1)
+
+    def test_key_reused_for_other_data(self):
+        self.post('key-3')
+        self.assertEqual(self.post('key-3', full_name='Someone Else').status_code, 422)
+
+    def test_concurrent_duplicate_is_told_to_retry(self):
+        self.post('key-5')
+        IdempotencyKey.objects.filter(key='key-5').update(status='processing', response_status=None, response_body=None)
+        with override_settings(IDEMPOTENCY_WAIT_SECONDS=0):
+            response = self.post('key-5')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(SUBMISSION_RATE_LIMITS={'ip': (1, 1), 'job_post': (1, 1)})
+    def test_retries_are_answered_before_admission_control(self):
+        self.assertEqual(self.post('key-7').status_code, 201)
+        self.assertEqual(self.post('key-8').status_code, 429)
+        with override_settings(SUBMISSION_MAX_IN_FLIGHT=0):
+            retry = self.post('key-7')
+            self.assertEqual((retry.status_code, retry['Idempotent-Replayed']), (201, 'true'))
+            # A duplicate of a request still running waits its turn without an in-flight slot
+            IdempotencyKey.objects.filter(key='key-7').update(status='processing')
+            with override_settings(IDEMPOTENCY_WAIT_SECONDS=0):
+                for url in ('/api/applications/', '/api/applications/submit/'):
+                    IdempotencyKey.objects.filter(key='key-7').update(scope=url)
+                    self.assertEqual(self.post('key-7', url=url).status_code, 409)
+
+    def test_failed_validation_releases_the_key(self):
+        self.assertEqual(self.post('key-6', email='not-an-email').status_code, 400)
+        self.assertEqual(self.post('key-6').status_code, 201)
+
+@skipUnless(mock_aws, 'moto is not installed')
+@override_settings(
+    AWS_ACCESS_KEY_ID='testing',
+    AWS_SECRET_ACCESS_KEY='testing',
+    AWS_STORAGE_BUCKET_NAME='job-portal-test',
+    AWS_S3_REGION_NAME='us-east-1',
+    AWS_S3_ENDPOINT_URL=None,
+)
+class DirectUploadCommitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Direct Upload Agency', code='DUA')
+        cls.job_post = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': [
+            {'name': 'education_qualifications', 'type': 'array', 'label': 'Education', 'fields': [
+                {'name': 'board', 'type': 'text', 'label': 'Board'},
+                {'name': 'certificate', 'type': 'file', 'label': 'Certificate', 'accept': ['.pdf']},
+            ]},
+        ]})
+
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket='job-portal-test')
+        self.client = APIClient()
+
+    def put(self, key, content_type, size=1024):
+        self.s3.put_object(Bucket='job-portal-test', Key=key, Body=b'x' * size, ContentType=content_type)
+        return key
+
+    def payload(self, **overrides):
+        data = {
+            'job_post': self.job_post.pk,
+            'full_name': 'Direct Applicant',
+            'email': 'direct@example.com',
+            'phone': '9876543210',
+            'photo_key': self.put('uploads/a1/photo.jpg', 'image/jpeg'),
+            'signature_key': self.put('uploads/a1/signature.png', 'image/png'),
+            'form_data': {
+                'full_name': 'Direct Applicant',
+                'email': 'direct@example.com',
+                'phone': '9876543210',
+                'resume': self.put('uploads/a1/resume.pdf', 'application/pdf'),
+                'education_qualifications': [
+                    {'board': 'CBSE', 'certificate': self.put('uploads/a1/marks.pdf', 'application/pdf')},
+                ],
+            },
+        }
+        data.update(overrides)
+        return data
+
+    def test_commit_links_uploaded_objects(self):
+        response = self.client.post('/api/applications/commit/', self.payload(), format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        application = Application.objects.get()
+        self.assertEqual(application.photo.name, 'uploads/a1/photo.jpg')
+        self.assertEqual(application.signature.name, 'uploads/a1/signature.png')
+        document = application.documents.get()
+        self.assertEqual((document.file.name, document.status), ('uploads/a1/marks.pdf', 'ready'))
+        # Keys in form_data are replaced with storage URLs
+        self.assertIn('/uploads/a1/marks.pdf', application.form_data['education_qualifications'][0]['certificate'])
+        self.assertIn('/uploads/a1/resume.pdf', application.form_data['resume'])
+        # Read from the upload bucket although the default storage is the file system
+        self.assertIn('job-portal-test', application.photo.url)
+        with application.photo.open('rb') as photo:
+            self.assertEqual(photo.read(), b'x' * 1024)
+        self.assertTrue(application.custom_application_id.startswith('DUA-'))
+
+    def test_commit_rejects_missing_oversized_and_mistyped_objects(self):
+        payload = self.payload(
+            photo_key='uploads/a1/missing.jpg',
+            signature_key=self.put('uploads/a1/big.png', 'image/png', size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE + 1),
+        )
+        payload['form_data']['resume'] = 'uploads/a1/missing.pdf'
+        payload['form_data']['education_qualifications'][0]['certificate'] = self.put(
+            'uploads/a1/marks.exe', 'application/octet-stream')
+        response = self.client.post('/api/applications/commit/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(set(errors), {'photo_key', 'signature_key', 'form_data'})
+        self.assertEqual(set(errors['form_data']), {'resume', 'education_qualifications[0].certificate'})
+        self.assertFalse(Application.objects.exists())
+
+    def test_commit_rejects_keys_outside_upload_prefix(self):
+        self.put('applications/photos/someone-else.jpg', 'image/jpeg')
+        response = self.client.post('/api/applications/commit/',
+                                    self.payload(photo_key='applications/photos/someone-else.jpg'), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('photo_key', response.json())
+
+    def test_upload_urls_signs_every_file_in_one_call(self):
+        files = [{'file_name': 'photo.jpg', 'file_type': 'image/jpeg'}, {'file_name': 'marks.pdf', 'file_type': 'application/pdf'}]
+        response = self.client.post('/api/applications/upload_urls/', {'files': files}, format='json')
+        self.assertEqual(response.status_code, 200)
+        uploads = response.json()['uploads']
+        self.assertEqual([upload['fields']['Content-Type'] for upload in uploads], ['image/jpeg', 'application/pdf'])
@@ -0,0 +1,66 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from agencies.models import JobPost
+from dashboard import rollups
+from .models import Application, ApplicationStatusChange
+
+
+def statuses_moving_to(status):
+    """
+    Statuses from which Application.STATUS_TRANSITIONS allows a move to ``status``.
+    """
+    return [old for old, targets in Application.STATUS_TRANSITIONS.items() if status in targets]
+
+
+def transition_applications(queryset, new_status, changed_by=None, note=''):
+    """
+    Move every application in ``queryset`` whose status may change to
+    ``new_status``; the others are left alone. The rows are locked, updated
+    and logged to ApplicationStatusChange in a single statement, and counters
+    are then adjusted once per job post, so the cost does not grow with the
+    number of applications.
+    Returns: number of applications moved
+    """
+    if new_status not in dict(Application.STATUS_CHOICES):
+        raise ValueError(f'Unknown status "{new_status}"')
+    old_statuses = statuses_moving_to(new_status)
+    if not old_statuses:
+        return 0
+
+    selection, params = queryset.order_by().values('pk').query.sql_with_params()
+    applications = connection.ops.quote_name(Application._meta.db_table)
+    history = connection.ops.quote_name(ApplicationStatusChange._meta.db_table)
+    now = timezone.now()
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Locked in id order so overlapping bulk transitions can't deadlock; the status
+            # test is re-checked on rows another transaction changed while we waited
+            cursor.execute(f"""
+                WITH selected AS (
+                    SELECT a.id, a.status FROM {applications} a
+                    WHERE a.id IN ({selection}) AND a.status = ANY(%s)
+                    ORDER BY a.id FOR UPDATE
+                ), moved AS (
+                    UPDATE {applications} a SET status = %s, updated_at = %s FROM selected
+                    WHERE a.id = selected.id
+                    RETURNING a.id, a.job_post_id, selected.status AS old_status
+                ), logged AS (
+                    INSERT INTO {history} (application_id, old_status, new_status, changed_by_id, note, changed_at)
+                    SELECT id, old_status, %s, %s, %s, %s FROM moved
+                )
+                SELECT job_post_id, old_status, count(*) FROM moved
+                GROUP BY job_post_id, old_status ORDER BY job_post_id, old_status
+            """, [*params, old_statuses, new_status, now, new_status, getattr(changed_by, 'pk', None), note, now])
+            moved = cursor.fetchall()
+
+        deltas = defaultdict(lambda: defaultdict(int))
+        for job_post_id, old_status, count in moved:
+            deltas[job_post_id][old_status] -= count
+            deltas[job_post_id][new_status] += count
+        for job_post_id, status_deltas in sorted(deltas.items()):
+            rollups.record_status_counts(job_post_id, status_deltas)
+            JobPost.adjust_application_counts(job_post_id, **status_deltas)
+    return sum(count for _, _, count in moved)
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+
+from agencies.schemas import subfields_of
+
+REQUIRED_MESSAGE = 'This field is required.'
+
+
+def _is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _parse_date(value, month_year=False):
+    if month_year and len(value) == 7:
+        datetime.strptime(value, '%Y-%m')
+    else:
+        date.fromisoformat(value)
+
+
+def _accept_matcher(accept):
+    """
+    Build a predicate for an uploaded file from a schema ``accept`` list such
+    as ['.pdf', 'image/*', 'application/msword'].
+    """
+    if not accept:
+        return None
+    extensions = {item.lower() for item in accept if item.startswith('.')}
+    mime_types = {item.lower() for item in accept if '/' in item and not item.endswith('/*')}
+    mime_prefixes = tuple(item.lower()[:-1] for item in accept if item.endswith('/*'))
+
+    def matches(file_obj):
+        extension = os.path.splitext(file_obj.name or '')[1].lower()
+        content_type = (getattr(file_obj, 'content_type', None) or '').lower()
+        return (
+            extension in extensions
+            or content_type in mime_types
+            or (bool(mime_prefixes) and content_type.startswith(mime_prefixes))
+        )
+
+    return matches
+
+
+class FormDataValidator:
+    """
+    Validator compiled once from a merged form schema. Checks required
+    fields, value types, nested group/array subfields, date formats and
+    the ``accept`` list of file fields.
+    """
+
+    def __init__(self, schema):
+        self.fields = self._compile_fields(schema.get('fields', []))
+
+    def _compile_fields(self, fields):
+        if isinstance(fields, dict):
+            # applications/schemas.py style: {"name": {"type": ..., "label": ...}}
+            fields = [{'name': name, **field} for name, field in fields.items()]
+        return {field['name']: self._compile_field(field) for field in fields}
+
+    def _compile_field(self, field):
+        field_type = field.get('type', 'text')
+        required = bool(field.get('required'))
+
+        if field_type in ('group', 'array'):
+            subfields = self._compile_fields(subfields_of(field))
+            if field_type == 'group':
+                check = self._group_checker(subfields)
+            else:
+                check = self._array_checker(subfields, field.get('min_items'), field.get('max_items'))
+        elif field_type == 'file':
+            check = self._file_checker(_accept_matcher(field.get('accept')))
+        elif field_type == 'email':
+            check = self._email_checker()
+        elif field_type == 'number':
+            check = self._number_checker()
+        elif field_type in ('date', 'month_year'):
+            check = self._date_checker(field_type == 'month_year' or field.get('format') == 'month-year')
+        elif field_type == 'checkbox':
+            check = self._checkbox_checker()
+        elif field.get('options'):
+            check = self._choice_checker(field['options'])
+        else:
+            check = self._text_checker()
+        return field_type, required, check
+
+    # Checkers take (value, path, errors, files) and append to errors
+
+    def _text_checker(self):
+        def check(value, path, errors, files):
+            if not isinstance(value, str):
+                errors[path] = 'Must be a string.'
+        return check
+
+    def _email_checker(self):
+        def check(value, path, errors, files):
+            try:
+                validate_email(value)
+            except ValidationError:
+                errors[path] = 'Enter a valid email address.'
+        return check
+
+    def _number_checker(self):
+        def check(value, path, errors, files):
+            if isinstance(value, bool):
+                errors[path] = 'Must be a number.'
+            elif not isinstance(value, (int, float)):
+                try:
+                    float(value)
+                except (TypeError, ValueError):
+                    errors[path] = 'Must be a number.'
+        return check
+
+    def _date_checker(self, month_year):
+        def check(value, path, errors, files):
+            try:
+                _parse_date(value, month_year)
+            except (TypeError, ValueError):
+                errors[path] = 'Enter a valid date in YYYY-MM-DD format.'
+        return check
+
+    def _checkbox_checker(self):
+        def check(value, path, errors, files):
+            if not isinstance(value, bool):
+                errors[path] = 'Must be true or false.'
+        return check
+
+    def _choice_checker(self, options):
+        allowed = {option['value'] if isinstance(option, dict) else option for option in options}
+
+        def check(value, path, errors, files):
+            if value not in allowed:
+                errors[path] = f'"{value}" is not a valid choice.'
+        return check
+
+    def _file_checker(self, accepts):
+        def check(value, path, errors, files):
+            # The value is either a multipart key into files or an already stored path/URL
+            if not isinstance(value, str):
+                errors[path] = 'Must reference an uploaded file.'
+            elif accepts and value in files and not accepts(files[value]):
+                errors[path] = f'File type of "{files[value].name}" is not allowed.'
+        return check
+
+    def _group_checker(self, subfields):
+        def check(value, path, errors, files):
+            if not isinstance(value, dict):
+                errors[path] = 'Must be an object.'
+            else:
+                self._check_object(subfields, value, f'{path}.', errors, files)
+        return check
+
+    def _array_checker(self, subfields, min_items, max_items):
+        def check(value, path, errors, files):
+            if not isinstance(value, list):
+                errors[path] = 'Must be a list.'
+                return
+            if min_items and len(value) < min_items:
+                errors[path] = f'At least {min_items} item(s) required.'
+            if max_items and len(value) > max_items:
+                errors[path] = f'No more than {max_items} item(s) allowed.'
+            for index, item in enumerate(value):
+                if not isinstance(item, dict):
+                    errors[f'{path}[{index}]'] = 'Must be an object.'
+                else:
+                    self._check_object(subfields, item, f'{path}[{index}].', errors, files)
+        return check
+
+    def _check_object(self, fields, data, prefix, errors, files):
+        for name in data.keys() - fields.keys():
+            errors[f'{prefix}{name}'] = 'Field is not part of the form schema.'
+        for name, (field_type, required, check) in fields.items():
+            value = data.get(name)
+            if field_type == 'file' and not prefix and _is_empty(value) and name in files:
+                # Top-level files are posted as multipart parts named after the field
+                value = name
+            if _is_empty(value):
+                if required:
+                    errors[f'{prefix}{name}'] = REQUIRED_MESSAGE
+                continue
+            check(value, f'{prefix}{name}', errors, files)
+
+    def validate(self, form_data, files=None):
+        """
+        Validate submitted form_data (and uploaded files, keyed as posted).
+        Raises ValidationError mapping each field path to its message.
+        """
+        if not isinstance(form_data, dict):
+            raise ValidationError('Must be an object.')
+        errors = {}
+        self._check_object(self.fields, form_data, '', errors, files or {})
+        if errors:
+            raise ValidationError(errors)
+
+
+class _ValidatorCache:
+    """
+    Thread-safe LRU of compiled validators keyed by schema checksum.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._validators = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, checksum, load_schema):
+        with self._lock:
+            validator = self._validators.get(checksum)
+            if validator is not None:
+                self._validators.move_to_end(checksum)
+                return validator
+        validator = FormDataValidator(load_schema())
+        with self._lock:
+            self._validators[checksum] = validator
+            if len(self._validators) > self.maxsize:
+                self._validators.popitem(last=False)
+        return validator
+
+    def clear(self):
+        with self._lock:
+            self._validators.clear()
+
+
+validator_cache = _ValidatorCache(settings.FORM_VALIDATOR_CACHE_SIZE)
+
+
+def get_form_validator(snapshot):
+    """
+    Return the compiled validator for a FormSchemaSnapshot, compiling it from
+    the stored content on first use. Only the checksum is read on a cache hit.
+    """
+    return validator_cache.get(snapshot.checksum, lambda: json.loads(snapshot.content))
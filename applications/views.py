@@ -1,48 +1,188 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.exceptions import Throttled, ValidationError
+from rest_framework.parsers import JSONParser, MultiPartParser, FormParser
+from django.db import transaction
+from django.http import JsonResponse
+from django.http.multipartparser import MultiPartParserError
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from .models import Application, ApplicationDocument
-from .serializers import ApplicationSerializer, ApplicationDocumentSerializer
+from django.views.decorators.csrf import csrf_exempt
+from .models import AgencyApplicationSequence, Application, ApplicationDocument, CERTIFICATE_DOCUMENT_TYPES
+from .serializers import ApplicationSerializer, ApplicationCommitSerializer, ApplicationDocumentSerializer
+from .export import export_response
+from .transitions import transition_applications
+from .form_query import FormFilterError, apply_form_filters
+from .search import search_applications
 from agencies.models import JobPost
-from common.storage import generate_presigned_url
+from common.idempotency import (
+    HEADER as IDEMPOTENCY_HEADER, REPLAYED_HEADER, IdempotencyKeyInUse, IdempotencyKeyReused, await_key,
+    complete_key, idempotent, release_key, request_fingerprint, stored_response, try_claim,
+)
+from common.pagination import CreatedAtCursorPagination, RankedPagination, UploadedAtCursorPagination
+from common.storage import (
+    content_addressed_storage, generate_presigned_url, generate_presigned_urls, staging_storage,
+)
+from common.tasks import enqueue, enqueue_many
+from common.throttling import (
+    JobPostSubmissionThrottle, Overloaded, SubmissionAdmissionMixin, SubmissionThrottle, overloaded_retry_after,
+    submission_slots,
+)
+from common.uploadhandlers import StreamingUploadHandler, StreamingUploadMixin, UnsupportedUpload, UploadTooLarge
 from common.validators import validate_file_type, validate_file_size
 from .authentication import CsrfExemptSessionAuthentication
 
 # Create your views here.
 
+# Most files a single upload_urls call will sign
+MAX_PRESIGNED_UPLOADS = 50
+
+def get_client_ip(request):
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0]
+    return request.META.get('REMOTE_ADDR')
+
 class IsAuthenticatedOrCreateOnly(permissions.BasePermission):
     def has_permission(self, request, view):
         if request.method == 'POST':
             return True
         return request.user and request.user.is_authenticated
 
-class ApplicationViewSet(viewsets.ModelViewSet):
+class ApplicationViewSet(SubmissionAdmissionMixin, StreamingUploadMixin, viewsets.ModelViewSet):
     queryset = Application.objects.all()
     serializer_class = ApplicationSerializer
     permission_classes = [IsAuthenticatedOrCreateOnly]
     authentication_classes = [CsrfExemptSessionAuthentication]
     parser_classes = [MultiPartParser, FormParser]
+    pagination_class = CreatedAtCursorPagination
+    # Rate limited and counted against SUBMISSION_MAX_IN_FLIGHT (common.throttling)
+    submission_actions = ('create', 'commit')
 
     def get_queryset(self):
-        queryset = Application.objects.all()
+        queryset = self.get_optimized_queryset()
         job_post_id = self.request.query_params.get('job_post', None)
         if job_post_id:
             queryset = queryset.filter(job_post_id=job_post_id)
+        # Experience bounds are in days, matching total_experience_days
+        min_experience = self._get_int_param('min_experience')
+        if min_experience is not None:
+            queryset = queryset.filter(total_experience_days__gte=min_experience)
+        max_experience = self._get_int_param('max_experience')
+        if max_experience is not None:
+            queryset = queryset.filter(total_experience_days__lte=max_experience)
+        # form.<path>[__<op>]=<value> filters on form_data, run in the database
+        try:
+            queryset = apply_form_filters(queryset, self.request.query_params)
+        except FormFilterError as exc:
+            raise ValidationError({'form': str(exc)})
+        search = self.request.query_params.get('q')
+        if search:
+            # Only the paginated list is ranked; ranking caps the matches, and export and transition need them all
+            queryset = search_applications(queryset, search, rank=self.action == 'list')
+        return queryset
+
+    @property
+    def paginator(self):
+        # Search results are ordered by rank, so they page by number instead of cursor
+        if not hasattr(self, '_paginator'):
+            if self.request.query_params.get('q', '').strip():
+                self._paginator = RankedPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_optimized_queryset(self):
+        """
+        Load related rows in a fixed number of queries, and skip columns and
+        relations left out by a sparse ?fields= request.
+        """
+        requested = ApplicationSerializer.requested_fields(self.request)
+        queryset = Application.objects.select_related('job_post__agency').defer(
+            'search_vector', 'job_post__agency__default_form_schema'
+        )
+        if requested is None or 'documents' in requested:
+            queryset = queryset.prefetch_related('documents')
+        if requested is not None:
+            if 'form_data' not in requested:
+                queryset = queryset.defer('form_data')
+            if 'job_post_details' not in requested:
+                queryset = queryset.defer('job_post__form_schema', 'job_post__description')
         return queryset
 
+    def _get_int_param(self, name):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({name: 'Must be a whole number of days.'})
+
     def perform_create(self, serializer):
-        # Get client IP
-        x_forwarded_for = self.request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = self.request.META.get('REMOTE_ADDR')
-        
-        serializer.save(ip_address=ip)
+        serializer.save(ip_address=get_client_ip(self.request))
+        enqueue('applications.render_images', application_id=serializer.instance.pk)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        if {'photo', 'signature'} & serializer.validated_data.keys():
+            enqueue('applications.render_images', application_id=serializer.instance.pk)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        # Stream every matching application; not paginated
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in ('csv', 'ndjson', 'xlsx'):
+            return Response(
+                {'error': 'export_format must be one of csv, ndjson, xlsx'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.get_queryset()
+        limit = settings.EXPORT_XLSX_MAX_ROWS
+        # Counts no further than the limit
+        if export_format == 'xlsx' and queryset[:limit + 1].count() > limit:
+            return Response(
+                {'error': f'XLSX exports are limited to {limit} applications. '
+                          f'Narrow the filters, or use export_format=csv or ndjson, which stream any number.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return export_response(queryset, export_format)
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser],
+            permission_classes=[permissions.IsAuthenticated])
+    def transition(self, request):
+        """
+        Move many applications to another status at once. Expects
+        {"status": ..., "ids": [...], "note": ...}; without ids, every
+        application matching the list filters in the query string (job_post,
+        q, form.*, ...) is moved. Applications whose current status can't move
+        to the new one are skipped.
+        """
+        new_status = request.data.get('status')
+        if new_status not in dict(Application.STATUS_CHOICES):
+            return Response(
+                {'error': f'status must be one of {", ".join(dict(Application.STATUS_CHOICES))}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.get_queryset()
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                return Response({'error': 'ids must be a list of application ids'}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(pk__in=ids)
+        elif not queryset.query.has_filters():
+            # Never move every application by accident; empty parameters like ?job_post= filter nothing
+            return Response({'error': 'Give ids or filter query parameters'}, status=status.HTTP_400_BAD_REQUEST)
+
+        moved = transition_applications(queryset, new_status, changed_by=request.user, note=request.data.get('note', ''))
+        return Response({'status': new_status, 'updated': moved})
 
     @action(detail=False, methods=['post'])
     def upload_url(self, request):
@@ -65,59 +205,90 @@ class ApplicationViewSet(viewsets.ModelViewSet):
 
         return Response(presigned_data)
 
-    def create(self, request, *args, **kwargs):
-        # Use the default serializer to validate and create the Application
-        serializer = self.get_serializer(data=request.data)
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser])
+    def upload_urls(self, request):
+        """
+        Presign every file of a form in one call. Expects
+        {"files": [{"file_name": ..., "file_type": ...}, ...]} and returns the
+        presigned posts in the same order.
+        """
+        files = request.data.get('files')
+        if not isinstance(files, list) or not files:
+            return Response(
+                {'error': 'files must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(files) > MAX_PRESIGNED_UPLOADS:
+            return Response(
+                {'error': f'At most {MAX_PRESIGNED_UPLOADS} files can be signed at once'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not all(isinstance(f, dict) and f.get('file_name') and f.get('file_type') for f in files):
+            return Response(
+                {'error': 'Each file needs file_name and file_type'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        presigned_data = generate_presigned_urls(
+            [(f['file_name'], f['file_type']) for f in files],
+            request.data.get('folder', 'uploads/')
+        )
+        if presigned_data is None:
+            return Response(
+                {'error': 'Failed to generate upload URLs'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        return Response({'uploads': presigned_data})
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser])
+    @idempotent
+    def commit(self, request):
+        """
+        Submit an application whose photo, signature and certificates were
+        uploaded straight to storage through upload_url. Files are referenced
+        by storage key and linked in place, so no bytes pass through Django.
+        """
+        serializer = ApplicationCommitSerializer(data=request.data, context=self.get_serializer_context())
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         application = serializer.instance
+        return Response(self.get_serializer(application).data, status=status.HTTP_201_CREATED)
 
-        # Handle education_qualifications certificate files
-        form_data = application.form_data or {}
-        eq_list = form_data.get('education_qualifications', [])
-        updated_eq_list = []
-        for idx, eq in enumerate(eq_list):
-            cert_key = eq.get('certificate')
-            if cert_key and cert_key in request.FILES:
-                file_obj = request.FILES[cert_key]
-                doc = ApplicationDocument.objects.create(
-                    application=application,
-                    document_type='education_certificate',
-                    file=file_obj
-                )
-                # Store the file URL in the JSON
-                eq['certificate'] = doc.file.url
-            updated_eq_list.append(eq)
-        form_data['education_qualifications'] = updated_eq_list
-
-        # Handle work_experience certificate files
-        we_list = form_data.get('work_experience', [])
-        updated_we_list = []
-        for idx, we in enumerate(we_list):
-            cert_key = we.get('certificate')
-            if cert_key and cert_key in request.FILES:
-                file_obj = request.FILES[cert_key]
-                doc = ApplicationDocument.objects.create(
-                    application=application,
-                    document_type='work_experience_certificate',
-                    file=file_obj
-                )
-                # Store the file URL in the JSON
-                we['certificate'] = doc.file.url
-            updated_we_list.append(we)
-        form_data['work_experience'] = updated_we_list
-
-        application.form_data = form_data
-        application.save(update_fields=['form_data'])
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        """
+        Stage certificate files first, then insert the application with its
+        final form_data, its documents and their tasks in one transaction. The
+        number of queries doesn't grow with the number of certificates.
+        Certificates are stored by a background worker: their documents are
+        'pending' with no file, and their URLs in form_data resolve once ready.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        validated_data = dict(serializer.validated_data)
 
-        headers = self.get_success_headers(serializer.data)
-        return Response(self.get_serializer(application).data, status=status.HTTP_201_CREATED, headers=headers)
+        application = Application(**validated_data, ip_address=get_client_ip(request))
+        documents = []
+        try:
+            # Stage certificate files; the background worker moves them into storage
+            for item, document_type, upload in _certificate_uploads(validated_data['form_data'], request.FILES):
+                document = ApplicationDocument.stage(None, document_type, upload)
+                # Store the file URL in the JSON
+                item['certificate'] = document.file.url
+                documents.append(document)
+            data = _create_submission(application, documents, request)
+        except Exception:
+            _discard_submission_files(application, documents)
+            raise
+        return Response(data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(data))
 
-class ApplicationDocumentViewSet(viewsets.ModelViewSet):
+class ApplicationDocumentViewSet(StreamingUploadMixin, viewsets.ModelViewSet):
     queryset = ApplicationDocument.objects.all()
     serializer_class = ApplicationDocumentSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     parser_classes = [MultiPartParser, FormParser]
+    pagination_class = UploadedAtCursorPagination
 
     def get_queryset(self):
         queryset = ApplicationDocument.objects.all()
@@ -126,6 +297,10 @@ class ApplicationDocumentViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(application_id=application_id)
         return queryset
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         # Validate file type and size
         file_obj = self.request.FILES.get('file')
@@ -134,3 +309,189 @@ class ApplicationDocumentViewSet(viewsets.ModelViewSet):
             validate_file_size(file_obj)
         
         serializer.save()
+
+
+def _parse_submission(request):
+    # Parses the spooled body: files are type-checked, hashed and moved into staging as they are read
+    request.upload_handlers = [StreamingUploadHandler(request)]
+    data = request.POST.copy()
+    data.update(request.FILES)
+    return data
+
+def _certificate_uploads(form_data, files):
+    """
+    Yields: (form_data item, document type, uploaded file) for each certificate
+    entry whose 'certificate' names a file in the request
+    """
+    for list_key, document_type in CERTIFICATE_DOCUMENT_TYPES:
+        for item in form_data.get(list_key) or []:
+            cert_key = item.get('certificate') if isinstance(item, dict) else None
+            if cert_key and cert_key in files:
+                yield item, document_type, files[cert_key]
+
+def _create_submission(application, documents, request):
+    """
+    Insert a validated application, its staged documents and their background
+    tasks as one unit: a failure leaves no partial rows. The same queries run
+    however many documents there are.
+    Returns: the serialized application
+    """
+    # Allocated before the transaction so the agency's sequence row isn't locked for all of it
+    application.custom_application_id = AgencyApplicationSequence.allocate_ids(application.job_post.agency)[0]
+    with transaction.atomic():
+        application.save()
+        for document in documents:
+            document.application = application
+        ApplicationDocument.objects.bulk_create(documents)
+        enqueue('applications.render_images', application_id=application.pk)
+        enqueue_many('applications.ingest_document', [{'document_id': document.pk} for document in documents])
+    # The documents were just inserted; serialize them without reading them back
+    application._prefetched_objects_cache = {
+        'documents': sorted(documents, key=lambda document: document.uploaded_at, reverse=True),
+    }
+    return ApplicationSerializer(application, context={'request': request}).data
+
+def _discard_submission_files(application, documents):
+    """
+    Remove the files a failed submission left behind: its staged certificates,
+    and photo/signature blobs written inside the rolled-back transaction.
+    """
+    for document in documents:
+        staging_storage.delete(document.staged_file)
+    for field_file in (application.photo, application.signature):
+        if field_file.name:
+            content_addressed_storage.discard(field_file.name)
+
+@csrf_exempt
+async def submit_application(request):
+    """
+    POST /api/applications/submit/: the multipart submission of
+    ApplicationViewSet.create, for ASGI deployments. The ASGI server receives
+    the body without holding a thread, photo, signature and certificates are
+    written concurrently from worker threads, and the database work runs in
+    one short transaction, so one worker keeps many slow uploads in flight.
+    Rate limits and the in-flight limit apply as for ApplicationViewSet.create,
+    and in the same order: the multipart body is only parsed once a slot is held.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is not None:
+        # Retries are answered before admission control, as @idempotent does for ApplicationViewSet.create
+        try:
+            record = await await_key(key, request.path)
+            if record is not None:
+                data, error = await _parse_submission_async(request)
+                if error is not None:
+                    return error
+                return _replayed_response(stored_response(record, request_fingerprint(request.method, data)))
+        except (IdempotencyKeyInUse, IdempotencyKeyReused, ValidationError) as exc:
+            return _error_response(exc)
+
+    throttle = SubmissionThrottle()
+    if not await sync_to_async(throttle.allow_request)(request, None):
+        return _error_response(Throttled(throttle.wait()))
+    slot = await sync_to_async(submission_slots.acquire)()
+    if slot is None:
+        return _error_response(Overloaded(overloaded_retry_after()))
+    try:
+        data, error = await _parse_submission_async(request)
+        if error is not None:
+            return error
+        throttle = JobPostSubmissionThrottle()
+        if not await sync_to_async(throttle.allow_request)(request, None):
+            return _error_response(Throttled(throttle.wait()))
+        return await _idempotent_submit(request, data)
+    finally:
+        await sync_to_async(submission_slots.release)(slot)
+
+async def _parse_submission_async(request):
+    """
+    Returns: (data, None), or (None, the error response) for a rejected upload
+    """
+    try:
+        return await sync_to_async(_parse_submission, thread_sensitive=False)(request), None
+    except (UploadTooLarge, UnsupportedUpload) as exc:
+        return None, JsonResponse({'detail': exc.detail}, status=exc.status_code)
+    except MultiPartParserError as exc:
+        return None, JsonResponse({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+async def _idempotent_submit(request, data):
+    # Claims the key for an admitted request; a stored response was already looked for
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return await _submit(request, data)
+    try:
+        claim = await sync_to_async(try_claim)(key, request.path, request_fingerprint(request.method, data))
+        if not (claim.record_id or claim.replay):
+            # Claimed by a concurrent request since the check; don't wait while holding a slot
+            raise IdempotencyKeyInUse()
+    except (IdempotencyKeyInUse, IdempotencyKeyReused, ValidationError) as exc:
+        return _error_response(exc)
+    if claim.replay:
+        return _replayed_response(claim.replay)
+    try:
+        response = await _submit(request, data)
+    except Exception:
+        await sync_to_async(release_key)(claim.record_id)
+        raise
+    await sync_to_async(complete_key)(claim.record_id, response.status_code, json.loads(response.content))
+    return response
+
+def _replayed_response(replay):
+    response_status, body = replay
+    response = JsonResponse(body, status=response_status, safe=False)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+def _error_response(exc):
+    response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+    return response
+
+async def _submit(request, data):
+    serializer = ApplicationSerializer(data=data, context={'request': request})
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    validated_data = dict(serializer.validated_data)
+    photo, signature = validated_data.pop('photo'), validated_data.pop('signature')
+
+    # Stage certificate files for the worker, as create() does
+    staged = [
+        (item, sync_to_async(ApplicationDocument.stage, thread_sensitive=False)(None, document_type, upload))
+        for item, document_type, upload in _certificate_uploads(validated_data['form_data'], request.FILES)
+    ]
+
+    photo_name, signature_name, *documents = results = await asyncio.gather(
+        content_addressed_storage.asave(photo.name, photo),
+        content_addressed_storage.asave(signature.name, signature),
+        *[stage for _, stage in staged],
+        return_exceptions=True,
+    )
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        # One write failed; undo the ones that completed
+        stored = [result for result in results if not isinstance(result, BaseException)]
+        await _release_submission_files([name for name in stored if isinstance(name, str)],
+                                        [document for document in stored if isinstance(document, ApplicationDocument)])
+        raise errors[0]
+    for (item, _), document in zip(staged, documents):
+        item['certificate'] = document.file.url
+
+    application = Application(**validated_data, ip_address=get_client_ip(request))
+    application.photo.name = photo_name
+    application.signature.name = signature_name
+    try:
+        data = await sync_to_async(_create_submission)(application, documents, request)
+    except Exception:
+        await _release_submission_files([photo_name, signature_name], documents)
+        raise
+    return JsonResponse(data, status=status.HTTP_201_CREATED)
+
+async def _release_submission_files(blob_names, documents):
+    # Give back the blob references asave() took and remove the staged certificates
+    for name in blob_names:
+        await sync_to_async(content_addressed_storage.delete)(name)
+    for document in documents:
+        await sync_to_async(staging_storage.delete, thread_sensitive=False)(document.staged_file)
@@ -1,3 +1,25 @@
 from django.contrib import admin
+from django.utils import timezone
+from .models import StoredBlob, Task
 
 # Register your models here.
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'run_after', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'updated_at', 'locked_at', 'last_error')
+    ordering = ('-id',)
+    actions = ['retry']
+
+    @admin.action(description='Retry selected tasks now')
+    def retry(self, request, queryset):
+        queryset.exclude(status='running').update(status='queued', attempts=0, run_after=timezone.now())
+
+
+@admin.register(StoredBlob)
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'ref_count', 'created_at')
+    search_fields = ('name', 'sha256')
+    readonly_fields = ('name', 'sha256', 'size', 'ref_count', 'created_at')
+    ordering = ('-ref_count',)
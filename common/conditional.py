@@ -0,0 +1,50 @@
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """
+    Strong ETag from the values a response is built from, e.g. primary keys,
+    updated_at timestamps, counters or content checksums.
+    """
+    digest = hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest[:32])
+
+
+def set_validators(request, response, etag, last_modified=None):
+    """
+    Add ETag, Last-Modified and Cache-Control to a response for a public read
+    endpoint. Anonymous responses may be stored by shared caches (a CDN) and
+    served stale briefly while they revalidate; responses for signed-in users
+    are private and revalidated on every use.
+    """
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(
+            response, public=True,
+            max_age=settings.PUBLIC_CACHE_MAX_AGE,
+            s_maxage=settings.PUBLIC_CACHE_S_MAXAGE,
+            stale_while_revalidate=settings.PUBLIC_CACHE_STALE_WHILE_REVALIDATE,
+        )
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    The 304 (or 412) response for a request whose If-None-Match /
+    If-Modified-Since validators match, or None when the full response is needed.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        set_validators(request, response, etag, last_modified)
+    return response
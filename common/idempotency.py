@@ -0,0 +1,210 @@
+import asyncio
+import functools
+import hashlib
+import json
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+from .storage import hash_file
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+POLL_INTERVAL = 0.25
+
+# record_id is set when this request owns the key; replay holds (status, body) of the stored response
+Claim = namedtuple('Claim', ['record_id', 'replay'])
+
+
+class IdempotencyKeyInUse(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'A request with this Idempotency-Key is still being processed. Retry shortly.'
+    default_code = 'idempotency_key_in_use'
+    wait = 1
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'This Idempotency-Key was already used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def request_fingerprint(method, data):
+    """
+    SHA-256 of a request's method and parsed data. Uploaded files count by
+    their content hash, which the streaming upload handler has already computed.
+    """
+    items = data.lists() if hasattr(data, 'lists') else data.items()
+    fields = {}
+    for name, value in items:
+        values = value if isinstance(value, list) and hasattr(data, 'lists') else [value]
+        fields[name] = [hash_file(item) if hasattr(item, 'chunks') else item for item in values]
+    payload = json.dumps([method, fields], sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def try_claim(key, scope, fingerprint):
+    """
+    Take the key for this request, or read what another request left on it.
+    Expired keys, and claims whose request died before finishing, are taken over.
+    Returns: Claim, with replay None while the other request is still running
+    """
+    if not key or len(key) > 255:
+        raise ValidationError({HEADER: 'Must be 1 to 255 characters.'})
+    table = connection.ops.quote_name(IdempotencyKey._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} AS k (scope, key, fingerprint, status, created_at, expires_at) "
+            f"VALUES (%(scope)s, %(key)s, %(fingerprint)s, 'processing', now(), now() + %(ttl)s * interval '1 second') "
+            f"ON CONFLICT (scope, key) DO UPDATE SET fingerprint = EXCLUDED.fingerprint, status = 'processing', "
+            f"response_status = NULL, response_body = NULL, created_at = now(), expires_at = EXCLUDED.expires_at "
+            f"WHERE k.expires_at < now() "
+            f"OR (k.status = 'processing' AND k.created_at < now() - %(lease)s * interval '1 second') "
+            f"RETURNING id",
+            {'scope': scope, 'key': key, 'fingerprint': fingerprint,
+             'ttl': settings.IDEMPOTENCY_KEY_TTL, 'lease': settings.IDEMPOTENCY_LEASE_SECONDS},
+        )
+        row = cursor.fetchone()
+    if row:
+        return Claim(row[0], None)
+    existing = IdempotencyKey.objects.filter(scope=scope, key=key).values(
+        'fingerprint', 'status', 'response_status', 'response_body').first()
+    if existing is None:
+        # Finished with an error and released in between; try again
+        return try_claim(key, scope, fingerprint)
+    if existing['fingerprint'] != fingerprint:
+        raise IdempotencyKeyReused()
+    if existing['status'] == 'done':
+        return Claim(None, (existing['response_status'], existing['response_body']))
+    return Claim(None, None)
+
+
+def find_key(key, scope):
+    """
+    The record holding a key, without claiming it or reading the request body.
+    Returns: a dict of its fingerprint, status and response, or None when
+    there is none, it has expired or its request died before finishing
+    """
+    if not key or len(key) > 255:
+        raise ValidationError({HEADER: 'Must be 1 to 255 characters.'})
+    now = timezone.now()
+    record = IdempotencyKey.objects.filter(scope=scope, key=key, expires_at__gte=now).values(
+        'fingerprint', 'status', 'response_status', 'response_body', 'created_at').first()
+    lease_start = now - timedelta(seconds=settings.IDEMPOTENCY_LEASE_SECONDS)
+    if record and record['status'] == 'processing' and record['created_at'] < lease_start:
+        return None
+    return record
+
+
+def wait_for_key(key, scope):
+    """
+    find_key(), waiting up to IDEMPOTENCY_WAIT_SECONDS while a concurrent
+    request with the same key is still running. Raises IdempotencyKeyInUse after that.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        record = find_key(key, scope)
+        if record is None or record['status'] == 'done':
+            return record
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInUse()
+        time.sleep(POLL_INTERVAL)
+
+
+async def await_key(key, scope):
+    """
+    wait_for_key() for async views; waits without holding a thread.
+    """
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        record = await sync_to_async(find_key)(key, scope)
+        if record is None or record['status'] == 'done':
+            return record
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInUse()
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+def stored_response(record, fingerprint):
+    """
+    Returns: (status, body) of a finished record, if it was stored for the same request data
+    """
+    if record['fingerprint'] != fingerprint:
+        raise IdempotencyKeyReused()
+    return record['response_status'], record['response_body']
+
+
+def complete_key(record_id, status_code, body):
+    """
+    Store the final response for the key. Server errors and throttled
+    responses aren't final: the key is released so a retry runs again.
+    """
+    if status_code >= 500 or status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+        release_key(record_id)
+        return
+    # Round-trip through JSON so stored bodies hold only what the response rendered
+    body = json.loads(json.dumps(body, cls=DjangoJSONEncoder))
+    IdempotencyKey.objects.filter(pk=record_id).update(status='done', response_status=status_code, response_body=body)
+
+
+def release_key(record_id):
+    IdempotencyKey.objects.filter(pk=record_id).delete()
+
+
+def prune_idempotency_keys():
+    return IdempotencyKey.objects.filter(expires_at__lt=timezone.now()).delete()[0]
+
+
+def idempotent(view_method):
+    """
+    Decorator for DRF view methods: a request carrying an Idempotency-Key gets
+    the stored response of an earlier request with the same key, endpoint and
+    data instead of running the method again. A concurrent duplicate waits for
+    the first to finish. Both happen before the view's deferred admission
+    control (common.throttling.SubmissionAdmissionMixin), so they spend no rate
+    limit token and hold no in-flight slot. Requests without the header run as usual.
+    """
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view_method(view, request, *args, **kwargs)
+        record = wait_for_key(key, request.path)
+        if record is not None:
+            return replayed_response(stored_response(record, request_fingerprint(request.method, request.data)))
+
+        # This request will do the work, so it is admitted like any other first
+        admit = getattr(view, 'admit_deferred_submission', None)
+        if admit is not None:
+            admit(request)
+        claim = try_claim(key, request.path, request_fingerprint(request.method, request.data))
+        if claim.replay:
+            return replayed_response(claim.replay)
+        if not claim.record_id:
+            # Claimed by a concurrent request since the check; don't wait while admitted
+            raise IdempotencyKeyInUse()
+        try:
+            response = view_method(view, request, *args, **kwargs)
+        except Exception:
+            # Validation errors included: nothing was done, so a retry may run again
+            release_key(claim.record_id)
+            raise
+        complete_key(claim.record_id, response.status_code, response.data)
+        return response
+    wrapper.answers_retries_first = True
+    return wrapper
+
+
+def replayed_response(replay):
+    response_status, body = replay
+    return Response(body, status=response_status, headers={REPLAYED_HEADER: 'true'})
@@ -0,0 +1,78 @@
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from common.storage import create_s3_client, delete_files_from_s3, generate_presigned_url, get_s3_client
+
+
+class Command(BaseCommand):
+    help = ('Compare building an S3 client per call with the shared pooled client. Presigning runs offline; '
+            '--delete also uploads and deletes objects, so it needs a reachable bucket (e.g. MinIO).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--files', type=int, default=10, help='Files per form')
+        parser.add_argument('--forms', type=int, default=20)
+        parser.add_argument('--delete', action='store_true', help='Also compare per-object and batch deletes')
+
+    def measure(self, func):
+        tracemalloc.start()
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak
+
+    def handle(self, *args, **options):
+        files = [(f'file-{i}.pdf', 'application/pdf') for i in range(options['files'])]
+        forms = options['forms']
+
+        def per_call():
+            # What generate_presigned_url used to do: a new client for every file
+            for _ in range(forms):
+                for file_name, file_type in files:
+                    generate_presigned_url(file_name, file_type, s3_client=create_s3_client())
+
+        def pooled():
+            for _ in range(forms):
+                for file_name, file_type in files:
+                    generate_presigned_url(file_name, file_type, s3_client=get_s3_client())
+
+        get_s3_client()
+        signatures = forms * len(files)
+        self.stdout.write(f'Presigning {signatures} uploads ({forms} forms x {len(files)} files)')
+        for label, func in (('Client per call', per_call), ('Shared client', pooled)):
+            elapsed, peak = self.measure(func)
+            self.stdout.write(f'  {label:<16} {elapsed / signatures * 1000:.2f} ms per file, '
+                              f'peak {peak / 1024 / 1024:.1f} MB')
+
+        if options['delete']:
+            self.benchmark_delete(signatures)
+
+    def benchmark_delete(self, count):
+        s3_client = get_s3_client()
+        bucket = settings.AWS_STORAGE_BUCKET_NAME
+        prefix = f'benchmark/{uuid.uuid4().hex}/'
+
+        def upload():
+            keys = [f'{prefix}{i}' for i in range(count)]
+            for key in keys:
+                s3_client.put_object(Bucket=bucket, Key=key, Body=b'x')
+            return keys
+
+        keys = upload()
+
+        def per_call():
+            for key in keys:
+                create_s3_client().delete_object(Bucket=bucket, Key=key)
+
+        per_call_time, _ = self.measure(per_call)
+        keys = upload()
+        batch_time, _ = self.measure(lambda: delete_files_from_s3(keys))
+
+        self.stdout.write(f'Deleting {count} objects')
+        self.stdout.write(f'  Client per call  {per_call_time:.2f} s')
+        self.stdout.write(f'  delete_objects   {batch_time:.2f} s')
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from common.tasks import claim_tasks, discover_tasks, requeue_stale_tasks, run_task
+from common.idempotency import prune_idempotency_keys
+from common.throttling import prune_rate_limit_buckets
+
+# How often the worker deletes refilled rate limit buckets and expired idempotency keys
+PRUNE_INTERVAL_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = 'Run background tasks from the database-backed queue.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is empty instead of polling.')
+
+    def handle(self, *args, **options):
+        discover_tasks()
+        self.stdout.write('Worker started')
+        last_pruned = 0
+        try:
+            while True:
+                close_old_connections()
+                requeue_stale_tasks()
+                if time.monotonic() - last_pruned > PRUNE_INTERVAL_SECONDS:
+                    prune_rate_limit_buckets()
+                    prune_idempotency_keys()
+                    last_pruned = time.monotonic()
+                tasks = claim_tasks(options['batch_size'])
+                for t in tasks:
+                    ok = run_task(t)
+                    self.stdout.write(f"{'done' if ok else 'failed'}: {t.name} #{t.pk}")
+                if not tasks:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write('Worker stopped')
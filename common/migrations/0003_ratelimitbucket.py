@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('common', '0002_storedblob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('tokens', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunSQL(
+            'ALTER TABLE common_ratelimitbucket SET UNLOGGED',
+            reverse_sql='ALTER TABLE common_ratelimitbucket SET LOGGED',
+        ),
+    ]
@@ -1,3 +1,94 @@
 from django.db import models
 
 # Create your models here.
+
+class Task(models.Model):
+    """
+    Row in the database-backed background job queue. Workers claim queued
+    rows with SELECT ... FOR UPDATE SKIP LOCKED and delete them once they
+    succeed (see common.tasks).
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_after = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['run_after'], condition=models.Q(status='queued'), name='common_task_queued_idx'),
+        ]
+
+
+class StoredBlob(models.Model):
+    """
+    One file in content-addressed storage (common.storage.ContentAddressedStorage),
+    named after the SHA-256 of its bytes. ``ref_count`` counts the file fields
+    pointing at it; the file is removed when the last one lets go.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+
+class RateLimitBucket(models.Model):
+    """
+    Token bucket state for common.throttling. The table is UNLOGGED: it is
+    written on every submission, and losing it in a crash only refills the
+    buckets.
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.key} ({self.tokens:.1f} tokens)"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client's Idempotency-Key for one endpoint and the final response it got,
+    kept until ``expires_at`` so retries are answered without redoing the work
+    (see common.idempotency).
+    """
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+    ]
+
+    scope = models.CharField(max_length=255)  # Request path
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # SHA-256 of the request, so a reused key can be told apart
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='processing')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.status})"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='common_idempotency_scope_key_uniq'),
+        ]
@@ -0,0 +1,63 @@
+import json
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+
+def estimate_count(queryset):
+    """
+    Estimate the number of rows a queryset returns from the planner's row
+    estimate instead of running COUNT(*).
+    """
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Cursor pagination ordered by (created_at, id). Pages seek from the last
+    position instead of using OFFSET and never run COUNT(*), so deep pages cost
+    the same as the first. Pass ``?count=approx`` to include a planner-estimated
+    total.
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.approximate_count = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.approximate_count is not None:
+            response['count'] = self.approximate_count
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {
+            'type': 'integer',
+            'description': 'Approximate total, only present with ?count=approx',
+        }
+        return response_schema
+
+
+class UploadedAtCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-uploaded_at', '-id')
+
+
+class RankedPagination(PageNumberPagination):
+    """
+    Page numbers for relevance-ordered results (e.g. ``?q=`` searches), whose
+    order is not a stable column that a cursor can seek on.
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,34 @@
+def parse_field_list(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """
+    Let API clients choose which fields a ModelSerializer returns:
+
+    - ``?fields=id,full_name`` returns only the named fields.
+    - ``?expand=documents`` adds fields listed in ``Meta.expandable_fields``
+      on top of a sparse ``fields`` selection.
+
+    Without ``fields`` every field is returned.
+    """
+
+    @classmethod
+    def requested_fields(cls, request):
+        """
+        Return the set of field names requested, or None for all fields.
+        Views use this to skip loading data for fields that are not returned.
+        """
+        if request is None or request.method not in ('GET', 'HEAD') or not request.query_params.get('fields'):
+            return None
+        expandable = set(getattr(cls.Meta, 'expandable_fields', ()))
+        expand = parse_field_list(request.query_params.get('expand')) & expandable
+        return parse_field_list(request.query_params.get('fields')) | expand
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = self.requested_fields(self.context.get('request'))
+        if requested is not None:
+            for name in set(fields) - requested:
+                fields.pop(name)
+        return fields
@@ -1,21 +1,253 @@
 import boto3
+import hashlib
+import os
+import threading
+import uuid
 from django.conf import settings
+from django.core.files.storage import FileSystemStorage, Storage, default_storage
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+from botocore.config import Config
 from botocore.exceptions import ClientError
+from storages.backends.s3 import S3Storage
 import logging
+from asgiref.sync import sync_to_async
 
 logger = logging.getLogger(__name__)
 
-def generate_presigned_url(file_name, file_type, folder='uploads/'):
+class StagingStorage(FileSystemStorage):
+    """
+    FileSystemStorage rooted at UPLOAD_STAGING_ROOT, read when first used and
+    again whenever the setting changes, as MEDIA_ROOT is for default storage.
+    """
+
+    @cached_property
+    def base_location(self):
+        return self._value_or_setting(self._location, settings.UPLOAD_STAGING_ROOT)
+
+    def _clear_cached_properties(self, setting, **kwargs):
+        super()._clear_cached_properties(setting, **kwargs)
+        if setting == 'UPLOAD_STAGING_ROOT':
+            self.__dict__.pop('base_location', None)
+            self.__dict__.pop('location', None)
+
+# Local disk area for uploads that the background worker has not yet moved to storage
+staging_storage = StagingStorage()
+
+BLOB_PREFIX = 'blobs/'
+
+def blob_name(digest, name):
+    """
+    Storage name for content with the given SHA-256, keeping the extension of
+    the uploaded name so URLs are still served with the right content type.
+    """
+    extension = os.path.splitext(name)[1].lower()
+    return f"{BLOB_PREFIX}{digest[:2]}/{digest}{extension}"
+
+def hash_file(content):
+    if getattr(content, 'sha256', None):
+        # Computed while the upload streamed in (common.uploadhandlers)
+        return content.sha256
+    sha256 = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return sha256.hexdigest()
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+    """
+    Stores each distinct file once on top of the default storage, named by
+    the SHA-256 of its content. Saving identical bytes again returns the
+    existing name and adds a reference; delete() drops a reference and only
+    removes the file with the last one. Names that are not blobs (files stored
+    before this layer, or linked directly) are read straight through but never
+    deleted, since no StoredBlob row says who else points at them.
+    """
+
+    @property
+    def inner(self):
+        return default_storage
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content in _save, so never suffix them
+        return name
+
+    def _save(self, name, content):
+        from .models import StoredBlob
+
+        digest = hash_file(content)
+        stored_name = blob_name(digest, name)
+        with transaction.atomic():
+            # The row lock keeps concurrent saves of the same content from racing on the file
+            blob, _ = StoredBlob.objects.select_for_update().get_or_create(
+                name=stored_name, defaults={'sha256': digest, 'size': content.size}
+            )
+            if not self.inner.exists(stored_name):
+                self.inner.save(stored_name, content)
+            StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        return stored_name
+
+    async def asave(self, name, content):
+        """
+        save() for async views. The blob's reference is taken first, so a
+        concurrent delete of the same content keeps the file, and the bytes are
+        then written from a worker thread, leaving the event loop free while
+        the storage backend is slow.
+        Returns: the stored name
+        """
+        from .models import StoredBlob
+
+        digest = hash_file(content)
+        stored_name = blob_name(digest, name)
+        while True:
+            blob, created = await StoredBlob.objects.aget_or_create(
+                name=stored_name, defaults={'sha256': digest, 'size': content.size, 'ref_count': 1}
+            )
+            # Updates nothing if the last reference was deleted in between; the row is then created again
+            if created or await StoredBlob.objects.filter(pk=blob.pk).aupdate(ref_count=F('ref_count') + 1):
+                break
+        try:
+            if not await sync_to_async(self.inner.exists, thread_sensitive=False)(stored_name):
+                await sync_to_async(self.inner.save, thread_sensitive=False)(stored_name, content)
+        except Exception:
+            await sync_to_async(self.delete)(stored_name)
+            raise
+        return stored_name
+
+    def delete(self, name):
+        from .models import StoredBlob
+
+        if not name.startswith(BLOB_PREFIX):
+            return
+        with transaction.atomic():
+            blob = StoredBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return self.inner.delete(name)
+            if blob.ref_count > 1:
+                StoredBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+                return
+            blob.delete()
+            self.inner.delete(name)
+
+    def discard(self, name):
+        """
+        Remove a blob file written by a transaction that rolled back, unless a
+        committed StoredBlob row references it. Creating the row here waits
+        for any concurrent save of the same content to commit first.
+        """
+        from .models import StoredBlob
+
+        if not name.startswith(BLOB_PREFIX):
+            return
+        digest = os.path.splitext(os.path.basename(name))[0]
+        with transaction.atomic():
+            blob, created = StoredBlob.objects.select_for_update().get_or_create(
+                name=name, defaults={'sha256': digest, 'size': 0}
+            )
+            if created:
+                blob.delete()
+                self.inner.delete(name)
+
+    def backend(self, name):
+        # Keys committed from direct uploads live in the S3 bucket whatever the default storage is
+        if name.startswith(settings.DIRECT_UPLOAD_PREFIX):
+            return get_direct_upload_storage()
+        return self.inner
+
+    def _open(self, name, mode='rb'):
+        return self.backend(name).open(name, mode)
+
+    def exists(self, name):
+        return self.backend(name).exists(name)
+
+    def listdir(self, path):
+        return self.inner.listdir(path)
+
+    def size(self, name):
+        return self.backend(name).size(name)
+
+    def url(self, name):
+        return self.backend(name).url(name)
+
+    def path(self, name):
+        return self.backend(name).path(name)
+
+    def get_accessed_time(self, name):
+        return self.backend(name).get_accessed_time(name)
+
+    def get_created_time(self, name):
+        return self.inner.get_created_time(name)
+
+    def get_modified_time(self, name):
+        return self.inner.get_modified_time(name)
+
+content_addressed_storage = ContentAddressedStorage()
+
+# delete_objects accepts at most this many keys per request
+DELETE_BATCH_SIZE = 1000
+
+_s3_client = None
+_direct_upload_storage = None
+_s3_client_lock = threading.Lock()
+
+def create_s3_client():
+    return boto3.client('s3',
+                        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                        region_name=settings.AWS_S3_REGION_NAME,
+                        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+                        config=Config(max_pool_connections=settings.AWS_S3_MAX_POOL_CONNECTIONS))
+
+def get_s3_client():
+    """
+    Return the process-wide S3 client. boto3 clients are thread-safe and keep
+    a pool of open connections, so one client is shared by every request.
+    """
+    global _s3_client
+    if _s3_client is None:
+        with _s3_client_lock:
+            # Creating clients is not thread-safe, so only one thread builds it
+            if _s3_client is None:
+                _s3_client = create_s3_client()
+    return _s3_client
+
+def get_direct_upload_storage():
+    """
+    Return the process-wide storage for the S3 bucket that presigned uploads
+    go to (keys under DIRECT_UPLOAD_PREFIX).
+    """
+    global _direct_upload_storage
+    if _direct_upload_storage is None:
+        with _s3_client_lock:
+            if _direct_upload_storage is None:
+                _direct_upload_storage = S3Storage()
+    return _direct_upload_storage
+
+@receiver(setting_changed)
+def reset_s3_client(setting, **kwargs):
+    global _s3_client, _direct_upload_storage
+    if setting.startswith('AWS_'):
+        with _s3_client_lock:
+            _s3_client = None
+            _direct_upload_storage = None
+
+def generate_presigned_url(file_name, file_type, folder='uploads/', s3_client=None):
     """
     Generate a presigned URL for uploading a file to S3.
     """
     try:
-        s3_client = boto3.client('s3',
-                                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                                region_name=settings.AWS_S3_REGION_NAME)
+        s3_client = s3_client or get_s3_client()
         
-        key = f"{folder}{file_name}"
+        # A unique segment keeps concurrent uploads of the same file name apart
+        key = f"{folder}{uuid.uuid4().hex}/{file_name}"
         
         presigned_post = s3_client.generate_presigned_post(
             Bucket=settings.AWS_STORAGE_BUCKET_NAME,
@@ -33,15 +265,27 @@ def generate_presigned_url(file_name, file_type, folder='uploads/'):
         logger.error(f"Error generating presigned URL: {e}")
         return None
 
+def generate_presigned_urls(files, folder='uploads/'):
+    """
+    Sign uploads for several files at once. ``files`` is a list of
+    (file_name, file_type) pairs; signing is local, so this makes no requests.
+    Returns None if any of them could not be signed.
+    """
+    s3_client = get_s3_client()
+    presigned = []
+    for file_name, file_type in files:
+        presigned_post = generate_presigned_url(file_name, file_type, folder, s3_client=s3_client)
+        if presigned_post is None:
+            return None
+        presigned.append(presigned_post)
+    return presigned
+
 def delete_file_from_s3(file_path):
     """
     Delete a file from S3.
     """
     try:
-        s3_client = boto3.client('s3',
-                                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-                                region_name=settings.AWS_S3_REGION_NAME)
+        s3_client = get_s3_client()
         
         s3_client.delete_object(
             Bucket=settings.AWS_STORAGE_BUCKET_NAME,
@@ -50,4 +294,47 @@ def delete_file_from_s3(file_path):
         return True
     except ClientError as e:
         logger.error(f"Error deleting file from S3: {e}")
-        return False 
\ No newline at end of file
+        return False
+
+def delete_files_from_s3(file_paths):
+    """
+    Delete many files from S3 with one delete_objects request per 1000 keys.
+    Returns the keys that could not be deleted.
+    """
+    s3_client = get_s3_client()
+    file_paths = list(file_paths)
+    failed = []
+    for start in range(0, len(file_paths), DELETE_BATCH_SIZE):
+        batch = file_paths[start:start + DELETE_BATCH_SIZE]
+        try:
+            response = s3_client.delete_objects(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+            )
+        except ClientError as e:
+            logger.error(f"Error deleting files from S3: {e}")
+            failed.extend(batch)
+            continue
+        for error in response.get('Errors', []):
+            logger.error(f"Error deleting {error['Key']} from S3: {error.get('Message')}")
+            failed.append(error['Key'])
+    return failed
+
+def get_object_metadata(key):
+    """
+    Look up an uploaded object's size and content type without downloading it.
+    Returns None if the object does not exist.
+    """
+    try:
+        response = get_s3_client().head_object(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=key
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        raise
+    return {
+        'size': response['ContentLength'],
+        'content_type': response.get('ContentType', ''),
+    }
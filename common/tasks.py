@@ -0,0 +1,112 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_failure_handlers = {}
+
+
+def task(name, on_failure=None):
+    """
+    Register a function as a background task handler. Handlers receive the
+    enqueued payload as keyword arguments and must be safe to re-run.
+    ``on_failure(exc, **payload)`` is called once the last attempt has failed.
+    """
+    def decorator(func):
+        _registry[name] = func
+        if on_failure is not None:
+            _failure_handlers[name] = on_failure
+        return func
+    return decorator
+
+
+def enqueue(name, delay=None, **payload):
+    """
+    Queue a task. Created inside the caller's transaction, so the task only
+    becomes visible to workers if the surrounding work commits.
+    """
+    run_after = timezone.now() + (delay or timedelta())
+    return Task.objects.create(name=name, payload=payload, run_after=run_after)
+
+
+def enqueue_many(name, payloads, delay=None):
+    """
+    Queue one task per payload with a single bulk insert.
+    """
+    run_after = timezone.now() + (delay or timedelta())
+    return Task.objects.bulk_create(
+        [Task(name=name, payload=payload, run_after=run_after) for payload in payloads], batch_size=1000
+    )
+
+
+def discover_tasks():
+    # Import every installed app's tasks module so handlers are registered
+    autodiscover_modules('tasks')
+
+
+def requeue_stale_tasks():
+    """
+    Put back tasks whose worker died mid-run.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.TASK_LEASE_SECONDS)
+    return Task.objects.filter(status='running', locked_at__lt=cutoff).update(status='queued', locked_at=None)
+
+
+def claim_tasks(limit):
+    """
+    Lock and mark up to ``limit`` due tasks as running. Concurrent workers
+    skip rows another worker has already locked.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        tasks = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_after__lte=now)
+            .order_by('run_after', 'id')[:limit]
+        )
+        if tasks:
+            Task.objects.filter(pk__in=[t.pk for t in tasks]).update(
+                status='running', locked_at=now, attempts=F('attempts') + 1
+            )
+    for t in tasks:
+        t.attempts += 1
+    return tasks
+
+
+def run_task(t):
+    """
+    Run one claimed task. Successful tasks are deleted; failures are retried
+    with exponential backoff until max_attempts, then left as failed.
+    """
+    handler = _registry.get(t.name)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler registered for task {t.name!r}')
+        handler(**t.payload)
+    except Exception as exc:
+        logger.exception(f"Task {t.name} #{t.pk} failed (attempt {t.attempts})")
+        if t.attempts < t.max_attempts:
+            backoff = timedelta(seconds=settings.TASK_RETRY_BACKOFF_SECONDS * 2 ** (t.attempts - 1))
+            Task.objects.filter(pk=t.pk).update(
+                status='queued', locked_at=None, run_after=timezone.now() + backoff, last_error=str(exc)
+            )
+        else:
+            Task.objects.filter(pk=t.pk).update(status='failed', locked_at=None, last_error=str(exc))
+            on_failure = _failure_handlers.get(t.name)
+            if on_failure is not None:
+                try:
+                    on_failure(exc, **t.payload)
+                except Exception:
+                    logger.exception(f"Failure handler of task {t.name} #{t.pk} failed")
+        return False
+    Task.objects.filter(pk=t.pk).delete()
+    return True
@@ -1,3 +1,173 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+import boto3
+from asgiref.sync import sync_to_async
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import StoredBlob, Task
+from .tasks import claim_tasks, enqueue, requeue_stale_tasks, run_task, task
+from .storage import (
+    content_addressed_storage, delete_files_from_s3, generate_presigned_urls, get_s3_client, staging_storage,
+)
+
+try:
+    from moto import mock_aws
+except ImportError:  # moto is only needed to run the storage tests
+    mock_aws = None
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_identical_content_is_stored_once(self):
+        first = content_addressed_storage.save('applications/photos/me.jpg', ContentFile(b'same bytes'))
+        second = content_addressed_storage.save('applications/documents/me_again.JPG', ContentFile(b'same bytes'))
+        other = content_addressed_storage.save('applications/photos/me.jpg', ContentFile(b'other bytes'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertTrue(first.startswith('blobs/') and first.endswith('.jpg'))
+        self.assertEqual(StoredBlob.objects.get(name=first).ref_count, 2)
+
+    def test_file_is_removed_with_its_last_reference(self):
+        name = content_addressed_storage.save('a.pdf', ContentFile(b'%PDF'))
+        content_addressed_storage.save('b.pdf', ContentFile(b'%PDF'))
+
+        content_addressed_storage.delete(name)
+        self.assertTrue(content_addressed_storage.exists(name))
+        content_addressed_storage.delete(name)
+        self.assertFalse(content_addressed_storage.exists(name))
+        self.assertFalse(StoredBlob.objects.filter(name=name).exists())
+
+    def test_names_outside_blobs_are_never_deleted(self):
+        # e.g. a direct-upload key committed straight into a file field
+        name = default_storage.save('uploads/a1/marks.pdf', ContentFile(b'%PDF'))
+        content_addressed_storage.delete(name)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_staging_follows_its_setting(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(UPLOAD_STAGING_ROOT=directory):
+            name = staging_storage.save('upload.pdf', ContentFile(b'%PDF'))
+            self.assertEqual(staging_storage.path(name), f'{directory}/{name}')
+
+    async def test_async_save_shares_blobs_with_save(self):
+        name = await content_addressed_storage.asave('a.png', ContentFile(b'png bytes'))
+        self.assertEqual(await sync_to_async(content_addressed_storage.save)('b.png', ContentFile(b'png bytes')), name)
+        self.assertEqual(await content_addressed_storage.asave('c.png', ContentFile(b'png bytes')), name)
+        self.assertEqual((await StoredBlob.objects.aget(name=name)).ref_count, 3)
+        self.assertTrue(await sync_to_async(content_addressed_storage.exists)(name))
+
+
+calls = []
+
+
+@task('common.tests.record')
+def record_task(**payload):
+    calls.append(payload)
+
+
+@task('common.tests.broken', on_failure=lambda exc, **payload: calls.append(('gave up', str(exc), payload)))
+def broken_task(**payload):
+    raise ValueError('broken')
+
+
+@override_settings(TASK_RETRY_BACKOFF_SECONDS=30, TASK_LEASE_SECONDS=600)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_claims_due_tasks_in_order(self):
+        later = enqueue('common.tests.record', delay=timedelta(minutes=5))
+        first, second, third = [enqueue('common.tests.record', n=n) for n in range(3)]
+        claimed = claim_tasks(2)
+        self.assertEqual([t.pk for t in claimed], [first.pk, second.pk])
+        self.assertEqual([t.attempts for t in claimed], [1, 1])
+        self.assertEqual(dict(Task.objects.values_list('pk', 'status')),
+                         {later.pk: 'queued', first.pk: 'running', second.pk: 'running', third.pk: 'queued'})
+        self.assertEqual([t.pk for t in claim_tasks(10)], [third.pk])
+
+    def test_success_deletes_the_task(self):
+        enqueue('common.tests.record', n=1)
+        self.assertTrue(run_task(claim_tasks(1)[0]))
+        self.assertEqual(calls, [{'n': 1}])
+        self.assertFalse(Task.objects.exists())
+
+    def test_failures_back_off_then_give_up(self):
+        t = enqueue('common.tests.broken', n=1)
+        Task.objects.filter(pk=t.pk).update(max_attempts=3)
+        for attempt, backoff in ((1, 30), (2, 60)):
+            before = timezone.now()
+            with self.assertLogs('common.tasks', 'ERROR'):
+                self.assertFalse(run_task(claim_tasks(1)[0]))
+            t.refresh_from_db()
+            self.assertEqual((t.status, t.attempts, t.last_error), ('queued', attempt, 'broken'))
+            self.assertGreaterEqual(t.run_after, before + timedelta(seconds=backoff))
+            self.assertEqual(claim_tasks(1), [])  # Not due yet
+            Task.objects.filter(pk=t.pk).update(run_after=timezone.now())
+        self.assertEqual(calls, [])
+
+        with self.assertLogs('common.tasks', 'ERROR'):
+            self.assertFalse(run_task(claim_tasks(1)[0]))
+        t.refresh_from_db()
+        self.assertEqual((t.status, t.attempts), ('failed', 3))
+        self.assertEqual(calls, [('gave up', 'broken', {'n': 1})])
+
+    def test_unknown_task_is_retried(self):
+        t = enqueue('common.tests.missing')
+        with self.assertLogs('common.tasks', 'ERROR'):
+            self.assertFalse(run_task(claim_tasks(1)[0]))
+        t.refresh_from_db()
+        self.assertEqual(t.status, 'queued')
+        self.assertIn('No handler registered', t.last_error)
+
+    def test_stale_running_tasks_are_requeued(self):
+        stale, fresh = enqueue('common.tests.record'), enqueue('common.tests.record')
+        claim_tasks(2)
+        Task.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - timedelta(seconds=601))
+        self.assertEqual(requeue_stale_tasks(), 1)
+        self.assertEqual(dict(Task.objects.values_list('pk', 'status')), {stale.pk: 'queued', fresh.pk: 'running'})
+        self.assertEqual(Task.objects.get(pk=stale.pk).locked_at, None)
+
+
+@skipUnless(mock_aws, 'moto is not installed')
+@override_settings(
+    AWS_ACCESS_KEY_ID='testing',
+    AWS_SECRET_ACCESS_KEY='testing',
+    AWS_STORAGE_BUCKET_NAME='job-portal-test',
+    AWS_S3_REGION_NAME='us-east-1',
+    AWS_S3_ENDPOINT_URL=None,
+)
+class StorageClientTests(TestCase):
+    def setUp(self):
+        aws = mock_aws()
+        aws.start()
+        self.addCleanup(aws.stop)
+        self.s3 = boto3.client('s3', region_name='us-east-1')
+        self.s3.create_bucket(Bucket='job-portal-test')
+
+    def test_client_is_shared(self):
+        self.assertIs(get_s3_client(), get_s3_client())
+
+    def test_batch_presign_gives_each_file_its_own_key(self):
+        presigned = generate_presigned_urls([('a.pdf', 'application/pdf'), ('a.pdf', 'application/pdf')])
+        keys = [post['fields']['key'] for post in presigned]
+        self.assertEqual(len(set(keys)), 2)
+        self.assertTrue(all(key.startswith('uploads/') and key.endswith('/a.pdf') for key in keys))
+
+    def test_batch_delete_spans_several_requests(self):
+        keys = [f'uploads/bulk/{i}' for i in range(1001)]
+        for key in keys:
+            self.s3.put_object(Bucket='job-portal-test', Key=key, Body=b'x')
+
+        self.assertEqual(delete_files_from_s3(keys), [])
+        self.assertEqual(self.s3.list_objects_v2(Bucket='job-portal-test').get('KeyCount'), 0)
@@ -0,0 +1,180 @@
+import math
+import random
+import zlib
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from .idempotency import HEADER as IDEMPOTENCY_HEADER
+from .models import RateLimitBucket
+
+
+class Overloaded(Throttled):
+    default_detail = 'Too many submissions are being processed. Please try again shortly.'
+    default_code = 'overloaded'
+
+
+def take_token(key, capacity, rate):
+    """
+    Take one token from the bucket ``key``, which holds up to ``capacity``
+    tokens and refills at ``rate`` tokens per second. A single upsert, so
+    concurrent requests in any process never overdraw a bucket.
+    Returns: 0 if a token was taken, else seconds until one is available
+    """
+    table = connection.ops.quote_name(RateLimitBucket._meta.db_table)
+    refilled = f'LEAST(%(capacity)s, b.tokens + EXTRACT(EPOCH FROM now() - b.updated_at) * %(rate)s)'
+    params = {'key': key, 'capacity': float(capacity), 'rate': float(rate)}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} AS b (key, tokens, updated_at) VALUES (%(key)s, %(capacity)s - 1, now()) "
+            f"ON CONFLICT (key) DO UPDATE SET tokens = {refilled} - 1, updated_at = now() "
+            f"WHERE {refilled} >= 1 RETURNING tokens",
+            params,
+        )
+        if cursor.fetchone():
+            return 0
+        cursor.execute(f'SELECT {refilled} FROM {table} b WHERE key = %(key)s', params)
+        row = cursor.fetchone()
+    return (1 - row[0]) / rate if row else 0
+
+
+def prune_rate_limit_buckets():
+    """
+    Delete buckets that have refilled completely; they are recreated full.
+    """
+    refill_seconds = max(capacity / (per_minute / 60) for capacity, per_minute in settings.SUBMISSION_RATE_LIMITS.values())
+    table = connection.ops.quote_name(RateLimitBucket._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE updated_at < now() - %s * interval '1 second'", [refill_seconds])
+        return cursor.rowcount
+
+
+class SubmissionThrottle(BaseThrottle):
+    """
+    Token buckets for new applications, configured by SUBMISSION_RATE_LIMITS
+    as (burst, refill per minute). This one is per client IP and needs nothing
+    from the request body, so it runs before the upload is read.
+    """
+    scope = 'ip'
+
+    def allow_request(self, request, view):
+        ident = self.get_ident(request)
+        self.wait_seconds = self.take(ident) if ident is not None else 0
+        return not self.wait_seconds
+
+    def take(self, ident):
+        capacity, per_minute = settings.SUBMISSION_RATE_LIMITS[self.scope]
+        return take_token(f'submission:{self.scope}:{ident}', capacity, per_minute / 60)
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class JobPostSubmissionThrottle(SubmissionThrottle):
+    """
+    The bucket per job post, so a rush on one post can't use up capacity
+    meant for the others. It reads the job post from the parsed body, so it
+    runs once the request holds an in-flight slot.
+    """
+    scope = 'job_post'
+
+    def get_ident(self, request):
+        # Plain Django requests (the async submission view) have no .data
+        data = request.data if hasattr(request, 'data') else request.POST
+        value = str(data.get('job_post') or '')
+        return int(value) if value.isdigit() else None
+
+
+class ConcurrencyLimit:
+    """
+    At most ``limit`` holders at once across every process, using PostgreSQL
+    session advisory locks as slots. A slot is held by the database connection,
+    so one left behind by a crashed worker is freed with its connection.
+    """
+
+    def __init__(self, name, limit_setting):
+        self.lock_class = zlib.crc32(name.encode()) & 0x7fffffff
+        self.limit_setting = limit_setting
+
+    def acquire(self):
+        """
+        Returns: the slot taken, or None when all are in use
+        """
+        limit = getattr(settings, self.limit_setting)
+        with connection.cursor() as cursor:
+            # Start at a random slot so requests don't all contend for the first ones
+            cursor.execute(
+                'SELECT slot FROM (SELECT (s + %s) %% %s AS slot FROM generate_series(0, %s - 1) s) slots '
+                'WHERE pg_try_advisory_lock(%s, slot) LIMIT 1',
+                [random.randrange(max(limit, 1)), max(limit, 1), limit, self.lock_class],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+    def release(self, slot):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s, %s)', [self.lock_class, slot])
+
+
+submission_slots = ConcurrencyLimit('applications.submissions', 'SUBMISSION_MAX_IN_FLIGHT')
+
+
+class SubmissionAdmissionMixin:
+    """
+    View mixin for the actions in ``submission_actions``: the per-IP
+    SubmissionThrottle, then a slot of the global in-flight limit
+    (SUBMISSION_MAX_IN_FLIGHT), held until the request is done, then the per
+    job post bucket. All answer 429 with Retry-After, and the upload is only
+    read once a slot is held. For a request with an Idempotency-Key to an
+    @idempotent action, admission waits until the decorator has checked for a
+    stored response.
+    """
+    submission_actions = ()
+
+    def get_throttles(self):
+        if self.action in self.submission_actions:
+            # Applied in admit_submission()
+            return []
+        return super().get_throttles()
+
+    def initial(self, request, *args, **kwargs):
+        self.submission_slot = None
+        self.submission_admission_deferred = False
+        super().initial(request, *args, **kwargs)
+        if self.action in self.submission_actions:
+            handler = getattr(self, self.action, None)
+            if IDEMPOTENCY_HEADER in request.headers and getattr(handler, 'answers_retries_first', False):
+                self.submission_admission_deferred = True
+            else:
+                self.admit_submission(request)
+
+    def admit_deferred_submission(self, request):
+        if self.submission_admission_deferred:
+            self.submission_admission_deferred = False
+            self.admit_submission(request)
+
+    def admit_submission(self, request):
+        throttle = SubmissionThrottle()
+        if not throttle.allow_request(request, self):
+            self.throttled(request, throttle.wait())
+        self.submission_slot = submission_slots.acquire()
+        if self.submission_slot is None:
+            raise Overloaded(wait=overloaded_retry_after())
+        throttle = JobPostSubmissionThrottle()
+        if not throttle.allow_request(request, self):
+            self.throttled(request, throttle.wait())
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            if getattr(self, 'submission_slot', None) is not None:
+                submission_slots.release(self.submission_slot)
+                self.submission_slot = None
+
+
+def overloaded_retry_after():
+    # Spread retries out so rejected clients don't all come back at once
+    return math.ceil(settings.SUBMISSION_OVERLOAD_RETRY_AFTER * random.uniform(1, 2))
@@ -0,0 +1,114 @@
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .validators import sniff_mime_type
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload is too large.'
+    default_code = 'upload_too_large'
+
+
+class UnsupportedUpload(APIException):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    default_detail = 'Uploaded file type is not allowed.'
+    default_code = 'unsupported_upload'
+
+
+class StreamedUploadedFile(TemporaryUploadedFile):
+    """
+    Upload spooled to the staging directory, so moving it into staging (or a
+    local storage backend) is a rename. Carries the MIME type sniffed from its
+    content and its SHA-256.
+    """
+
+    def __init__(self, name, content_type, size, charset, content_type_extra=None):
+        _, ext = os.path.splitext(name)
+        os.makedirs(settings.UPLOAD_STAGING_ROOT, exist_ok=True)
+        file = tempfile.NamedTemporaryFile(suffix='.upload' + ext, dir=settings.UPLOAD_STAGING_ROOT)
+        super(TemporaryUploadedFile, self).__init__(file, name, content_type, size, charset, content_type_extra)
+        self.sniffed_content_type = None
+        self.sha256 = None
+
+
+class StreamingUploadHandler(FileUploadHandler):
+    """
+    Validate, hash and spool each uploaded file in one pass as its chunks
+    arrive. The MIME type is sniffed from the first chunk and size limits are
+    checked per chunk, so a bad or oversized upload is rejected without
+    reading the rest of the request body. Memory use is one chunk per request.
+    """
+
+    def __init__(self, request=None, allowed_types=None, max_file_size=None):
+        super().__init__(request)
+        self.allowed_types = allowed_types or settings.UPLOAD_ALLOWED_TYPES
+        self.max_file_size = max_file_size or settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > settings.UPLOAD_MAX_REQUEST_SIZE:
+            raise UploadTooLarge(
+                f'Request body must be no more than {settings.UPLOAD_MAX_REQUEST_SIZE / 1024 / 1024:g}MB'
+            )
+        # Returning None lets Django parse the body and hand files to this handler
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = StreamedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.hash = hashlib.sha256()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0:
+            self.check_type(sniff_mime_type(raw_data))
+        self.received += len(raw_data)
+        if self.received > self.max_file_size:
+            self.file.close()
+            raise UploadTooLarge(
+                f'File "{self.file_name}" must be no more than {self.max_file_size / 1024 / 1024:g}MB'
+            )
+        self.hash.update(raw_data)
+        self.file.write(raw_data)
+        # Nothing is passed on to later handlers
+
+    def check_type(self, content_type):
+        if content_type not in self.allowed_types:
+            self.file.close()
+            raise UnsupportedUpload(
+                f'File type {content_type} of "{self.file_name}" is not allowed. '
+                f'Allowed types: {", ".join(self.allowed_types)}'
+            )
+        self.file.sniffed_content_type = content_type
+
+    def file_complete(self, file_size):
+        if file_size == 0:
+            # No chunks arrived, so the type was never checked
+            self.check_type(sniff_mime_type(b''))
+        self.file.seek(0)
+        self.file.size = file_size
+        # Later checks (form schema accept lists, validate_file_type) see the sniffed type
+        self.file.content_type = self.file.sniffed_content_type
+        self.file.sha256 = self.hash.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+
+class StreamingUploadMixin:
+    """
+    View mixin that parses multipart uploads with StreamingUploadHandler.
+    """
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Must be set before anything reads the body
+        request.upload_handlers = [StreamingUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
@@ -3,13 +3,25 @@ from django.conf import settings
 import magic
 import os
 
+# Opening libmagic's database is slow, so one instance is shared; it locks internally
+_magic = magic.Magic(mime=True)
+
+def sniff_mime_type(data):
+    """
+    Detect a MIME type from the first bytes of a file.
+    """
+    return _magic.from_buffer(data[:2048])
+
 def validate_file_type(file_obj, allowed_types):
     """
     Validate file type using python-magic.
     """
-    # Read the first 2048 bytes to determine the file type
-    file_mime = magic.from_buffer(file_obj.read(2048), mime=True)
-    file_obj.seek(0)  # Reset file pointer
+    # Files parsed by common.uploadhandlers were already sniffed while streaming
+    file_mime = getattr(file_obj, 'sniffed_content_type', None)
+    if file_mime is None:
+        # Read the first 2048 bytes to determine the file type
+        file_mime = sniff_mime_type(file_obj.read(2048))
+        file_obj.seek(0)  # Reset file pointer
     
     if file_mime not in allowed_types:
         raise ValidationError(f'File type {file_mime} is not allowed. Allowed types: {", ".join(allowed_types)}')
@@ -1,3 +1,34 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import DailySubmissions, HourlySubmissions, StatusCount
+
+
+class RollupAdmin(admin.ModelAdmin):
+    # Maintained by dashboard.rollups; rebuild with `manage.py rebuild_dashboard` instead of editing
+    list_select_related = ['agency', 'job_post']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StatusCount)
+class StatusCountAdmin(RollupAdmin):
+    list_display = ['job_post', 'agency', 'status', 'count']
+    list_filter = ['status', 'agency']
+
+
+@admin.register(HourlySubmissions)
+class HourlySubmissionsAdmin(RollupAdmin):
+    list_display = ['hour', 'job_post', 'agency', 'count']
+    list_filter = ['agency']
+    date_hierarchy = 'hour'
+
+
+@admin.register(DailySubmissions)
+class DailySubmissionsAdmin(RollupAdmin):
+    list_display = ['day', 'job_post', 'agency', 'count']
+    list_filter = ['agency']
+    date_hierarchy = 'day'
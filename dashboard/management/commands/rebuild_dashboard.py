@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = ('Recompute the dashboard rollup tables from the applications table, e.g. after bulk '
+            'deletes or raw SQL changes that bypassed Application.save().')
+
+    def handle(self, *args, **options):
+        written = rebuild()
+        for model, rows in written.items():
+            self.stdout.write(f'{model}: {rows} row(s)')
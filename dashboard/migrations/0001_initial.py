@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('agencies', '0008_jobpost_cursor_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySubmissions',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agencies.agency')),
+                ('job_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agencies.jobpost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['agency', 'day'], name='dashboard_d_agency__2f5624_idx'), models.Index(fields=['day'], name='dashboard_d_day_d4b40e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('job_post', 'day'), name='dashboard_daily_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='HourlySubmissions',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agencies.agency')),
+                ('job_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agencies.jobpost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['agency', 'hour'], name='dashboard_h_agency__dc14fe_idx'), models.Index(fields=['hour'], name='dashboard_h_hour_9a607e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('job_post', 'hour'), name='dashboard_hourly_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('agency', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agencies.agency')),
+                ('job_post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='agencies.jobpost')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['agency', 'status'], name='dashboard_s_agency__f0d7b9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('job_post', 'status'), name='dashboard_status_count_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+from datetime import timezone as dt_timezone
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Count the applications that already exist, as dashboard.rollups.rebuild() does.
+    """
+    Application = apps.get_model('applications', 'Application')
+    applications = Application.objects.order_by()
+    sources = [
+        ('StatusCount', applications.values('job_post_id', 'job_post__agency_id', 'status')),
+        ('HourlySubmissions', applications.values('job_post_id', 'job_post__agency_id',
+                                                  hour=TruncHour('created_at', tzinfo=dt_timezone.utc))),
+        ('DailySubmissions', applications.values('job_post_id', 'job_post__agency_id', day=TruncDate('created_at'))),
+    ]
+    for model_name, rows in sources:
+        model = apps.get_model('dashboard', model_name)
+        model.objects.bulk_create([
+            model(agency_id=row.pop('job_post__agency_id'), job_post_id=row.pop('job_post_id'),
+                  count=row.pop('count'), **row)
+            for row in rows.annotate(count=Count('id')).iterator()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0013_form_data_numeric'),
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
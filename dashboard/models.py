@@ -1,3 +1,55 @@
 from django.db import models
 
-# Create your models here.
+from agencies.models import Agency, JobPost
+
+# Rollups of Application rows, kept current by dashboard.rollups as applications
+# are created, change status or are deleted, and rebuilt by `manage.py rebuild_dashboard`.
+# Dashboards read these instead of counting applications. The agency is stored
+# alongside the job post so agency totals need no join.
+
+
+class StatusCount(models.Model):
+    agency = models.ForeignKey(Agency, on_delete=models.CASCADE, related_name='+')
+    job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='+')
+    status = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job_post', 'status'], name='dashboard_status_count_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['agency', 'status']),
+        ]
+
+
+class HourlySubmissions(models.Model):
+    agency = models.ForeignKey(Agency, on_delete=models.CASCADE, related_name='+')
+    job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='+')
+    hour = models.DateTimeField()  # Start of the hour, UTC
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job_post', 'hour'], name='dashboard_hourly_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['agency', 'hour']),
+            models.Index(fields=['hour']),
+        ]
+
+
+class DailySubmissions(models.Model):
+    agency = models.ForeignKey(Agency, on_delete=models.CASCADE, related_name='+')
+    job_post = models.ForeignKey(JobPost, on_delete=models.CASCADE, related_name='+')
+    day = models.DateField()  # In TIME_ZONE
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job_post', 'day'], name='dashboard_daily_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['agency', 'day']),
+            models.Index(fields=['day']),
+        ]
@@ -0,0 +1,108 @@
+from collections import Counter
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from agencies.models import JobPost
+from .models import DailySubmissions, HourlySubmissions, StatusCount
+
+ROLLUP_MODELS = [StatusCount, HourlySubmissions, DailySubmissions]
+
+
+def _increment(model, job_post_id, key, value, delta):
+    # Upsert in one statement; the row lock taken here is held until the caller commits
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.get_field(key).column)
+    job_posts = connection.ops.quote_name(JobPost._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (agency_id, job_post_id, {column}, count) '
+            f'SELECT agency_id, id, %s, %s FROM {job_posts} WHERE id = %s '
+            f'ON CONFLICT (job_post_id, {column}) DO UPDATE SET count = {table}.count + EXCLUDED.count',
+            [value, delta, job_post_id],
+        )
+
+
+def hour_bucket(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def record_submission(job_post_id, status, created_at, delta=1):
+    """
+    Count an application (or, with delta=-1, uncount a deleted one) in the
+    status counts and the hourly and daily submission series.
+    Call inside the transaction that writes the application.
+    """
+    _increment(StatusCount, job_post_id, 'status', status, delta)
+    _increment(HourlySubmissions, job_post_id, 'hour', hour_bucket(created_at), delta)
+    _increment(DailySubmissions, job_post_id, 'day', timezone.localdate(created_at), delta)
+
+
+def record_submissions(job_post_id, applications):
+    """
+    Count many new applications of one job post with one upsert per status,
+    hour and day instead of per application.
+    """
+    for model, key, counts in [
+        (StatusCount, 'status', Counter(application.status for application in applications)),
+        (HourlySubmissions, 'hour', Counter(hour_bucket(application.created_at) for application in applications)),
+        (DailySubmissions, 'day', Counter(timezone.localdate(application.created_at) for application in applications)),
+    ]:
+        for value, count in sorted(counts.items()):
+            _increment(model, job_post_id, key, value, count)
+
+
+def record_status_change(job_post_id, old_status, new_status):
+    """
+    Move an application between status counts.
+    """
+    if old_status != new_status:
+        record_status_counts(job_post_id, {old_status: -1, new_status: 1})
+
+
+def record_status_counts(job_post_id, status_deltas):
+    """
+    Add {status: delta} to a job post's status counts. Rows are updated in a
+    fixed order so concurrent changes in opposite directions can't deadlock.
+    """
+    for status, delta in sorted(status_deltas.items()):
+        if delta:
+            _increment(StatusCount, job_post_id, 'status', status, delta)
+
+
+def rebuild():
+    """
+    Recompute every rollup from the applications table. Rollup writes from
+    concurrent requests wait for the rebuild, then apply on top of it.
+    Returns: {model name: rows written}
+    """
+    from applications.models import Application
+
+    applications = Application.objects.order_by()
+    sources = [
+        (StatusCount, applications.values('job_post_id', 'job_post__agency_id', 'status')),
+        (HourlySubmissions, applications.values('job_post_id', 'job_post__agency_id',
+                                                hour=TruncHour('created_at', tzinfo=dt_timezone.utc))),
+        (DailySubmissions, applications.values('job_post_id', 'job_post__agency_id', day=TruncDate('created_at'))),
+    ]
+    written = {}
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in ROLLUP_MODELS)
+            cursor.execute(f'LOCK TABLE {tables} IN EXCLUSIVE MODE')
+        for model, rows in sources:
+            model.objects.all().delete()
+            created = model.objects.bulk_create(
+                (model(
+                    agency_id=row.pop('job_post__agency_id'),
+                    job_post_id=row.pop('job_post_id'),
+                    count=row.pop('count'),
+                    **row,
+                ) for row in rows.annotate(count=Count('id')).iterator()),
+                batch_size=1000,
+            )
+            written[model.__name__] = len(created)
+    return written
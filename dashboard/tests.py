@@ -1,3 +1,98 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from agencies.models import Agency, JobPost
+from applications.models import Application
+from .models import DailySubmissions, HourlySubmissions, StatusCount
+from .rollups import rebuild
+
+
+class DashboardRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.agency = Agency.objects.create(name='Rollup Agency', code='RLA')
+        cls.clerk = JobPost.objects.create(agency=cls.agency, title='Clerk', description='', form_schema={'fields': []})
+        cls.typist = JobPost.objects.create(agency=cls.agency, title='Typist', description='', form_schema={'fields': []})
+        cls.user = User.objects.create_user('dashboard', is_staff=True)
+
+    def apply(self, job_post, **kwargs):
+        return Application.objects.create(
+            job_post=job_post, full_name='Asha Rao', email='asha@example.com', phone='9000000000', form_data={},
+            photo='applications/photos/photo.jpg', signature='applications/signatures/sig.png', **kwargs
+        )
+
+    def rollups(self):
+        return {
+            'status': sorted(StatusCount.objects.filter(count__gt=0).values_list('job_post_id', 'status', 'count')),
+            'hourly': sorted(HourlySubmissions.objects.filter(count__gt=0).values_list('job_post_id', 'hour', 'count')),
+            'daily': sorted(DailySubmissions.objects.filter(count__gt=0).values_list('job_post_id', 'day', 'count')),
+        }
+
+    def get(self, path, **params):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts_follow_creates_status_changes_and_deletes(self):
+        first, second = self.apply(self.clerk), self.apply(self.clerk)
+        self.apply(self.typist)
+        first.status = 'shortlisted'
+        first.save()
+        first.save()  # Unchanged status is not counted twice
+        second.delete()
+
+        self.assertEqual(self.rollups()['status'], sorted([
+            (self.clerk.pk, 'shortlisted', 1), (self.typist.pk, 'pending', 1),
+        ]))
+        self.assertEqual(sum(row[2] for row in self.rollups()['daily']), 2)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        for _ in range(3):
+            self.apply(self.clerk)
+        self.apply(self.typist, status='rejected')
+        incremental = self.rollups()
+        StatusCount.objects.update(count=0)
+        rebuild()
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_status_counts_endpoint(self):
+        self.apply(self.clerk)
+        self.apply(self.typist, status='hired')
+        [agency] = self.get('/api/dashboard/status-counts/', agency='RLA')
+        self.assertEqual(agency['total'], 2)
+        self.assertEqual(agency['by_status']['hired'], 1)
+        self.assertEqual(agency['by_status']['reviewing'], 0)
+
+        job_posts = self.get('/api/dashboard/status-counts/', agency='RLA', group_by='job_post')
+        self.assertEqual([(row['title'], row['total']) for row in job_posts], [('Clerk', 1), ('Typist', 1)])
+
+    def test_submissions_endpoint_fills_empty_buckets(self):
+        self.apply(self.clerk)
+        self.apply(self.clerk)
+        today = timezone.localdate()
+        daily = self.get('/api/dashboard/submissions/', agency='RLA',
+                         since=(today - timedelta(days=2)).isoformat(), until=today.isoformat())
+        self.assertEqual([bucket['count'] for bucket in daily['series']], [0, 0, 2])
+
+        hourly = self.get('/api/dashboard/submissions/', job_post=self.clerk.pk, interval='hour')
+        self.assertEqual(len(hourly['series']), 48)
+        self.assertEqual(hourly['series'][-1]['count'], 2)
 
-# Create your tests here.
+    def test_reads_do_not_scale_with_applications(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.apply(self.clerk)
+        with self.assertNumQueries(1):
+            client.get('/api/dashboard/status-counts/')
+        for _ in range(5):
+            self.apply(self.typist)
+        with self.assertNumQueries(1):
+            client.get('/api/dashboard/status-counts/')
+        with self.assertNumQueries(1):
+            client.get('/api/dashboard/submissions/')
@@ -1,3 +1,105 @@
-from django.shortcuts import render
+from datetime import datetime, timedelta
 
-# Create your views here.
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from applications.models import Application
+from .models import DailySubmissions, HourlySubmissions, StatusCount
+from .rollups import hour_bucket
+
+# Longest series one request may ask for, in buckets
+MAX_SERIES_LENGTH = {'day': 366, 'hour': 24 * 31}
+DEFAULT_SERIES_LENGTH = {'day': 30, 'hour': 48}
+
+
+class DashboardViewSet(viewsets.ViewSet):
+    """
+    Application volumes read from the dashboard rollup tables, so each
+    response costs the same however many applications there are.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def _filter(self, queryset):
+        agency_code = self.request.query_params.get('agency')
+        if agency_code:
+            queryset = queryset.filter(agency__code=agency_code)
+        job_post_id = self.request.query_params.get('job_post')
+        if job_post_id:
+            queryset = queryset.filter(job_post_id=job_post_id)
+        return queryset
+
+    @action(detail=False, methods=['get'], url_path='status-counts')
+    def status_counts(self, request):
+        """
+        Applications by status, per agency (default) or per job post with
+        ?group_by=job_post. Filter with ?agency=<code> or ?job_post=<id>.
+        """
+        group_by = request.query_params.get('group_by', 'agency')
+        if group_by == 'agency':
+            columns = {'id': 'agency_id', 'code': 'agency__code', 'name': 'agency__name'}
+        elif group_by == 'job_post':
+            columns = {'id': 'job_post_id', 'title': 'job_post__title', 'agency': 'agency__code'}
+        else:
+            raise ValidationError({'group_by': 'Must be "agency" or "job_post".'})
+
+        groups = {}
+        rows = self._filter(StatusCount.objects.all()).values(*columns.values(), 'status').annotate(total=Sum('count'))
+        for row in rows.order_by(columns['id']):
+            group = groups.setdefault(row[columns['id']], {
+                **{label: row[column] for label, column in columns.items()},
+                'total': 0,
+                'by_status': {status: 0 for status, _ in Application.STATUS_CHOICES},
+            })
+            group['by_status'][row['status']] = row['total']
+            group['total'] += row['total']
+        return Response(list(groups.values()))
+
+    @action(detail=False, methods=['get'])
+    def submissions(self, request):
+        """
+        Submissions per day (default) or per hour with ?interval=hour, over
+        ?since= and ?until= (ISO dates or datetimes; defaults to the last 30
+        days or 48 hours). Filter with ?agency=<code> or ?job_post=<id>.
+        Days are in TIME_ZONE, hours in UTC; empty buckets are included.
+        """
+        interval = request.query_params.get('interval', 'day')
+        if interval not in MAX_SERIES_LENGTH:
+            raise ValidationError({'interval': 'Must be "day" or "hour".'})
+
+        if interval == 'day':
+            step = timedelta(days=1)
+            until = self._get_bound('until', timezone.localdate(), as_date=True)
+            since = self._get_bound('since', until - step * (DEFAULT_SERIES_LENGTH['day'] - 1), as_date=True)
+            model, field = DailySubmissions, 'day'
+        else:
+            step = timedelta(hours=1)
+            until = hour_bucket(self._get_bound('until', timezone.now()))
+            since = hour_bucket(self._get_bound('since', until - step * (DEFAULT_SERIES_LENGTH['hour'] - 1)))
+            model, field = HourlySubmissions, 'hour'
+        length = (until - since) // step + 1
+        if length < 1 or length > MAX_SERIES_LENGTH[interval]:
+            raise ValidationError({'since': f'Range must cover 1 to {MAX_SERIES_LENGTH[interval]} {interval}s.'})
+
+        rows = self._filter(model.objects.filter(**{f'{field}__range': (since, until)}))
+        counts = dict(rows.values(field).annotate(total=Sum('count')).values_list(field, 'total'))
+        buckets = [since + step * i for i in range(length)]
+        return Response({
+            'interval': interval,
+            'series': [{'start': bucket.isoformat(), 'count': counts.get(bucket, 0)} for bucket in buckets],
+        })
+
+    def _get_bound(self, name, default, as_date=False):
+        value = self.request.query_params.get(name)
+        if not value:
+            return default
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValidationError({name: 'Must be an ISO 8601 date or datetime.'})
+        if as_date:
+            return moment.date()
+        return moment if timezone.is_aware(moment) else timezone.make_aware(moment)
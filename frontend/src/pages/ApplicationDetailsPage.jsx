@@ -111,6 +111,23 @@ export default function ApplicationDetailsPage() {
             </List>
           </Grid>
 
+          {/* Photo and Signature: review-size renditions, falling back to the upload until they are rendered */}
+          <Grid item xs={12}>
+            <Box sx={{ display: 'flex', gap: 4, flexWrap: 'wrap' }}>
+              {[
+                ['Photo', application.photo_review || application.photo, application.photo],
+                ['Signature', application.signature_review || application.signature, application.signature],
+              ].map(([label, src, original]) => src && (
+                <Box key={label}>
+                  <Typography variant="subtitle2" gutterBottom>{label}</Typography>
+                  <a href={original} target="_blank" rel="noopener noreferrer">
+                    <img src={src} alt={label} loading="lazy" style={{ maxWidth: 300, maxHeight: 300 }} />
+                  </a>
+                </Box>
+              ))}
+            </Box>
+          </Grid>
+
           <Grid item xs={12}>
             <Divider />
           </Grid>
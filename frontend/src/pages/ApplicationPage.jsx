@@ -22,19 +22,19 @@ export default function ApplicationPage() {
       setLoading(true);
       setError(null);
       try {
-        const agencyRes = await axios.get(`/api/agencies/${agencyCode}/`);
-        const schema = agencyRes.data.default_form_schema;
+        // Agency, active job posts and their merged form schemas in one request
+        const res = await axios.get(`/api/agencies/${agencyCode}/bootstrap/`);
+        const schema = res.data.agency.default_form_schema;
         if (schema) {
           setFormSchema(schema);
           setInitialValues(generateInitialValues(schema));
         }
 
-        const jobsRes = await axios.get(`/api/agencies/${agencyCode}/job_posts/`);
-        setJobPosts(jobsRes.data);
+        setJobPosts(res.data.job_posts);
 
-        if (jobsRes.data.length === 1) {
-          setSelectedJobPost(jobsRes.data[0].id);
-        } else if (jobsRes.data.length === 0) {
+        if (res.data.job_posts.length === 1) {
+          setSelectedJobPost(res.data.job_posts[0].id);
+        } else if (res.data.job_posts.length === 0) {
           setError('No job posts found for this agency.');
         }
       } catch (err) {
@@ -50,27 +50,19 @@ export default function ApplicationPage() {
   React.useEffect(() => {
     if (!selectedJobPost) return;
 
-    async function fetchJobSchema() {
-      try {
-        const res = await axios.get(`/api/job-posts/${selectedJobPost}/form_schema/`);
-        const newSchema = res.data;
-        setFormSchema(newSchema);
-        
-        // Preserve existing values when schema changes
-        if (formikRef.current) {
-          const currentValues = formikRef.current.values;
-          const newInitialValues = generateInitialValues(newSchema);
-          const mergedValues = { ...newInitialValues, ...currentValues };
-          formikRef.current.setValues(mergedValues);
-        }
-        
-      } catch (err) {
-        setError('Could not load the form schema.');
-        setFormSchema(null);
-      }
+    const jobPost = jobPosts.find(post => String(post.id) === String(selectedJobPost));
+    if (!jobPost) return;
+    const newSchema = jobPost.form_schema;
+    setFormSchema(newSchema);
+
+    // Preserve existing values when schema changes
+    if (formikRef.current) {
+      const currentValues = formikRef.current.values;
+      const newInitialValues = generateInitialValues(newSchema);
+      const mergedValues = { ...newInitialValues, ...currentValues };
+      formikRef.current.setValues(mergedValues);
     }
-    fetchJobSchema();
-  }, [selectedJobPost]);
+  }, [selectedJobPost, jobPosts]);
 
   const handleJobChange = (e) => {
     setSelectedJobPost(e.target.value);
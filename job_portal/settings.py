@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -162,6 +163,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Client IPs for throttling come from the X-Forwarded-For entry added by this many trusted proxies
+    'NUM_PROXIES': 1,
 }
 
 # CORS settings
@@ -178,7 +181,69 @@ AWS_S3_REGION_NAME = 'your-region'
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
 AWS_S3_VERIFY = True
+AWS_S3_ENDPOINT_URL = None  # Set to a MinIO or other S3-compatible endpoint for local development
+AWS_S3_MAX_POOL_CONNECTIONS = 20  # Connections kept open by the shared S3 client (common.storage)
+
+# Direct-to-storage uploads must live under this key prefix to be committed. File fields read
+# committed keys from the AWS_STORAGE_BUCKET_NAME bucket, whatever the default storage is.
+DIRECT_UPLOAD_PREFIX = 'uploads/'
 
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5MB
+UPLOAD_MAX_REQUEST_SIZE = 40 * 1024 * 1024  # Whole multipart body, checked before it is read
+UPLOAD_ALLOWED_TYPES = [  # Sniffed from file content by common.uploadhandlers
+    'application/pdf',
+    'image/jpeg',
+    'image/png',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+]
+
+# Compiled form_data validators kept per process, keyed by schema checksum
+FORM_VALIDATOR_CACHE_SIZE = 256
+
+# Cache-Control for anonymous reads of agency pages, job post lists and form schemas (common.conditional).
+# Browsers reuse a response for max-age; a CDN for s-maxage, then serves it stale while revalidating with ETags
+PUBLIC_CACHE_MAX_AGE = 60
+PUBLIC_CACHE_S_MAXAGE = 300
+PUBLIC_CACHE_STALE_WHILE_REVALIDATE = 600
+
+# Shared by every process, so a save clears cached entries for all of them. The table is created by
+# the common app's migrations (or manage.py createcachetable); a Redis backend works as well
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    }
+}
+
+# XLSX exports are built whole before the download starts, so they are capped; CSV and NDJSON stream
+EXPORT_XLSX_MAX_ROWS = 20000
+
+# ?q= search ranks at most this many of the newest matches; relevance scoring is per row
+SEARCH_RANK_CANDIDATES = 1000
+
+# Cached /api/agencies/{code}/bootstrap/ payloads are cleared by Agency and JobPost saves; the timeout
+# bounds staleness after bulk updates that bypass save()
+AGENCY_BOOTSTRAP_CACHE_TIMEOUT = 60 * 60
+
+# Admission control for new applications (common.throttling). Token buckets as (burst, refill per minute)
+SUBMISSION_RATE_LIMITS = {
+    'ip': (20, 10),  # Generous enough for a cyber cafe submitting for several applicants
+    'job_post': (600, 1200),
+}
+SUBMISSION_MAX_IN_FLIGHT = 64  # Submissions being processed at once, across all processes
+SUBMISSION_OVERLOAD_RETRY_AFTER = 5  # Seconds; doubled at random so retries spread out
+
+# Idempotency-Key handling for submissions and uploads (common.idempotency)
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60  # Seconds a key and its response are kept
+IDEMPOTENCY_LEASE_SECONDS = 120  # A key still processing after this is taken to be abandoned
+IDEMPOTENCY_WAIT_SECONDS = 30  # How long a concurrent duplicate waits for the first request
+
+# Background tasks (common.tasks, run with `manage.py run_worker`)
+TASK_LEASE_SECONDS = 600  # Running tasks older than this are assumed lost and requeued
+TASK_RETRY_BACKOFF_SECONDS = 30
+
+# Uploads waiting for the worker to move them into storage
+UPLOAD_STAGING_ROOT = os.path.join(BASE_DIR, 'staging')
@@ -20,7 +20,8 @@ from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from agencies.views import AgencyViewSet, JobPostViewSet
-from applications.views import ApplicationViewSet, ApplicationDocumentViewSet
+from applications.views import ApplicationViewSet, ApplicationDocumentViewSet, submit_application
+from dashboard.views import DashboardViewSet
 
 # Create a router and register our viewsets with it
 router = DefaultRouter()
@@ -28,9 +29,12 @@ router.register(r'agencies', AgencyViewSet)
 router.register(r'job-posts', JobPostViewSet)
 router.register(r'applications', ApplicationViewSet)
 router.register(r'documents', ApplicationDocumentViewSet)
+router.register(r'dashboard', DashboardViewSet, basename='dashboard')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Async submission for ASGI servers; listed before the router so it isn't taken for an application id
+    path('api/applications/submit/', submit_application, name='application-submit'),
     path('api/', include(router.urls)),
     path('api-auth/', include('rest_framework.urls')),
 ]